@@ -4,7 +4,7 @@ from typing import Annotated
 import anyio.to_thread
 import pandas as pd
 from fastapi import APIRouter, Depends, File, Header, HTTPException, UploadFile, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
 
 from app.core.agent import DataAnalyzerAgent
@@ -134,22 +134,32 @@ async def get_source_info(source_id: DatasetID, agent: BorrowedAgent) -> DataSou
 
 
 @router.get("/data/{source_id}", response_class=FileResponse)
-async def read_source_data(source_id: DatasetID, agent: BorrowedAgent) -> FileResponse:
-    """读取指定数据源的数据"""
+async def read_source_data(
+    source_id: DatasetID,
+    agent: BorrowedAgent,
+    if_none_match: str | None = Header(default=None, description="已缓存数据的ETag"),
+) -> Response:
+    """读取指定数据源的数据，数据未变化时返回304"""
     try:
         if not agent.ctx.sources.exists(source_id):
             raise HTTPException(status_code=404, detail=f"数据源 {source_id} 不存在")
 
         source = agent.ctx.sources.get(source_id)
 
-        # 读取数据
+        # 以数据版本号作为ETag，未变化时无需序列化数据
+        if if_none_match == f'"{source.version}"':
+            logger.opt(colors=True).info(f"数据源 <c>{escape_tag(source_id)}</> 未变化")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": if_none_match})
+
         data = await source.dump_async()
+        # 首次读取完整数据时会更新版本号，需在序列化之后获取
+        etag = f'"{source.version}"'
         _, path = await temp_file_service.allocate(".pkl", 60 * 10)
         await anyio.Path(path).write_bytes(data)
 
         logger.opt(colors=True).info(f"读取数据源 <c>{escape_tag(source_id)}</> 数据")
 
-        return FileResponse(path, filename=f"{source_id}.pkl")
+        return FileResponse(path, filename=f"{source_id}.pkl", headers={"ETag": etag})
 
     except HTTPException:
         raise
@@ -16,6 +16,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 
 from app.const import REPORT_TEMPLATE_DIR
+from app.core.agent.events import BufferedStreamEventReader, dump_stream_event
 from app.core.agent.prompts.data_analyzer import PROMPTS as DATA_ANALYZER_PROMPTS
 from app.exception import DAAServiceError
 from app.log import logger
@@ -24,7 +25,7 @@ from app.schemas.session import Session, SessionID
 from app.services.agent import daa_service
 from app.services.report_export import markdown_to_pdf, sanitize_filename
 from app.services.session import session_service
-from app.utils import buffered_stream, escape_tag, stream_with_heartbeats
+from app.utils import escape_tag, stream_with_heartbeats
 
 from ._depends import CurrentSessionFromBody
 
@@ -49,9 +50,11 @@ async def generate_chat_stream(request: ChatRequest, session: Session) -> AsyncI
     """生成聊天流响应"""
 
     async def stream_chat() -> AsyncIterator[str]:
-        async for event in buffered_stream(agent.stream(request.message), max_buffer_size=10):
+        # 将连续的 token 按时间和长度合并为帧，减少序列化和网络写入次数
+        reader = BufferedStreamEventReader(max_chars=512, max_delay=0.05)
+        async for event in reader.aread(agent.stream(request.message)):
             try:
-                msg = event.model_dump_json().replace("/", "\\/") + "\n"
+                msg = dump_stream_event(event)
             except Exception:
                 logger.exception("转换事件为 JSON 失败")
             else:
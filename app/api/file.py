@@ -16,4 +16,6 @@ async def download_file(file_id: str, token: str = Query()) -> FileResponse:
     if metadata.get("token") != token or not (file_name := metadata.get("filename")):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
-    return FileResponse(path=file_path, filename=file_name, media_type="application/octet-stream")
+    # FileResponse 支持 Range 请求，提供稳定的 ETag 以便客户端断点续传
+    headers = {"ETag": etag} if (etag := metadata.get("etag")) else None
+    return FileResponse(path=file_path, filename=file_name, media_type="application/octet-stream", headers=headers)
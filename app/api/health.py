@@ -4,8 +4,11 @@
 
 from datetime import datetime
 
+import anyio.to_thread
 from fastapi import APIRouter
 
+from app.core.cpu import cpu_scheduler
+
 router = APIRouter(prefix="/health", tags=["Health"])
 
 
@@ -13,3 +16,9 @@ router = APIRouter(prefix="/health", tags=["Health"])
 async def health_check() -> dict[str, str]:
     """健康检查"""
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
+
+
+@router.get("/cpu")
+async def cpu_scheduler_stats() -> dict[str, float]:
+    """CPU 令牌池使用情况和当前工作进程的等待统计"""
+    return await anyio.to_thread.run_sync(cpu_scheduler.stats)
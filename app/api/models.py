@@ -4,17 +4,22 @@
 
 import secrets
 import uuid
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
 from datetime import datetime
 from typing import Any
 
+import anyio.to_thread
+import pandas as pd
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
+from app.core.agent.tools.scikit.inference import DEFAULT_CHUNK_SIZE, batch_predict, model_cache
+from app.exception import DataSourceNotFound
 from app.log import logger
 from app.schemas.ml_model import MLModelInfoOut
 from app.schemas.session import SessionID
-from app.services.datasource import temp_file_service
+from app.services.datasource import datasource_service, temp_file_service
 from app.services.model_registry import model_registry
 
 router = APIRouter(prefix="/models", tags=["ML Models"])
@@ -31,7 +36,7 @@ async def get_trained_models(session_id: SessionID) -> dict[str, Sequence[MLMode
         if not session_id:
             raise HTTPException(status_code=400, detail="Session ID is required")
 
-        return {"models": model_registry.list_models(session_id)}
+        return {"models": await model_registry.find_models(session_id=session_id)}
 
     except HTTPException:
         raise
@@ -44,7 +49,7 @@ async def get_trained_models(session_id: SessionID) -> dict[str, Sequence[MLMode
 async def get_all_models() -> dict[str, Sequence[MLModelInfoOut]]:
     """获取所有模型列表"""
     try:
-        return {"models": model_registry.list_models()}
+        return {"models": await model_registry.find_models()}
     except Exception as e:
         logger.exception("获取所有模型失败")
         raise HTTPException(status_code=500, detail=f"Failed to get all models: {e}") from e
@@ -129,3 +134,53 @@ async def get_model_link(model_id: str) -> GetModelLinkResponse:
     except Exception as e:
         logger.exception("下载模型失败")
         raise HTTPException(status_code=500, detail=f"Failed to download model: {e}") from e
+
+
+class BatchPredictRequest(BaseModel):
+    source_id: str
+    features: list[str] | None = None
+    chunk_size: int = Field(default=DEFAULT_CHUNK_SIZE, gt=0)
+
+
+@router.post("/{model_id}/predict")
+async def batch_predict_model(model_id: str, request: BatchPredictRequest) -> StreamingResponse:
+    """使用已注册的模型对数据源分块预测，以 CSV 流返回预测结果"""
+    if (model := model_registry.get_model(model_id)) is None:
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    try:
+        loaded = await anyio.to_thread.run_sync(model_cache.get, model.model_path)
+        source = await datasource_service.get_source(request.source_id)
+        # 按块读取数据源，峰值内存只与块大小有关
+        chunks = source.iter_data_async(request.chunk_size)
+        first = await anext(chunks, None)
+    except (FileNotFoundError, DataSourceNotFound) as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except Exception as e:
+        logger.exception("加载模型或数据源失败")
+        raise HTTPException(status_code=500, detail=f"Failed to prepare prediction: {e}") from e
+
+    features = request.features or loaded.metadata["feature_columns"]
+    if first is not None and (missing := [f for f in features if f not in first.columns]):
+        await chunks.aclose()
+        raise HTTPException(status_code=400, detail=f"Missing feature columns: {', '.join(missing)}")
+
+    def predict_chunk(chunk: pd.DataFrame, header: bool) -> str:
+        results = batch_predict(loaded, chunk, features, request.chunk_size)
+        return "".join(result.to_csv(header=header and i == 0, index_label="index") for i, result in enumerate(results))
+
+    async def generate() -> AsyncIterator[str]:
+        chunk, header = first, True
+        try:
+            while chunk is not None:
+                # 每块的预测在工作线程中进行，避免阻塞事件循环
+                yield await anyio.to_thread.run_sync(predict_chunk, chunk, header)
+                chunk, header = await anext(chunks, None), False
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="predictions_{model_id}.csv"'},
+    )
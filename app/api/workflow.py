@@ -9,6 +9,7 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, Path, status
 from fastapi.responses import StreamingResponse
 
+from app.core.agent.events import dump_stream_event
 from app.log import logger
 from app.schemas.chat import ChatEntry, UserChatMessage
 from app.schemas.session import Session
@@ -78,7 +79,7 @@ async def generate_workflow_execution_stream(
     async def stream_chat() -> AsyncIterator[str]:
         async for event in buffered_stream(execute_workflow_stream(session, workflow, datasource_mappings), 10):
             try:
-                msg = event.model_dump_json().replace("/", "\\/") + "\n"
+                msg = dump_stream_event(event)
             except Exception:
                 logger.exception("转换事件为 JSON 失败")
             else:
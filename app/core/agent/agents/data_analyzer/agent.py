@@ -146,14 +146,13 @@ class DataAnalyzerAgent:
             tg.cancel_scope.cancel()
 
         async def read_tool_calls() -> None:
-            while True:
-                async for tc in self.ctx.flush_buffered_tool_calls():
-                    if evt := build_tool_call_event(tc, self.ctx.lookup_tool_source):
-                        logger.info(
-                            f"{prefix} 开始工具调用: <y>{escape_tag(evt.id)}</> - <g>{escape_tag(evt.name)}</>\n"
-                            f"{escape_tag(str(evt.args))}"
-                        )
-                        await event_send.send(evt)
+            async for tc in self.ctx.watch_tool_calls():
+                if evt := build_tool_call_event(tc, self.ctx.lookup_tool_source):
+                    logger.info(
+                        f"{prefix} 开始工具调用: <y>{escape_tag(evt.id)}</> - <g>{escape_tag(evt.name)}</>\n"
+                        f"{escape_tag(str(evt.args))}"
+                    )
+                    await event_send.send(evt)
 
         async with anyio.create_task_group() as tg:
             tg.start_soon(stream_graph)
@@ -3,7 +3,6 @@ from __future__ import annotations
 import contextlib
 import dataclasses
 import functools
-import operator
 from copy import deepcopy
 from typing import TYPE_CHECKING, Any, cast
 
@@ -11,8 +10,7 @@ import anyio
 import anyio.lowlevel
 import anyio.to_thread
 from langchain_core.messages import BaseMessage, SystemMessage, ToolCall
-from langchain_mcp_adapters.sessions import create_session
-from langchain_mcp_adapters.tools import _list_all_tools, convert_mcp_tool_to_langchain_tool
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
 from langgraph.prebuilt import ToolNode
 from mcp.types import Implementation as MCPImplementation
 
@@ -23,12 +21,15 @@ from app.core.agent.tools import builtin_tools
 from app.core.agent.tools.registry import register_tool_name
 from app.core.chain import get_chat_model_async
 from app.core.lifespan import Lifespan
+from app.core.mcp_pool import MCPSessionPool, PooledMCPSession
 from app.log import logger
 from app.schemas.session import AgentModelConfig, AgentModelConfigFixed, SessionID
 from app.utils import escape_tag
 
+from .toolset import ToolRegistry
+
 if TYPE_CHECKING:
-    from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+    from collections.abc import AsyncIterator, Callable, Hashable, Sequence
     from pathlib import Path
 
     from langchain_core.language_models import LanguageModelInput
@@ -39,10 +40,13 @@ if TYPE_CHECKING:
     from langgraph.prebuilt.chat_agent_executor import AgentState
     from langgraph.runtime import Runtime
     from langgraph.store.base import BaseStore
+    from mcp.types import Tool as MCPTool
 
     from app.core.agent.sources import Sources
     from app.schemas.ml_model import MLModelInfo
 
+    from .toolset import ToolLoadRecord, ToolsetSnapshot
+
     type AgentGraph = CompiledStateGraph[AgentState, AgentRuntimeContext, Any, Any]
 
 
@@ -56,7 +60,7 @@ class AgentToolNode(ToolNode):
         self,
         lifespan: Lifespan,
         tools: Sequence[BaseTool],
-        load_extra_tools: Callable[[], Awaitable[Sequence[BaseTool]]],
+        registry: ToolRegistry,
         emit_tool_call: Callable[[ToolCall], object],
     ) -> None:
         super().__init__(
@@ -67,20 +71,25 @@ class AgentToolNode(ToolNode):
         )
         self._lifespan = lifespan
         self._initial_tools = tools
-        self._load_extra_tools = load_extra_tools
+        self._registry = registry
+        self._toolset_version = 0
         self._emit_tool_call = emit_tool_call
 
     async def load_tools(self) -> None:
-        extra_tools = await self._load_extra_tools()
-        logger.opt(colors=True).info(f"加载额外工具数: <y>{len(extra_tools)}</>")
+        snapshot = await self._registry.snapshot()
+        if snapshot.version == self._toolset_version:
+            return
+
+        logger.opt(colors=True).info(f"加载额外工具数: <y>{len(snapshot.extra_tools)}</>")
         for name in set(self.tools_by_name.keys()) - {tool.name for tool in self._initial_tools}:
             self.tools_by_name.pop(name, None)
             self.tool_to_state_args.pop(name, None)
             self.tool_to_store_arg.pop(name, None)
-        for tool in extra_tools:
+        for tool in snapshot.extra_tools:
             self.tools_by_name[tool.name] = tool
             self.tool_to_state_args[tool.name] = {}
             self.tool_to_store_arg[tool.name] = None
+        self._toolset_version = snapshot.version
 
     def _func(
         self,
@@ -90,10 +99,14 @@ class AgentToolNode(ToolNode):
         store: BaseStore | None = None,
     ) -> Any:
         self._lifespan.from_thread(self.load_tools)
-        for tc in self._parse_input(input, store)[0]:
-            self._emit_tool_call(tc)
+        # 在事件循环中发出工具调用，以便唤醒等待中的读取方
+        self._lifespan.from_thread(self._emit_tool_calls, self._parse_input(input, store)[0])
         return super()._func(input, config, store=store)
 
+    async def _emit_tool_calls(self, tool_calls: list[ToolCall]) -> None:
+        for tc in tool_calls:
+            self._emit_tool_call(tc)
+
     async def _afunc(
         self,
         input: Any,
@@ -117,14 +130,18 @@ class AgentContext:
 
     # private
     _tool_node: ToolNode | None = None
+    _tool_registry: ToolRegistry | None = None
     _graph: AgentGraph | None = None
     _mcp_instructions: str | None = None
     _tool_sources: dict[str, str] = dataclasses.field(default_factory=dict)
     _buffered_tool_calls: list[ToolCall] = dataclasses.field(default_factory=list)
+    _tool_call_event: anyio.Event | None = None
     _model_instance_cache: dict[str, Any] = dataclasses.field(default_factory=dict)
     _train_model_cache: dict[str, Any] = dataclasses.field(default_factory=dict)
     _agent_source_tokens: set[str] = dataclasses.field(default_factory=set)
-    _mcp_tool_cache: dict[str, list[BaseTool]] = dataclasses.field(default_factory=dict)
+    _mcp_tool_cache: dict[str, tuple[list[MCPTool], list[BaseTool]]] = dataclasses.field(default_factory=dict)
+    _mcp_pool: MCPSessionPool | None = None
+    _mcp_sessions: dict[str, PooledMCPSession] = dataclasses.field(default_factory=dict)
 
     @functools.cached_property
     def runnable_config(self) -> RunnableConfig:
@@ -146,6 +163,11 @@ class AgentContext:
     def state_file(self) -> Path:
         return STATE_DIR / f"{self.session_id}.json"
 
+    @property
+    def tool_load_trace(self) -> list[ToolLoadRecord]:
+        """最近若干步的工具加载耗时记录"""
+        return self._tool_registry.trace if self._tool_registry is not None else []
+
     def lookup_tool_source(self, tool_name: str) -> str | None:
         return self._tool_sources.get(tool_name)
 
@@ -176,7 +198,7 @@ class AgentContext:
                 self.saved_models[model_info.id] = model_info.model_path
 
     async def _format_system_prompt(self) -> str:
-        await self._load_mcp_tools()
+        await self._load_toolset()
         ml_model_instructions = ""
         if model_infos := await self._load_external_models():
             ml_model_instructions = PROMPTS.external_ml_model.format(
@@ -202,8 +224,8 @@ class AgentContext:
         runtime: Runtime[AgentRuntimeContext],
     ) -> Runnable[LanguageModelInput, BaseMessage]:
         model = await get_chat_model_async(runtime.context.model_config.chat)
-        if self._tool_node:
-            model = model.bind_tools(list(self._tool_node.tools_by_name.values()))
+        if self._tool_registry is not None:
+            model = model.bind_tools(list((await self._load_toolset()).tools))
         return model
 
     async def _delete_mcp_source_tokens(self) -> None:
@@ -223,27 +245,29 @@ class AgentContext:
             self._mcp_instructions = ""
             return []
 
-        cached_ids = set(self._mcp_tool_cache.keys())
-        if mcp_ids == cached_ids:
-            return functools.reduce(operator.add, self._mcp_tool_cache.values(), [])
+        for mcp_id in set(self._mcp_sessions) - mcp_ids:
+            self._mcp_tool_cache.pop(mcp_id, None)
+            if self._mcp_pool is not None:
+                await self._mcp_pool.discard(self._mcp_sessions.pop(mcp_id))
 
-        for mcp_id in cached_ids - mcp_ids:
-            del self._mcp_tool_cache[mcp_id]
-
-        mcps = {mcp_id: mcp_service.get(mcp_id) for mcp_id in mcp_ids}
         assert self.lifespan is not None
+        assert self._mcp_pool is not None
 
         instructions: list[str] = []
         mcp_tools: list[BaseTool] = []
 
-        for idx, (mcp_id, mcp) in enumerate(mcps.items(), 1):
-            token = daa_service.create_source_token(self.session_id)
-            self._agent_source_tokens.add(token)
-            connection = cast("LangChainMCPConnection", deepcopy(mcp.connection))
-            connection["session_kwargs"] = {"client_info": MCPImplementation(name=token, version=VERSION)}
-            async with create_session(connection) as session:
-                init = await session.initialize()
-                tools = await _list_all_tools(session)
+        for idx, mcp_id in enumerate(mcp_ids, 1):
+            mcp = mcp_service.get(mcp_id)
+            if (pooled := self._mcp_sessions.get(mcp_id)) is None:
+                token = daa_service.create_source_token(self.session_id)
+                self._agent_source_tokens.add(token)
+                connection = cast("LangChainMCPConnection", deepcopy(mcp.connection))
+                connection["session_kwargs"] = {"client_info": MCPImplementation(name=token, version=VERSION)}
+                pooled = self._mcp_sessions[mcp_id] = self._mcp_pool.get(connection, mcp.name)
+
+            # 工具列表在TTL内复用缓存，无需重新握手
+            init = await pooled.initialize_result()
+            tools = await pooled.list_tools()
             instruction = PROMPTS.mcp_server.format(
                 idx=idx,
                 server_instructions=init.instructions or "无",
@@ -252,14 +276,21 @@ class AgentContext:
                 ),
             )
             instructions.append(instruction)
+
+            cached = self._mcp_tool_cache.get(mcp_id)
+            if cached is not None and cached[0] is tools:
+                mcp_tools.extend(cached[1])
+                continue
+
             lc_tools = []
             for mcp_tool in tools:
-                lc_tool = convert_mcp_tool_to_langchain_tool(None, mcp_tool, connection=connection)
+                # 工具调用复用会话池中的长连接
+                lc_tool = convert_mcp_tool_to_langchain_tool(pooled.as_client_session(), mcp_tool)
                 self._tool_sources[lc_tool.name] = f"{mcp.name} (MCP)"
                 if mcp_tool.title:
                     register_tool_name(lc_tool.name, mcp_tool.title)
                 lc_tools.append(lc_tool)
-            self._mcp_tool_cache[mcp_id] = lc_tools
+            self._mcp_tool_cache[mcp_id] = (tools, lc_tools)
             mcp_tools.extend(lc_tools)
             logger.opt(colors=True).info(
                 f"从 MCP 服务器 <c>{escape_tag(mcp.name)}</> 加载工具数: <y>{len(lc_tools)}</>"
@@ -268,6 +299,22 @@ class AgentContext:
         self._mcp_instructions = PROMPTS.mcp_tools_instruction.format(server_list="\n\n".join(instructions))
         return mcp_tools
 
+    async def _toolset_fingerprint(self) -> Hashable:
+        from app.services.session import session_service
+
+        if (chat_session := await session_service.get(self.session_id)) is None:
+            return None
+        return frozenset(chat_session.mcp_ids or []), tuple(chat_session.model_ids or [])
+
+    async def _load_extra_tools(self) -> list[BaseTool]:
+        # 启用的模型变化时同步更新已保存模型
+        await self._load_saved_models()
+        return await self._load_mcp_tools()
+
+    async def _load_toolset(self) -> ToolsetSnapshot:
+        assert self._tool_registry is not None
+        return await self._tool_registry.snapshot()
+
     async def _build_tool_node(self, lifespan: Lifespan) -> ToolNode:
         # Load Tools
         await self._load_saved_models()
@@ -275,22 +322,43 @@ class AgentContext:
         for tool in tools:
             self._tool_sources[tool.name] = "内置工具"
 
+        # 工具集在 MCP 服务器或启用的模型变化时重建，并在 MCP 工具列表缓存过期后重新获取
+        self._tool_registry = ToolRegistry(
+            tools,
+            self._toolset_fingerprint,
+            self._load_extra_tools,
+            max_age=self._mcp_pool.tools_ttl if self._mcp_pool is not None else None,
+        )
         self._tool_node = AgentToolNode(
             lifespan,
             tools,
-            load_extra_tools=self._load_mcp_tools,
-            emit_tool_call=self._buffered_tool_calls.append,
+            registry=self._tool_registry,
+            emit_tool_call=self._emit_tool_call,
         )
 
         logger.opt(colors=True).info(f"使用工具数: <y>{len(builtin_tools)}</>")
         return self._tool_node
 
+    def _emit_tool_call(self, tool_call: ToolCall) -> None:
+        self._buffered_tool_calls.append(tool_call)
+        if self._tool_call_event is not None:
+            self._tool_call_event.set()
+
     async def flush_buffered_tool_calls(self) -> AsyncIterator[ToolCall]:
         while self._buffered_tool_calls:
             yield self._buffered_tool_calls.pop(0)
             await anyio.lowlevel.checkpoint()
         await anyio.lowlevel.checkpoint()
 
+    async def watch_tool_calls(self) -> AsyncIterator[ToolCall]:
+        """持续产出工具调用，没有新的工具调用时挂起等待通知"""
+        while True:
+            async for tc in self.flush_buffered_tool_calls():
+                yield tc
+            self._tool_call_event = event = anyio.Event()
+            if not self._buffered_tool_calls:
+                await event.wait()
+
     async def build_graph(self) -> None:
         from langchain_core.runnables import RunnableLambda
         from langgraph.checkpoint.memory import InMemorySaver
@@ -301,9 +369,15 @@ class AgentContext:
                 await self.lifespan.shutdown()
             self.lifespan = None
 
+        # 旧生命周期关闭时已断开 MCP 会话并删除数据源令牌，需要重新建立
+        self._mcp_tool_cache.clear()
+        self._mcp_sessions.clear()
+        self._agent_source_tokens.clear()
+
         self.lifespan = Lifespan(f"Agent<white>[<c>{escape_tag(self.session_id)}</>]</>")
         await self.lifespan.startup()
         self.lifespan.on_shutdown(self._delete_mcp_source_tokens)
+        self._mcp_pool = MCPSessionPool(self.lifespan)
 
         # Load Tools
         tool_node = await self._build_tool_node(self.lifespan)
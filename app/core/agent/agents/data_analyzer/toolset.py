@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+import anyio
+
+from app.log import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Hashable, Mapping, Sequence
+
+    from langchain_core.tools import BaseTool
+
+
+@dataclasses.dataclass(frozen=True)
+class ToolsetSnapshot:
+    """不可变的工具集快照，每次重建时版本号递增"""
+
+    version: int
+    fingerprint: Hashable
+    built_at: float
+    tools: tuple[BaseTool, ...]
+    extra_tools: tuple[BaseTool, ...]
+    tools_by_name: Mapping[str, BaseTool]
+
+
+@dataclasses.dataclass(frozen=True)
+class ToolLoadRecord:
+    """单步工具加载耗时记录"""
+
+    version: int
+    rebuilt: bool
+    elapsed: float
+
+
+class ToolRegistry:
+    """
+    Agent 工具注册表
+
+    合并内置工具与额外工具(MCP 工具)，仅在配置指纹变化或快照超过 max_age 秒时重建工具集，
+    其余情况直接返回已构建的快照。
+
+    Args:
+        builtin_tools: 内置工具
+        fingerprint: 计算配置指纹
+        load_extra_tools: 加载额外工具
+        max_age: 快照的最长有效时间(秒)，过期后重新加载额外工具以发现服务器新增的工具，为None时不过期
+        trace_size: 保留的工具加载耗时记录数
+    """
+
+    def __init__(
+        self,
+        builtin_tools: Sequence[BaseTool],
+        fingerprint: Callable[[], Awaitable[Hashable]],
+        load_extra_tools: Callable[[], Awaitable[Sequence[BaseTool]]],
+        max_age: float | None = None,
+        trace_size: int = 256,
+    ) -> None:
+        self._builtin_tools = tuple(builtin_tools)
+        self._fingerprint = fingerprint
+        self._load_extra_tools = load_extra_tools
+        self._max_age = max_age
+        self._snapshot: ToolsetSnapshot | None = None
+        self._version = 0
+        self._lock = anyio.Lock()
+        self._trace: collections.deque[ToolLoadRecord] = collections.deque(maxlen=trace_size)
+
+    @property
+    def trace(self) -> list[ToolLoadRecord]:
+        """最近若干步的工具加载耗时记录"""
+        return list(self._trace)
+
+    def invalidate(self) -> None:
+        """使当前快照失效，下一次获取时重建"""
+        self._snapshot = None
+
+    def _is_current(self, snapshot: ToolsetSnapshot | None, fingerprint: Hashable) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.fingerprint == fingerprint
+            and (self._max_age is None or time.monotonic() - snapshot.built_at < self._max_age)
+        )
+
+    async def _build(self, fingerprint: Hashable) -> ToolsetSnapshot:
+        built_at = time.monotonic()
+        extra_tools = tuple(await self._load_extra_tools())
+        tools = self._builtin_tools + extra_tools
+        self._version += 1
+        return ToolsetSnapshot(
+            version=self._version,
+            fingerprint=fingerprint,
+            built_at=built_at,
+            tools=tools,
+            extra_tools=extra_tools,
+            tools_by_name=MappingProxyType({tool.name: tool for tool in tools}),
+        )
+
+    async def snapshot(self) -> ToolsetSnapshot:
+        """
+        获取当前工具集快照
+
+        Returns:
+            ToolsetSnapshot: 工具集快照，配置未变化且未过期时返回同一个快照
+        """
+        start = time.perf_counter()
+        fingerprint = await self._fingerprint()
+        rebuilt = False
+
+        snapshot = self._snapshot
+        if not self._is_current(snapshot, fingerprint):
+            async with self._lock:
+                snapshot = self._snapshot
+                if not self._is_current(snapshot, fingerprint):
+                    snapshot = self._snapshot = await self._build(fingerprint)
+                    rebuilt = True
+        assert snapshot is not None
+
+        record = ToolLoadRecord(snapshot.version, rebuilt, time.perf_counter() - start)
+        self._trace.append(record)
+        logger.opt(colors=True).debug(
+            f"工具加载: 版本 <y>{record.version}</> 耗时 <y>{record.elapsed * 1000:.2f}</>ms"
+            + (" (重建)" if rebuilt else "")
+        )
+        return snapshot
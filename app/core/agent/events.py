@@ -3,9 +3,11 @@ import json
 from collections.abc import AsyncIterable, Callable, Iterable
 from typing import Annotated, Any, Literal
 
+import anyio
+from anyio.streams.memory import MemoryObjectReceiveStream
 from langchain_core.messages import AIMessage, BaseMessage, ToolCall, ToolMessage
 from mcp.types import ImageContent
-from pydantic import BaseModel, Field, Tag
+from pydantic import BaseModel, Field, Tag, TypeAdapter
 
 from app.core.agent.tools.registry import tool_name_human_repr
 
@@ -54,6 +56,13 @@ type StreamEvent = Annotated[
     Field(discriminator="type"),
 ]
 
+stream_event_adapter: TypeAdapter[StreamEvent] = TypeAdapter(StreamEvent)
+
+
+def dump_stream_event(event: StreamEvent) -> str:
+    """将事件序列化为一行 NDJSON"""
+    return stream_event_adapter.dump_json(event).replace(b"/", b"\\/").decode() + "\n"
+
 
 def fix_message_content(content: str | list[Any]) -> str:
     """修复消息内容，确保是字符串格式"""
@@ -104,12 +113,33 @@ def process_stream_event(
 
 
 class BufferedStreamEventReader:
-    def __init__(self) -> None:
+    """
+    合并连续的 LLM token 事件
+
+    Args:
+        max_chars: 缓冲文本达到该长度时立即输出，None表示不限制
+        max_delay: 缓冲 token 的最长等待时间(秒)，None表示直到遇到其他事件或流结束才输出
+        max_buffer_size: 按时间合并时上游事件的缓冲区大小
+    """
+
+    def __init__(
+        self,
+        max_chars: int | None = None,
+        max_delay: float | None = None,
+        max_buffer_size: float = 16,
+    ) -> None:
         self.tokens: list[LlmTokenEvent] = []
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.max_buffer_size = max_buffer_size
+        self._chars = 0
 
     def push(self, event: StreamEvent) -> Iterable[StreamEvent]:
         if isinstance(event, LlmTokenEvent):
             self.tokens.append(event)
+            self._chars += len(event.content)
+            if self.max_chars is not None and self._chars >= self.max_chars and (msg := self.flush()):
+                yield msg
         else:
             if msg := self.flush():
                 yield msg
@@ -125,6 +155,7 @@ class BufferedStreamEventReader:
 
         metadata = {k: v for event in self.tokens for k, v in event.metadata.items()}
         self.tokens.clear()
+        self._chars = 0
         return LlmTokenEvent(content=content, metadata=metadata)
 
     def read(self, stream: Iterable[StreamEvent]) -> Iterable[StreamEvent]:
@@ -134,8 +165,59 @@ class BufferedStreamEventReader:
             yield msg
 
     async def aread(self, stream: AsyncIterable[StreamEvent]) -> AsyncIterable[StreamEvent]:
-        async for event in stream:
+        if self.max_delay is None:
+            async for event in stream:
+                for e in self.push(event):
+                    yield e
+            if msg := self.flush():
+                yield msg
+            return
+
+        send, recv = anyio.create_memory_object_stream[StreamEvent](self.max_buffer_size)
+
+        async def producer() -> None:
+            async with send:
+                async for event in stream:
+                    await send.send(event)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(producer)
+            async with recv:
+                async for e in self._read_frames(recv, self.max_delay):
+                    yield e
+
+    async def _read_frames(
+        self,
+        recv: MemoryObjectReceiveStream[StreamEvent],
+        max_delay: float,
+    ) -> AsyncIterable[StreamEvent]:
+        # 第一帧立即输出以降低首字节延迟，之后的 token 在 max_delay 内合并为一帧
+        emitted = False
+        deadline: float | None = None
+        while True:
+            event: StreamEvent | None = None
+            timeout = float("inf") if deadline is None else max(deadline - anyio.current_time(), 0)
+            with anyio.move_on_after(timeout):
+                try:
+                    event = await recv.receive()
+                except anyio.EndOfStream:
+                    break
+
+            if event is None:
+                deadline = None
+                if msg := self.flush():
+                    emitted = True
+                    yield msg
+                continue
+
             for e in self.push(event):
+                emitted = True
                 yield e
+
+            if not self.tokens:
+                deadline = None
+            elif deadline is None:
+                deadline = anyio.current_time() + (max_delay if emitted else 0)
+
         if msg := self.flush():
             yield msg
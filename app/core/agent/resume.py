@@ -58,6 +58,12 @@ def get_resumable_tools() -> list[str]:
     return list(_RESUME_TOOL_REGISTRY.keys())
 
 
+def get_resumable_params(name: str) -> list[str]:
+    """获取可恢复工具的参数名称，未注册的工具返回空列表"""
+    r = _RESUME_TOOL_REGISTRY.get(name)
+    return r.params if r is not None else []
+
+
 def resume_tool_call(tool_call: ToolCall) -> Any:
     """
     恢复工具调用
@@ -49,6 +49,11 @@ class Sources:
         logger.opt(colors=True).info(f"读取数据源: <c>{escape_tag(dataset_id)}</>")
         return self.get(dataset_id).get_full()
 
+    def mark_modified(self, dataset_id: DatasetID) -> None:
+        """标记数据集已被原地修改"""
+        self.get(dataset_id).mark_modified()
+        logger.opt(colors=True).info(f"数据源已修改: <c>{escape_tag(dataset_id)}</>")
+
     def _next_uuid(self) -> DatasetID:
         return str(uuid.UUID(bytes=self._random.randbytes(16), version=4))
 
@@ -74,7 +74,8 @@ def inspect_dataframe_tool(
     Returns:
         dict: 包含数据框详细信息的结果
     """
-    return inspect_dataframe(get_sources().read(dataset_id), options)
+    sources = get_sources()
+    return inspect_dataframe(sources.read(dataset_id), options, sources.get(dataset_id).version)
 
 
 @tool
@@ -90,7 +91,8 @@ def get_missing_values_summary_tool(dataset_id: DatasetID) -> MissingValuesSumma
     Returns:
         缺失值摘要字典
     """
-    return get_missing_values_summary(get_sources().read(dataset_id))
+    sources = get_sources()
+    return get_missing_values_summary(sources.read(dataset_id), sources.get(dataset_id).version)
 
 
 @tool
@@ -353,9 +355,13 @@ def create_interaction_term_tool(
     Returns:
         dict: 包含操作结果的字典。
     """
-    return create_interaction_term(
-        get_sources().read(dataset_id), column_name, columns_to_interact, interaction_type, scale
+    sources = get_sources()
+    result = create_interaction_term(
+        sources.read(dataset_id), column_name, columns_to_interact, interaction_type, scale
     )
+    if result["success"]:
+        sources.mark_modified(dataset_id)
+    return result
 
 
 @tool
@@ -387,9 +393,13 @@ def create_aggregated_feature_tool(
     Returns:
         dict: 包含操作结果的字典。
     """
-    return create_aggregated_feature(
-        get_sources().read(dataset_id), column_name, group_by_column, target_column, aggregation, description
+    sources = get_sources()
+    result = create_aggregated_feature(
+        sources.read(dataset_id), column_name, group_by_column, target_column, aggregation, description
     )
+    if result["success"]:
+        sources.mark_modified(dataset_id)
+    return result
 
 
 @tool
@@ -8,9 +8,15 @@ import pandas as pd
 
 from app.core.agent.schemas import DatasetID, OperationFailed
 from app.core.agent.sources import Sources
+from app.core.datasource.profile import profile_dataframe
 from app.log import logger
 from app.utils import escape_tag
 
+INFER_SAMPLE_ROWS = 1000  # 推断类型时抽样的非空值数量
+INFER_MATCH_RATIO = 0.9  # 可解析的值占非空值的比例达到该值时转换
+INFER_REJECT_RATIO = 0.8  # 样本中可解析的比例低于该值时直接放弃，不再检查整列
+DATETIME_PATTERN = r"\d{1,4}[-/\.]\d{1,2}[-/\.]\d{1,4}"
+
 
 class ConvertDtypesResult(TypedDict):
     """数据类型转换的结果"""
@@ -62,100 +68,74 @@ def infer_and_convert_dtypes(
         f"分类阈值={category_threshold}"
     )
 
-    # 创建DataFrame的副本以避免修改原始数据
     df = sources.read(dataset_id)
-    df_copy = df.copy()
 
     # 如果未指定列，则处理所有列
     if columns is None:
-        columns = cast("list[str]", df_copy.columns.tolist())
+        columns = cast("list[str]", df.columns.tolist())
 
     # 初始化结果跟踪
     converted_columns = []
     conversion_details = {}
     failed_columns = []
     failed_reasons = {}
-
-    # 数值型转换模式
-    numeric_pattern = r"^[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?$"
+    converted_data: dict[str, pd.Series] = {}
+    rng = np.random.default_rng(42)
 
     for column in columns:
-        if column not in df_copy.columns:
+        if column not in df.columns:
             failed_columns.append(column)
             failed_reasons[column] = "列不存在"
             continue
 
-        original_dtype = str(df_copy[column].dtype)
-
-        # 跳过已经是适当类型的列
-        if pd.api.types.is_numeric_dtype(df_copy[column]) and not to_numeric:
-            continue
-        if pd.api.types.is_datetime64_dtype(df_copy[column]) and not to_datetime:
-            continue
-        if pd.api.types.is_categorical_dtype(df_copy[column]) and not to_category:
+        # 只推断文本列，已有具体类型的列保持不变
+        series = cast("pd.Series", df[column])
+        if not _is_text_dtype(series.dtype):
             continue
 
         try:
-            # 处理可能的数值型列
-            if to_numeric and df_copy[column].dtype == "object":
-                # 检查列值是否符合数值模式
-                numeric_values = df_copy[column].dropna().astype(str).str.match(numeric_pattern).mean() > 0.9
-
-                if numeric_values:
-                    # 将字符串转换为数值，错误时强制为NaN
-                    df_copy[column] = pd.to_numeric(df_copy[column], errors="coerce")
-                    converted_columns.append(column)
-                    conversion_details[column] = {
-                        "original_dtype": original_dtype,
-                        "new_dtype": str(df_copy[column].dtype),
-                    }
-
-            # 处理可能的日期时间列
-            elif to_datetime and df_copy[column].dtype == "object":
-                # 检查是否看起来像日期
-                datetime_pattern = r"\d{1,4}[-/\.]\d{1,2}[-/\.]\d{1,4}"
-                possible_dates = df_copy[column].dropna().astype(str).str.match(datetime_pattern).mean() > 0.9
-
-                if possible_dates:
-                    try:
-                        # 尝试转换为日期时间
-                        df_copy[column] = pd.to_datetime(df_copy[column], format=datetime_format, errors="coerce")
-                        converted_columns.append(column)
-                        conversion_details[column] = {
-                            "original_dtype": original_dtype,
-                            "new_dtype": str(df_copy[column].dtype),
-                        }
-                    except Exception:
-                        failed_columns.append(column)
-                        failed_reasons[column] = "日期时间转换失败"
-
-            # 处理可能的分类列
-            elif to_category:
-                # 检查唯一值比例，如果较低则可能是分类变量
-                unique_ratio = df_copy[column].nunique() / len(df_copy)
-
-                if unique_ratio < category_threshold and not pd.api.types.is_numeric_dtype(df_copy[column]):
-                    df_copy[column] = df_copy[column].astype("category")
-                    converted_columns.append(column)
-                    conversion_details[column] = {
-                        "original_dtype": original_dtype,
-                        "new_dtype": str(df_copy[column].dtype),
-                    }
-
+            converted = _infer_text_column(
+                series,
+                to_numeric=to_numeric,
+                to_datetime=to_datetime,
+                to_category=to_category,
+                category_threshold=category_threshold,
+                datetime_format=datetime_format,
+                rng=rng,
+            )
         except Exception as e:
             failed_columns.append(column)
             failed_reasons[column] = str(e)
+            continue
+
+        if converted is not None:
+            converted_data[column] = converted
+            converted_columns.append(column)
+            conversion_details[column] = {
+                "original_dtype": str(series.dtype),
+                "new_dtype": str(converted.dtype),
+            }
+
+    # 转换后的列整列替换到新数据框中，原数据集不受影响。启用 Copy-on-Write 时
+    # 未转换的列与原数据共享内存，直到任一方写入时才复制；未启用时 assign 会复制这些列
+    df_copy = df.assign(**converted_data)
+    new_dataset_id = sources.create(df_copy, new_dataset_id, f"[自动推断并转换自{dataset_id}的数据集]")
 
-    # 准备统计信息
-    memory_usage_before = cast("pd.Series", df[columns].memory_usage(deep=True)).sum() / 1048576  # MB
-    memory_usage_after = cast("pd.Series", df_copy[columns].memory_usage(deep=True)).sum() / 1048576  # MB
+    # 准备统计信息，未转换的列直接复用原数据集的概况
+    profile_before = profile_dataframe(df, columns, version=sources.get(dataset_id).version)
+    profile_after = profile_dataframe(
+        df_copy,
+        columns,
+        version=sources.get(new_dataset_id).version,
+        base=profile_before,
+        changed=converted_columns,
+    )
     statistics = {
-        "memory_usage_before": f"{memory_usage_before:.3f} MB",
-        "memory_usage_after": f"{memory_usage_after:.3f} MB",
-        "null_counts": {col: int(df_copy[col].isna().sum()) for col in columns},
+        "memory_usage_before": f"{profile_before.memory_bytes / 1048576:.3f} MB",
+        "memory_usage_after": f"{profile_after.memory_bytes / 1048576:.3f} MB",
+        "null_counts": profile_after.null_counts(),
     }
 
-    new_dataset_id = sources.create(df_copy, new_dataset_id, f"[自动推断并转换自{dataset_id}的数据集]")
     if in_place:
         sources.rename(new_dataset_id, dataset_id)
         new_dataset_id = dataset_id
@@ -172,6 +152,82 @@ def infer_and_convert_dtypes(
     }
 
 
+def _is_text_dtype(dtype: Any) -> bool:
+    return (isinstance(dtype, np.dtype) and dtype.kind == "O") or isinstance(dtype, pd.StringDtype)
+
+
+def _infer_text_column(
+    series: pd.Series,
+    *,
+    to_numeric: bool,
+    to_datetime: bool,
+    to_category: bool,
+    category_threshold: float,
+    datetime_format: str | None,
+    rng: np.random.Generator,
+) -> pd.Series | None:
+    """
+    推断文本列的类型并转换，依次尝试数值、日期时间和分类类型
+
+    先在抽样的非空值上判断，样本明显不符合时不再处理整列；
+    否则对整列做向量化转换，并以转换成功的比例确认。
+
+    Args:
+        series: 文本列
+        to_numeric: 是否尝试转换为数值
+        to_datetime: 是否尝试转换为日期时间
+        to_category: 是否尝试转换为分类类型
+        category_threshold: 转换为分类类型的唯一值比例阈值
+        datetime_format: 日期时间格式
+        rng: 抽样使用的随机数生成器
+
+    Returns:
+        pd.Series | None: 转换后的列，无法转换时为None
+    """
+    notna = series.notna().to_numpy()
+    n_valid = int(notna.sum())
+    if n_valid == 0:
+        return None
+
+    valid_positions = np.flatnonzero(notna)
+    positions = valid_positions
+    if n_valid > INFER_SAMPLE_ROWS:
+        positions = np.sort(rng.choice(valid_positions, INFER_SAMPLE_ROWS, replace=False))
+    sample = cast("pd.Series", series.iloc[positions])
+    # 样本即全部非空值时，样本的结论就是整列的结论
+    candidate_ratio = INFER_MATCH_RATIO if len(sample) == n_valid else INFER_REJECT_RATIO
+
+    if to_numeric and pd.to_numeric(sample, errors="coerce").notna().mean() >= candidate_ratio:
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().sum() >= INFER_MATCH_RATIO * n_valid:
+            return numeric
+
+    if to_datetime and sample.astype(str).str.match(DATETIME_PATTERN).mean() >= candidate_ratio:
+        try:
+            datetimes = pd.to_datetime(series, format=datetime_format, errors="coerce")
+        except Exception as e:
+            raise ValueError("日期时间转换失败") from e
+        if datetimes.notna().sum() >= INFER_MATCH_RATIO * n_valid:
+            return datetimes
+
+    if to_category:
+        max_categories = max(category_threshold * len(series), 1)
+        # 整列恰有 max_categories 个均匀分布的取值时，样本中的重复值最少;
+        # 样本中的重复值明显少于该情形的期望时，整列的唯一值数量几乎必然超过阈值。
+        # 样本大小使该期望约为50个以上，足以区分高基数列
+        size = max(INFER_SAMPLE_ROWS, int(np.sqrt(100 * max_categories)))
+        if size < n_valid:
+            picks = series.iloc[np.sort(rng.choice(valid_positions, size, replace=False))]
+            expected = size - max_categories * (1 - (1 - 1 / max_categories) ** size)
+            if size - picks.nunique() < expected - 4 * np.sqrt(expected):
+                return None
+        categorical = series.astype("category")
+        if len(categorical.cat.categories) < max_categories:
+            return categorical
+
+    return None
+
+
 class CleanMisalignedDataResult(TypedDict):
     """修复数据错位的结果"""
 
@@ -322,11 +378,17 @@ def handle_missing_values(
     """
     df = sources.read(dataset_id)
     try:
-        return _handle_missing_values_column(df, column, method) if column else _handle_missing_values_all(df, method)
+        result = _handle_missing_values_column(df, column, method) if column else _handle_missing_values_all(df, method)
     except Exception as e:
         logger.error(f"处理缺失值失败: {e}")
+        # 填充可能已修改了部分列
+        sources.mark_modified(dataset_id)
         return {"success": False, "message": f"处理缺失值失败: {e}", "affected_rows": 0, "error": str(e)}
 
+    if result["success"]:
+        sources.mark_modified(dataset_id)
+    return result
+
 
 def _handle_missing_values_column(
     df: pd.DataFrame,
@@ -458,36 +520,35 @@ class MissingValuesSummary(TypedDict):
     column_details: dict[str, dict[str, Any]]
 
 
-def get_missing_values_summary(df: pd.DataFrame) -> MissingValuesSummary:
+def get_missing_values_summary(df: pd.DataFrame, version: str | None = None) -> MissingValuesSummary:
     """
     获取缺失值摘要信息
 
     Args:
         df: 数据框
+        version: 数据版本号，提供时复用同一版本已计算的列统计
 
     Returns:
         缺失值摘要
     """
     try:
-        missing_summary = {}
-        total_missing = 0
-
-        for column in df.columns:
-            missing_count = df[column].isna().sum()
-            missing_percentage = (missing_count / len(df)) * 100
-
-            missing_summary[column] = {
-                "count": int(missing_count),
-                "percentage": round(missing_percentage, 2),
-                "data_type": str(df[column].dtype),
+        profile = profile_dataframe(df, version=version)
+        n_rows = profile.n_rows
+        missing_summary = {
+            column: {
+                "count": col.null_count,
+                "percentage": round(col.null_count / n_rows * 100, 2) if n_rows else 0.0,
+                "data_type": col.dtype,
             }
-
-            total_missing += missing_count
+            for column, col in profile.columns.items()
+        }
+        total_missing = profile.total_nulls
+        total_cells = n_rows * len(profile.columns)
 
         return {
-            "total_missing": int(total_missing),
-            "total_cells": len(df) * len(df.columns),
-            "missing_percentage": round((total_missing / (len(df) * len(df.columns))) * 100, 2),
+            "total_missing": total_missing,
+            "total_cells": total_cells,
+            "missing_percentage": round(total_missing / total_cells * 100, 2) if total_cells else 0.0,
             "columns_with_missing": sum(1 for info in missing_summary.values() if info["count"] > 0),
             "column_details": missing_summary,
         }
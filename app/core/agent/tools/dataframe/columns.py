@@ -88,6 +88,7 @@ def create_column(
 
         # 保存新列到目标数据集
         sources.read(target_dataset_id)[column_name] = new_series
+        sources.mark_modified(target_dataset_id)
 
         # 返回结果
         return {
@@ -2,6 +2,7 @@ from typing import Any, TypedDict, cast
 
 import pandas as pd
 
+from app.core.datasource.profile import profile_dataframe
 from app.log import logger
 from app.utils import escape_tag
 
@@ -31,6 +32,7 @@ class InspectDataframeResult(TypedDict, total=False):
 def inspect_dataframe(
     df: pd.DataFrame,
     options: InspectDataframeOptions | None = None,
+    version: str | None = None,
 ) -> InspectDataframeResult:
     """
     全面查看当前数据框的状态，包括数据结构、预览和统计摘要。
@@ -47,6 +49,7 @@ def inspect_dataframe(
             - n_rows (int): 预览的行数，默认5
             - include_columns (list): 仅包含指定列
             - exclude_columns (list): 排除指定列
+        version (str, optional): 数据版本号，提供时复用同一版本已计算的列统计
 
     Returns:
         dict: 包含数据框详细信息的结果
@@ -71,12 +74,14 @@ def inspect_dataframe(
         columns = [col for col in columns if col not in exclude_columns]
 
     filtered_df = cast("pd.DataFrame", df[columns])
+    # 各项统计都从同一份按列缓存的概况中读取
+    profile = profile_dataframe(df, columns, version=version)
 
     # 构建结果
     result: InspectDataframeResult = {
         "shape": filtered_df.shape,
         "preview": filtered_df.head(n_rows_preview).to_string(),
-        "memory_usage": f"{filtered_df.memory_usage(deep=True).sum() / 1048576:.3f} MB",
+        "memory_usage": f"{profile.memory_bytes / 1048576:.3f} MB",
     }
 
     # 只有当show_columns为True时才包含列列表
@@ -85,20 +90,18 @@ def inspect_dataframe(
 
     # 数据类型
     if show_dtypes:
-        result["dtypes"] = {col: str(filtered_df[col].dtype) for col in columns}
+        result["dtypes"] = {col: profile.columns[col].dtype for col in columns}
 
     # 空值数量
     if show_null_counts:
-        result["null_counts"] = {col: int(filtered_df[col].isna().sum()) for col in columns}
+        result["null_counts"] = {col: profile.columns[col].null_count for col in columns}
 
     # 统计摘要
-    if show_summary_stats:
-        numeric_cols = filtered_df.select_dtypes(include="number").columns
-        if not numeric_cols.empty:
-            result["summary_stats"] = {str(k): v for k, v in filtered_df[numeric_cols].describe().to_dict().items()}
+    if show_summary_stats and (summary_stats := profile.summary_stats()):
+        result["summary_stats"] = summary_stats
 
     # 唯一值数量
     if show_unique_counts:
-        result["unique_counts"] = {col: int(filtered_df[col].nunique()) for col in columns}
+        result["unique_counts"] = {col: profile.columns[col].unique_count for col in columns}
 
     return result
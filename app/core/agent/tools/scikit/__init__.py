@@ -15,8 +15,14 @@ from app.services.model_registry import model_registry
 from app.utils import escape_tag
 
 from ..registry import register_tool
-from .feature_importance import FeatureImportanceResult, analyze_feature_importance
-from .feature_select import FeatureSelectionResult, select_features
+from .feature_importance import (
+    DEFAULT_PLOT_DPI,
+    FeatureImportancePlot,
+    FeatureImportanceResult,
+    analyze_feature_importance,
+    find_trained_model,
+)
+from .feature_select import SAMPLE_ROWS, FeatureSelectionResult, select_features
 from .hyperparam import HyperparamOptResult, LearningCurveResult, optimize_hyperparameters, plot_learning_curve
 from .model import (
     EvaluateModelResult,
@@ -200,6 +206,7 @@ def fit_model_tool(
             random_state,
             hyperparams,
             dataset_id,
+            model_info.get("base_models"),
         )
 
         context.train_model_cache[model_id] = result
@@ -237,6 +244,8 @@ def create_composite_model_tool(
     """
     创建集成模型，组合多个已训练模型以提高性能。
     创建模型后，应使用fit_model_tool进行训练。
+    使用与基础模型相同的数据集、特征、目标变量、test_size和random_state训练时，
+    将直接复用已训练的基础模型，只训练元模型。
 
     Args:
         model_ids (list[str]): 已训练模型的ID列表，通过fit_model_tool获得
@@ -539,6 +548,13 @@ def predict_with_model_tool(
     return result
 
 
+def _plot_artifact(figure: FeatureImportancePlot | None, dpi: int) -> dict:
+    """按指定分辨率绘制特征重要性图表，dpi 为0时不绘制"""
+    if figure is None or dpi <= 0:
+        return {}
+    return {"type": "image", "base64_data": base64.b64encode(figure.render(dpi)).decode()}
+
+
 @tool(response_format="content_and_artifact")
 @register_tool("自动选择特征")
 def select_features_tool(
@@ -549,6 +565,8 @@ def select_features_tool(
     task_type: str = "auto",
     n_features: int | None = None,
     threshold: float | None = None,
+    sample_rows: int | None = SAMPLE_ROWS,
+    plot_dpi: int = DEFAULT_PLOT_DPI,
 ) -> tuple[FeatureSelectionResult, dict]:
     """
     使用多种方法自动选择最重要的特征子集。
@@ -568,6 +586,9 @@ def select_features_tool(
         task_type (str): 任务类型，"regression"、"classification"或"auto"(默认，自动检测)
         n_features (int, optional): 要选择的特征数量
         threshold (float, optional): 特征重要性阈值，只保留重要性大于阈值的特征
+        sample_rows (int, optional): 数据行数超过该值时在抽样样本上进行特征选择(分类任务按目标分层)，
+                                     结果中报告选择的置信度和处于选择边界的特征；设为0表示使用全部数据
+        plot_dpi (int): 特征重要性图表的分辨率(默认100)，设为0表示不生成图表
 
     Returns:
         dict: 包含选择结果的字典，包括选择的特征列表、特征重要性和相关统计信息
@@ -577,12 +598,16 @@ def select_features_tool(
         f"<g>开始特征选择</>，方法: <y>{escape_tag(method)}</>, 候选特征数: <c>{len(features)}</>"
     )
     result, figure = select_features(
-        context.sources.read(dataset_id), features, target, method, task_type, n_features, threshold
+        context.sources.read(dataset_id),
+        features,
+        target,
+        method,
+        task_type,
+        n_features,
+        threshold,
+        sample_rows=sample_rows,
     )
-    artifact = {}
-    if figure is not None:
-        artifact = {"type": "image", "base64_data": base64.b64encode(figure).decode()}
-    return result, artifact
+    return result, _plot_artifact(figure, plot_dpi)
 
 
 @tool(response_format="content_and_artifact")
@@ -593,9 +618,12 @@ def analyze_feature_importance_tool(
     target: str,
     method: str = "rf_importance",
     task_type: str = "auto",
+    n_repeats: int = 5,
+    plot_dpi: int = DEFAULT_PLOT_DPI,
 ) -> tuple[FeatureImportanceResult, dict]:
     """
     分析特征重要性，帮助理解哪些特征对目标变量影响最大。
+    如果已使用fit_model_tool在相同数据集、特征和目标变量上训练过模型，将直接复用该模型。
 
     Args:
         dataset_id (str): 操作的数据集ID。
@@ -608,6 +636,8 @@ def analyze_feature_importance_tool(
                         "xgboost" - XGBoost特征重要性
                         "mutual_info" - 互信息
         task_type (str): 任务类型，"regression"、"classification"或"auto"(默认，自动检测)
+        n_repeats (int): 排列重要性的重复次数(默认5，最多10)，仅用于permutation
+        plot_dpi (int): 特征重要性图表的分辨率(默认100)，设为0表示不生成图表
 
     Returns:
         dict: 包含特征重要性分析结果的字典
@@ -616,11 +646,10 @@ def analyze_feature_importance_tool(
     logger.opt(colors=True).info(
         f"<g>开始分析特征重要性</>，方法: <y>{escape_tag(method)}</>, 特征数: <c>{len(features)}</>"
     )
-    result, figure = analyze_feature_importance(context.sources.read(dataset_id), features, target, method, task_type)
-    artifact = {}
-    if figure is not None:
-        artifact = {"type": "image", "base64_data": base64.b64encode(figure).decode()}
-    return result, artifact
+    df = context.sources.read(dataset_id)
+    trained = find_trained_model(context.train_model_cache.values(), df, dataset_id, features, target)
+    result, figure = analyze_feature_importance(df, features, target, method, task_type, trained, n_repeats)
+    return result, _plot_artifact(figure, plot_dpi)
 
 
 @tool(response_format="content_and_artifact")
@@ -638,7 +667,7 @@ def optimize_hyperparameters_tool(
     n_iter: int = 20,
 ) -> tuple[HyperparamOptResult, dict]:
     """
-    使用网格搜索或随机搜索优化机器学习模型的超参数。
+    使用网格搜索、随机搜索或逐次减半搜索优化机器学习模型的超参数。
 
     Args:
         dataset_id (str): 操作的数据集ID。
@@ -652,11 +681,12 @@ def optimize_hyperparameters_tool(
                 - "ridge": 岭回归(仅回归)
                 - "lasso": Lasso回归(仅回归)
         task_type: 任务类型，"regression"、"classification"或"auto"(默认，自动检测)
-        method: 优化方法，"grid"(网格搜索)或"random"(随机搜索)，默认为random
+        method: 优化方法，"grid"(网格搜索)、"random"(随机搜索)、"halving_grid"(逐次减半网格搜索)
+                或"halving_random"(逐次减半随机搜索)，默认为random。数据量较大时推荐使用逐次减半搜索
         cv_folds: 交叉验证折数
         scoring: 评分指标，如"r2"(回归)、"accuracy"(分类)等
         param_grid: 超参数网格(字典或JSON字符串)，为None时使用预定义的网格
-        n_iter: 随机搜索的迭代次数(仅当method="random"时有效)
+        n_iter: 随机搜索的迭代次数(仅当method为"random"或"halving_random"时有效)
 
     Returns:
         优化结果，包含最佳参数、得分等
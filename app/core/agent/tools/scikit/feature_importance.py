@@ -1,20 +1,146 @@
+import collections
+import dataclasses
 import io
+import threading
+from collections.abc import Iterable
 from typing import Any, NotRequired, TypedDict, cast
 
 import numpy as np
 import pandas as pd
 
+from app.core.cpu import cpu_tokens
 from app.log import logger
 from app.utils import configure_matplotlib, escape_tag
 
+from .model import MODEL_TASK_TYPE, TrainModelResult, data_fingerprint
 
-def _create_feature_importance_plot(feature_importance: dict[str, float]) -> bytes:
+# 特征重要性图表的默认分辨率
+DEFAULT_PLOT_DPI = 100
+# 排列重要性的最大重复次数，以及参与排列的最大样本数
+MAX_PERMUTATION_REPEATS = 10
+PERMUTATION_MAX_SAMPLES = 10_000
+
+# 已训练随机森林的缓存: (数据指纹, 任务类型, 随机种子) -> 模型
+_forest_cache: collections.OrderedDict[tuple[str, str, int], Any] = collections.OrderedDict()
+_forest_cache_lock = threading.Lock()
+_FOREST_CACHE_SIZE = 4
+
+
+def fit_random_forest(X: pd.DataFrame, y: pd.Series, task_type: str, random_state: int = 42) -> Any:
+    """
+    训练随机森林
+
+    相同数据上的训练结果在特征重要性和特征选择的各方法(随机森林重要性、排列重要性、RFE)之间共享，
+    返回的模型不应被修改。
+
+    Args:
+        X: 特征数据
+        y: 目标变量
+        task_type: 任务类型
+        random_state: 随机种子
+
+    Returns:
+        RandomForestRegressor | RandomForestClassifier: 训练好的模型
+    """
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    key = (fingerprint, task_type, random_state) if (fingerprint := data_fingerprint(X, y)) else None
+    if key is not None:
+        with _forest_cache_lock:
+            if (model := _forest_cache.get(key)) is not None:
+                _forest_cache.move_to_end(key)
+                logger.opt(colors=True).debug("复用已训练的<y>随机森林</>模型")
+                return model
+
+    if task_type == "regression":
+        model = RandomForestRegressor(n_estimators=100, random_state=random_state)
+    else:
+        model = RandomForestClassifier(n_estimators=100, random_state=random_state)
+
+    with cpu_tokens(name="随机森林") as n_jobs:
+        model.set_params(n_jobs=n_jobs).fit(X, y)
+    # 调用方可能在多个进程中并行使用模型，模型自身不再并行
+    model.set_params(n_jobs=1)
+
+    if key is not None:
+        with _forest_cache_lock:
+            _forest_cache[key] = model
+            while len(_forest_cache) > _FOREST_CACHE_SIZE:
+                _forest_cache.popitem(last=False)
+    return model
+
+
+def find_trained_model(
+    models: Iterable[TrainModelResult],
+    df: pd.DataFrame,
+    dataset_id: str,
+    features: list[str],
+    target: str,
+) -> TrainModelResult | None:
+    """
+    查找在相同数据集、特征和目标变量上训练的模型
+
+    模型的测试集必须与当前数据一致，数据集被修改后不会复用旧模型。
+
+    Args:
+        models: 已训练的模型，靠后的优先
+        df: 当前数据
+        dataset_id: 数据集ID
+        features: 特征列表
+        target: 目标变量列名
+
+    Returns:
+        TrainModelResult | None: 匹配的模型，没有时返回None
+    """
+    for trained in reversed(list(models)):
+        if (
+            trained.dataset_id != dataset_id
+            or trained.target_column != target
+            or set(trained.feature_columns) != set(features)
+            or len(trained.feature_columns) != len(features)
+        ):
+            continue
+        X_test = trained.X_test
+        if not isinstance(X_test, pd.DataFrame) or not X_test.index.isin(df.index).all():
+            continue
+        if df.loc[X_test.index, trained.feature_columns].equals(X_test):
+            return trained
+    return None
+
+
+@dataclasses.dataclass(eq=False)
+class FeatureImportancePlot:
+    """
+    特征重要性图表
+
+    只在调用方需要时按其指定的分辨率绘制，相同分辨率只绘制一次。
+    """
+
+    feature_importance: dict[str, float]
+    _rendered: dict[int, bytes] = dataclasses.field(default_factory=dict, repr=False)
+
+    def render(self, dpi: int = DEFAULT_PLOT_DPI) -> bytes:
+        """
+        绘制图表
+
+        Args:
+            dpi: 图片分辨率
+
+        Returns:
+            bytes: PNG 图片数据
+        """
+        if dpi not in self._rendered:
+            self._rendered[dpi] = _create_feature_importance_plot(self.feature_importance, dpi)
+        return self._rendered[dpi]
+
+
+def _create_feature_importance_plot(feature_importance: dict[str, float], dpi: int = DEFAULT_PLOT_DPI) -> bytes:
+    """创建特征重要性图表并返回字节数据"""
     configure_matplotlib()
 
     import matplotlib.pyplot as plt
     from matplotlib.font_manager import FontProperties
 
-    """创建特征重要性图表并返回字节数据"""
     plt.figure(figsize=(10, 6))
 
     # 获取按重要性排序的特征
@@ -48,7 +174,7 @@ def _create_feature_importance_plot(feature_importance: dict[str, float]) -> byt
 
     # 将图表保存为字节数据
     buffer = io.BytesIO()
-    plt.savefig(buffer, format="png", dpi=300, bbox_inches="tight")
+    plt.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
     plt.close()
     buffer.seek(0)
 
@@ -68,7 +194,9 @@ def analyze_feature_importance(
     target: str,
     method: str = "rf_importance",
     task_type: str = "auto",
-) -> tuple[FeatureImportanceResult, bytes | None]:
+    trained: TrainModelResult | None = None,
+    n_repeats: int = 5,
+) -> tuple[FeatureImportanceResult, FeatureImportancePlot | None]:
     """
     分析特征重要性，但不进行特征选择。
 
@@ -83,9 +211,13 @@ def analyze_feature_importance(
                       "xgboost" - XGBoost特征重要性
                       "mutual_info" - 互信息
         task_type (str): 任务类型，"regression"或"classification"，"auto"将自动检测
+        trained (TrainModelResult, optional): 在相同特征和目标变量上已训练的模型(见 `find_trained_model`)。
+                      rf_importance 和 xgboost 在模型类型一致时直接使用其特征重要性，
+                      permutation 在其测试集上计算排列重要性，均不再重新训练
+        n_repeats (int): 排列重要性的重复次数，最多为 MAX_PERMUTATION_REPEATS
 
     Returns:
-        FeatureImportanceResult: 包含特征重要性的结果
+        tuple: (包含特征重要性的结果, 特征重要性图表)，图表在调用 `render` 时才绘制
     """
     # 验证输入参数
     if not all(f in df.columns for f in features):
@@ -96,14 +228,17 @@ def analyze_feature_importance(
         raise ValueError(f"目标列 '{target}' 不存在于数据中")
 
     fns = {
+        "linear_model": _analyze_feature_importance_coefficients,
+        "mutual_info": _analyze_feature_importance_mutual_info,
+    }
+    # 可以复用已训练模型的方法
+    model_fns = {
         "rf_importance": _analyze_feature_importance_rf,
         "permutation": _analyze_feature_importance_permutation,
-        "linear_model": _analyze_feature_importance_coefficients,
         "xgboost": _analyze_feature_importance_xgboost,
-        "mutual_info": _analyze_feature_importance_mutual_info,
     }
 
-    if method not in fns:
+    if method not in fns and method not in model_fns:
         raise ValueError(f"不支持的特征重要性计算方法 '{method}'")
 
     X = cast("pd.DataFrame", df[features].copy())
@@ -116,44 +251,55 @@ def analyze_feature_importance(
         else:
             task_type = "regression"
 
+    if trained is not None and MODEL_TASK_TYPE.get(trained.model_type) != task_type:
+        trained = None
+
     logger.opt(colors=True).info(
         f"<g>开始特征重要性分析</>，方法: <y>{escape_tag(method)}</>，任务类型: <e>{escape_tag(task_type)}</>"
     )
 
     # 初始化结果
     result: FeatureImportanceResult = {"feature_importance": {}, "message": ""}
-    figure: bytes | None = None
 
     try:
-        result, figure = fns[method](task_type, X, y, features, result)
+        if method in model_fns:
+            result = model_fns[method](task_type, X, y, features, result, trained, n_repeats)
+        else:
+            result = fns[method](task_type, X, y, features, result)
     except Exception as e:
         logger.opt(colors=True).exception("<r>特征重要性分析失败</>")
         result["message"] = f"特征重要性分析失败: {e}"
 
+    figure = FeatureImportancePlot(result["feature_importance"]) if result["feature_importance"] else None
     return result, figure
 
 
+def _reused_importances(trained: TrainModelResult, features: list[str], result: FeatureImportanceResult) -> np.ndarray:
+    """按 features 的顺序取出已训练模型的特征重要性"""
+    model = cast("Any", trained.model)
+    importances = dict(zip(trained.feature_columns, model.feature_importances_, strict=True))
+    result.setdefault("additional_info", {})["reused_model"] = trained.model_type
+    logger.opt(colors=True).info(f"复用已训练的 <e>{escape_tag(trained.model_type)}</e> 模型的特征重要性")
+    return np.array([importances[f] for f in features])
+
+
 def _analyze_feature_importance_rf(
     task_type: str,
     X: pd.DataFrame,
     y: pd.Series,
     features: list[str],
     result: FeatureImportanceResult,
-) -> tuple[FeatureImportanceResult, bytes]:
+    trained: TrainModelResult | None,
+    _n_repeats: int,
+) -> FeatureImportanceResult:
     """使用随机森林模型计算特征重要性"""
-    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-
-    # 选择基础模型
-    if task_type == "regression":
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model: Any
+    if trained is not None and trained.model_type.startswith("random_forest"):
+        model = trained.model
+        importances = _reused_importances(trained, features, result)
     else:
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-
-    # 训练模型
-    model.fit(X, y)
-
-    # 获取特征重要性
-    importances = model.feature_importances_
+        model = fit_random_forest(X, y, task_type)
+        importances = model.feature_importances_
 
     # 创建特征重要性字典
     feature_importance = {features[i]: importances[i] for i in range(len(features))}
@@ -173,16 +319,14 @@ def _analyze_feature_importance_rf(
     if hasattr(model, "estimators_"):
         # 计算每棵树的特征重要性
         all_importances = np.array([tree.feature_importances_ for tree in model.estimators_])
-        std_importances = np.std(all_importances, axis=0)
-        std_importance = {features[i]: std_importances[i] for i in range(len(features))}
+        model_features = getattr(model, "feature_names_in_", features)
+        std_importances = dict(zip(model_features, np.std(all_importances, axis=0), strict=True))
+        std_importance = {f: std_importances[f] for f in features}
         if "additional_info" not in result:
             result["additional_info"] = {}
         result["additional_info"]["std_importance"] = std_importance
 
-    # 创建图表
-    figure = _create_feature_importance_plot(feature_importance)
-
-    return result, figure
+    return result
 
 
 def _analyze_feature_importance_permutation(
@@ -191,27 +335,41 @@ def _analyze_feature_importance_permutation(
     y: pd.Series,
     features: list[str],
     result: FeatureImportanceResult,
-) -> tuple[FeatureImportanceResult, bytes]:
+    trained: TrainModelResult | None,
+    n_repeats: int,
+) -> FeatureImportanceResult:
     """使用排列重要性方法计算特征重要性"""
-    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
     from sklearn.inspection import permutation_importance
 
-    # 选择基础模型
-    if task_type == "regression":
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+    if trained is not None:
+        # 在已训练模型的测试集上计算，不再训练新模型
+        model, X_eval, y_eval = trained.model, trained.X_test, trained.Y_test
+        columns = trained.feature_columns
+        result.setdefault("additional_info", {})["reused_model"] = trained.model_type
+        logger.opt(colors=True).info(f"在已训练的 <e>{escape_tag(trained.model_type)}</e> 模型的测试集上计算排列重要性")
     else:
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-
-    # 训练模型
-    model.fit(X, y)
-
-    # 计算排列重要性
-    perm_importance = permutation_importance(
-        model, X, y, n_repeats=10, random_state=42, scoring="r2" if task_type == "regression" else "accuracy"
-    )
+        model, X_eval, y_eval, columns = fit_random_forest(X, y, task_type), X, y, features
+
+    n_repeats = min(max(n_repeats, 1), MAX_PERMUTATION_REPEATS)
+    max_samples = min(len(X_eval), PERMUTATION_MAX_SAMPLES)
+
+    # 计算排列重要性，各特征的排列在多个进程中并行计算
+    with cpu_tokens(name="排列重要性") as n_jobs:
+        perm_importance = permutation_importance(
+            model,
+            X_eval,
+            y_eval,
+            n_repeats=n_repeats,
+            random_state=42,
+            scoring="r2" if task_type == "regression" else "accuracy",
+            n_jobs=n_jobs,
+            max_samples=max_samples,
+        )
 
     # 创建特征重要性字典
-    feature_importance = {features[i]: perm_importance["importances_mean"][i] for i in range(len(features))}
+    importances_mean = dict(zip(columns, perm_importance["importances_mean"], strict=True))
+    importances_std = dict(zip(columns, perm_importance["importances_std"], strict=True))
+    feature_importance = {f: importances_mean[f] for f in features}
 
     # 按重要性降序排列
     feature_importance = dict(sorted(feature_importance.items(), key=lambda x: x[1], reverse=True))
@@ -226,15 +384,14 @@ def _analyze_feature_importance_permutation(
         result["importance_percent"] = importance_percent
 
     # 添加标准差到额外信息
-    std_importance = {features[i]: perm_importance["importances_std"][i] for i in range(len(features))}
+    std_importance = {f: importances_std[f] for f in features}
     if "additional_info" not in result:
         result["additional_info"] = {}
     result["additional_info"]["std_importance"] = std_importance
+    result["additional_info"]["n_repeats"] = n_repeats
+    result["additional_info"]["n_samples"] = max_samples
 
-    # 创建图表
-    figure = _create_feature_importance_plot(feature_importance)
-
-    return result, figure
+    return result
 
 
 def _analyze_feature_importance_coefficients(
@@ -243,7 +400,7 @@ def _analyze_feature_importance_coefficients(
     y: pd.Series,
     features: list[str],
     result: FeatureImportanceResult,
-) -> tuple[FeatureImportanceResult, bytes]:
+) -> FeatureImportanceResult:
     """使用线性模型系数的绝对值作为特征重要性"""
     from sklearn.preprocessing import StandardScaler
 
@@ -262,7 +419,8 @@ def _analyze_feature_importance_coefficients(
 
         model = LogisticRegression(penalty="l2", C=1.0, solver="liblinear")
 
-    model.fit(X_scaled, y)
+    with cpu_tokens(want=1, name="线性模型特征重要性"):
+        model.fit(X_scaled, y)
 
     # 获取系数
     if task_type == "classification" and model.coef_.ndim > 1 and model.coef_.shape[0] > 1:
@@ -285,10 +443,7 @@ def _analyze_feature_importance_coefficients(
     importance_percent = {f: imp / total_importance * 100 for f, imp in feature_importance.items()}
     result["importance_percent"] = importance_percent
 
-    # 创建图表
-    figure = _create_feature_importance_plot(feature_importance)
-
-    return result, figure
+    return result
 
 
 def _analyze_feature_importance_xgboost(
@@ -297,20 +452,27 @@ def _analyze_feature_importance_xgboost(
     y: pd.Series,
     features: list[str],
     result: FeatureImportanceResult,
-) -> tuple[FeatureImportanceResult, bytes]:
+    trained: TrainModelResult | None,
+    _n_repeats: int,
+) -> FeatureImportanceResult:
     """使用XGBoost计算特征重要性"""
-    import xgboost as xgb
-
-    # 准备数据
-    if task_type == "regression":
-        model = xgb.XGBRegressor(n_estimators=100, random_state=42)
+    if trained is not None and trained.model_type.startswith("xgboost"):
+        importances = _reused_importances(trained, features, result)
     else:
-        model = xgb.XGBClassifier(n_estimators=100, random_state=42)
+        import xgboost as xgb
+
+        # 准备数据
+        if task_type == "regression":
+            model = xgb.XGBRegressor(n_estimators=100, random_state=42)
+        else:
+            model = xgb.XGBClassifier(n_estimators=100, random_state=42)
 
-    model.fit(X, y)
+        # XGBoost 默认使用所有核心
+        with cpu_tokens(name="XGBoost特征重要性") as n_jobs:
+            model.set_params(n_jobs=n_jobs).fit(X, y)
 
-    # 获取特征重要性
-    importances = model.feature_importances_
+        # 获取特征重要性
+        importances = model.feature_importances_
 
     # 创建特征重要性字典
     feature_importance = {features[i]: importances[i] for i in range(len(features))}
@@ -326,10 +488,7 @@ def _analyze_feature_importance_xgboost(
     importance_percent = {f: imp / total_importance * 100 for f, imp in feature_importance.items()}
     result["importance_percent"] = importance_percent
 
-    # 创建图表
-    figure = _create_feature_importance_plot(feature_importance)
-
-    return result, figure
+    return result
 
 
 def _analyze_feature_importance_mutual_info(
@@ -338,7 +497,7 @@ def _analyze_feature_importance_mutual_info(
     y: pd.Series,
     features: list[str],
     result: FeatureImportanceResult,
-) -> tuple[FeatureImportanceResult, bytes]:
+) -> FeatureImportanceResult:
     """使用互信息计算特征重要性"""
     from sklearn.feature_selection import mutual_info_classif, mutual_info_regression
 
@@ -362,7 +521,4 @@ def _analyze_feature_importance_mutual_info(
     importance_percent = {f: imp / total_importance * 100 for f, imp in feature_importance.items()}
     result["importance_percent"] = importance_percent
 
-    # 创建图表
-    figure = _create_feature_importance_plot(feature_importance)
-
-    return result, figure
+    return result
@@ -3,10 +3,19 @@ from typing import Any, TypedDict, cast
 import numpy as np
 import pandas as pd
 
+from app.core.cpu import cpu_tokens
 from app.log import logger
 from app.utils import escape_tag
 
-from .feature_importance import _create_feature_importance_plot
+from .feature_importance import FeatureImportancePlot, fit_random_forest
+
+# 超过该行数时在分层抽样的样本上进行特征选择
+SAMPLE_ROWS = 20_000
+# 超过该特征数时，递归特征消除每轮删除 WIDE_STEP 比例的特征
+WIDE_FEATURES = 50
+WIDE_STEP = 0.1
+# 按随机森林重要性阈值选择的方法，其置信度由各棵树的重要性标准误估计
+_TREE_STDERR_METHODS = {"rf_importance"}
 
 
 class FeatureSelectionResult(TypedDict):
@@ -28,7 +37,9 @@ def select_features(
     n_features: int | None = None,
     threshold: float | None = None,
     cv_folds: int = 5,
-) -> tuple[FeatureSelectionResult, bytes | None]:
+    sample_rows: int | None = SAMPLE_ROWS,
+    random_state: int = 42,
+) -> tuple[FeatureSelectionResult, FeatureImportancePlot | None]:
     """
     使用多种方法进行特征选择。
 
@@ -48,9 +59,12 @@ def select_features(
         n_features (int, optional): 要选择的特征数量，method为rfe时必须提供
         threshold (float, optional): 特征重要性阈值，只保留重要性大于阈值的特征
         cv_folds (int): 交叉验证折数，用于rfecv方法
+        sample_rows (int, optional): 数据行数超过该值时在(分类任务按目标分层的)抽样样本上进行特征选择，
+                                     并在 additional_info["sampling"] 中报告选择结果的置信度；0或None表示不抽样
+        random_state (int): 抽样的随机种子
 
     Returns:
-        FeatureSelectionResult: 包含选择结果的字典
+        tuple: (包含选择结果的字典, 特征重要性图表)，图表在调用 `render` 时才绘制
     """
     # 验证输入参数
     if not all(f in df.columns for f in features):
@@ -77,41 +91,38 @@ def select_features(
     if cast("pd.Series", X.isna().any()).any():
         logger.opt(colors=True).warning("<y>数据中包含缺失值</>，这可能影响特征选择结果")
 
+    # 大数据集在抽样样本上进行特征选择
+    sampling: dict[str, Any] | None = None
+    if sample_rows and len(X) > sample_rows:
+        n_rows = len(X)
+        X, y, stratified = _sample_rows(X, y, task_type, sample_rows, random_state)
+        sampling = {"total_rows": n_rows, "sample_rows": len(X), "stratified": stratified}
+        logger.opt(colors=True).info(
+            f"数据共 <c>{n_rows}</> 行，"
+            f"在<y>{'分层' if stratified else '随机'}抽样</>的 <c>{len(X)}</> 行上进行特征选择"
+        )
+
     # 初始化结果
-    result: FeatureSelectionResult = {
-        "selected_features": [],
-        "feature_importance": {},
-        "message": "",
-        "n_features_original": len(features),
-        "n_features_selected": 0,
-        "method_used": method,
-        "additional_info": {},
-    }
+    result = _empty_result(features, method)
 
     # 使用不同的方法进行特征选择
     try:
-        match method:
-            case "rf_importance":
-                result = _select_by_random_forest(X, y, features, task_type, threshold, result)
-            case "lasso":
-                result = _select_by_lasso(X, y, features, task_type, threshold, result)
-            case "rfe":
-                if n_features is None:
-                    raise ValueError("使用RFE方法时必须提供n_features参数")
-                result = _select_by_rfe(X, y, features, task_type, n_features, result)
-            case "rfecv":
-                result = _select_by_rfecv(X, y, features, task_type, cv_folds, result)
-            case "mutual_info":
-                result = _select_by_mutual_info(X, y, features, task_type, n_features, threshold, result)
-            case "f_regression" if task_type == "regression":
-                result = _select_by_f_regression(X, y, features, n_features, threshold, result)
-            case "chi2" if task_type == "classification":
-                # 检查是否有负值，chi2要求非负值
-                if (X < 0).any().any():
-                    raise ValueError("Chi2方法要求所有特征值非负，请预处理数据后再使用此方法")
-                result = _select_by_chi2(X, y, features, n_features, threshold, result)
-            case _:
-                raise ValueError(f"不支持的方法 '{method}' 或方法与任务类型 '{task_type}' 不匹配")
+        result = _run_method(method, X, y, features, task_type, n_features, threshold, cv_folds, result)
+        if sampling is not None:
+            sampling.update(
+                _selection_confidence(
+                    method, X, y, features, task_type, n_features, threshold, cv_folds, result, random_state
+                )
+            )
+            result["additional_info"]["sampling"] = sampling
+            result["message"] += (
+                f"\n基于 {sampling['total_rows']} 行中{'分层' if sampling['stratified'] else '随机'}抽样的 "
+                f"{sampling['sample_rows']} 行，选择结果置信度: {sampling['confidence']:.2f}"
+            )
+            if uncertain := sampling["uncertain_features"]:
+                result["message"] += f"，处于选择边界的特征: {', '.join(uncertain[:10])}"
+                if len(uncertain) > 10:
+                    result["message"] += f" 等 {len(uncertain)} 个"
 
     except Exception as e:
         logger.opt(colors=True).exception("<r>特征选择过程中发生错误</>")
@@ -125,10 +136,8 @@ def select_features(
     if result["n_features_selected"] == 0:
         result["message"] += "\n警告: 没有特征被选择。请尝试调整阈值或使用不同的方法。"
 
-    # 创建特征重要性图表
-    figure = None
-    if result["feature_importance"]:
-        figure = _create_feature_importance_plot(result["feature_importance"])
+    # 特征重要性图表由调用方按需绘制
+    figure = FeatureImportancePlot(result["feature_importance"]) if result["feature_importance"] else None
 
     logger.opt(colors=True).info(
         f"<g>特征选择完成</>。"
@@ -138,24 +147,161 @@ def select_features(
     return result, figure
 
 
-def _select_by_random_forest(
+def _run_method(
+    method: str,
     X: pd.DataFrame,
     y: pd.Series,
     features: list[str],
     task_type: str,
+    n_features: int | None,
     threshold: float | None,
+    cv_folds: int,
     result: FeatureSelectionResult,
 ) -> FeatureSelectionResult:
-    """使用随机森林特征重要性进行特征选择"""
-    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    match method:
+        case "rf_importance":
+            return _select_by_random_forest(X, y, features, task_type, threshold, result)
+        case "lasso":
+            return _select_by_lasso(X, y, features, task_type, threshold, result)
+        case "rfe":
+            if n_features is None:
+                raise ValueError("使用RFE方法时必须提供n_features参数")
+            return _select_by_rfe(X, y, features, task_type, n_features, result)
+        case "rfecv":
+            return _select_by_rfecv(X, y, features, task_type, cv_folds, result)
+        case "mutual_info":
+            return _select_by_mutual_info(X, y, features, task_type, n_features, threshold, result)
+        case "f_regression" if task_type == "regression":
+            return _select_by_f_regression(X, y, features, n_features, threshold, result)
+        case "chi2" if task_type == "classification":
+            # 检查是否有负值，chi2要求非负值
+            if (X < 0).any().any():
+                raise ValueError("Chi2方法要求所有特征值非负，请预处理数据后再使用此方法")
+            return _select_by_chi2(X, y, features, n_features, threshold, result)
+        case _:
+            raise ValueError(f"不支持的方法 '{method}' 或方法与任务类型 '{task_type}' 不匹配")
+
+
+def _sample_rows(
+    X: pd.DataFrame,
+    y: pd.Series,
+    task_type: str,
+    n_rows: int,
+    random_state: int,
+) -> tuple[pd.DataFrame, pd.Series, bool]:
+    """
+    抽取样本，分类任务在各类别样本足够时按目标变量分层
 
-    if task_type == "regression":
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-    else:
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
+    Returns:
+        tuple: (特征样本, 目标样本, 是否分层抽样)
+    """
+    from sklearn.model_selection import train_test_split
 
-    model.fit(X, y)
-    importances = model.feature_importances_
+    if task_type == "classification":
+        try:
+            X_s, _, y_s, _ = train_test_split(X, y, train_size=n_rows, stratify=y, random_state=random_state)
+            return cast("pd.DataFrame", X_s), cast("pd.Series", y_s), True
+        except ValueError:
+            # 某些类别样本过少，退化为随机抽样
+            pass
+
+    X_s, _, y_s, _ = train_test_split(X, y, train_size=n_rows, random_state=random_state)
+    return cast("pd.DataFrame", X_s), cast("pd.Series", y_s), False
+
+
+def _selection_confidence(
+    method: str,
+    X: pd.DataFrame,
+    y: pd.Series,
+    features: list[str],
+    task_type: str,
+    n_features: int | None,
+    threshold: float | None,
+    cv_folds: int,
+    result: FeatureSelectionResult,
+    random_state: int,
+) -> dict[str, Any]:
+    """
+    估计抽样样本上特征选择结果的置信度
+
+    随机森林重要性方法: 以各棵树的特征重要性估计标准误，
+    重要性与选择边界的距离小于 1.96 倍标准误的特征视为不确定，置信度为确定的已选特征比例。
+    其他方法(包括不以重要性阈值选择的 RFE/RFECV): 将样本分为两半分别进行特征选择，
+    置信度为两次选择结果的 Jaccard 相似度。
+
+    Returns:
+        dict: 包含 confidence、uncertain_features 和 confidence_method
+    """
+    selected = set(result["selected_features"])
+
+    if method in _TREE_STDERR_METHODS:
+        forest = fit_random_forest(X, y, task_type)
+        per_tree = np.array([tree.feature_importances_ for tree in forest.estimators_])
+        importances = per_tree.mean(axis=0)
+        stderr = per_tree.std(axis=0, ddof=1) / np.sqrt(len(per_tree))
+        mask = np.array([f in selected for f in features])
+        uncertain: list[str] = []
+        if mask.any() and not mask.all():
+            # 选择边界取已选特征最低重要性与未选特征最高重要性的中点
+            cutoff = (importances[mask].min() + importances[~mask].max()) / 2
+            uncertain = [
+                f for f, imp, se in zip(features, importances, stderr, strict=True) if abs(imp - cutoff) < 1.96 * se
+            ]
+        confidence = 1 - len(selected.intersection(uncertain)) / max(len(selected), 1)
+        return {"confidence": confidence, "uncertain_features": uncertain, "confidence_method": "tree_stderr"}
+
+    X_a, X_b, y_a, y_b = _split_half(X, y, task_type, random_state)
+    halves = []
+    for X_half, y_half in ((X_a, y_a), (X_b, y_b)):
+        half = _empty_result(features, method)
+        half = _run_method(method, X_half, y_half, features, task_type, n_features, threshold, cv_folds, half)
+        halves.append(set(half["selected_features"]))
+    union = halves[0] | halves[1]
+    confidence = len(halves[0] & halves[1]) / len(union) if union else 1.0
+    uncertain = [f for f in features if f in union and f not in halves[0] & halves[1]]
+    return {"confidence": confidence, "uncertain_features": uncertain, "confidence_method": "split_half"}
+
+
+def _split_half(
+    X: pd.DataFrame, y: pd.Series, task_type: str, random_state: int
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
+    from sklearn.model_selection import train_test_split
+
+    stratify = y if task_type == "classification" else None
+    try:
+        splits = train_test_split(X, y, test_size=0.5, stratify=stratify, random_state=random_state)
+    except ValueError:
+        splits = train_test_split(X, y, test_size=0.5, random_state=random_state)
+    return cast("tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]", tuple(splits))
+
+
+def _empty_result(features: list[str], method: str) -> FeatureSelectionResult:
+    return {
+        "selected_features": [],
+        "feature_importance": {},
+        "message": "",
+        "n_features_original": len(features),
+        "n_features_selected": 0,
+        "method_used": method,
+        "additional_info": {},
+    }
+
+
+def _elimination_step(n_features: int) -> int | float:
+    """递归特征消除每轮删除的特征数，宽表按比例删除"""
+    return WIDE_STEP if n_features > WIDE_FEATURES else 1
+
+
+def _select_by_random_forest(
+    X: pd.DataFrame,
+    y: pd.Series,
+    features: list[str],
+    task_type: str,
+    threshold: float | None,
+    result: FeatureSelectionResult,
+) -> FeatureSelectionResult:
+    """使用随机森林特征重要性进行特征选择"""
+    importances = fit_random_forest(X, y, task_type).feature_importances_
 
     # 创建特征重要性字典
     feature_importance = {features[i]: importances[i] for i in range(len(features))}
@@ -249,20 +395,8 @@ def _select_by_rfe(
     X: pd.DataFrame, y: pd.Series, features: list[str], task_type: str, n_features: int, result: FeatureSelectionResult
 ) -> FeatureSelectionResult:
     """使用递归特征消除进行特征选择"""
-    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-    from sklearn.feature_selection import RFE
-
-    if task_type == "regression":
-        estimator = RandomForestRegressor(n_estimators=100, random_state=42)
-    else:
-        estimator = RandomForestClassifier(n_estimators=100, random_state=42)
-
-    rfe = RFE(estimator=estimator, n_features_to_select=n_features)
-    rfe.fit(X, y)
-
-    # 获取特征排名和掩码
-    ranking = rfe.ranking_
-    mask = rfe.support_
+    step = _elimination_step(len(features))
+    mask, ranking = _recursive_elimination(X, y, task_type, n_features, step)
 
     # 创建特征重要性字典 (反转排名使得1是最重要的)
     max_rank = max(ranking)
@@ -280,10 +414,55 @@ def _select_by_rfe(
 
     # 添加特征排名到额外信息
     result["additional_info"]["feature_ranking"] = {features[i]: int(ranking[i]) for i in range(len(features))}
+    result["additional_info"]["elimination_step"] = step
 
     return result
 
 
+def _recursive_elimination(
+    X: pd.DataFrame,
+    y: pd.Series,
+    task_type: str,
+    n_features: int,
+    step: int | float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    以随机森林为基础模型的递归特征消除
+
+    与 `sklearn.feature_selection.RFE` 的消除过程一致，
+    第一轮使用与其他方法共享的全特征随机森林，不再重复训练。
+
+    Args:
+        X: 特征数据
+        y: 目标变量
+        task_type: 任务类型
+        n_features: 要选择的特征数量
+        step: 每轮删除的特征数，小于1时为按初始特征数计算的比例
+
+    Returns:
+        tuple: (特征掩码, 特征排名)
+    """
+    from sklearn.base import clone
+
+    total = X.shape[1]
+    if 0 < step < 1:
+        step = max(1, int(step * total))
+    support = np.ones(total, dtype=bool)
+    ranking = np.ones(total, dtype=int)
+
+    forest = fit_random_forest(X, y, task_type)
+    with cpu_tokens(name="RFE") as n_jobs:
+        while (remaining := int(support.sum())) > n_features:
+            indices = np.flatnonzero(support)
+            if remaining < total:
+                forest = clone(forest).set_params(n_jobs=n_jobs).fit(X.iloc[:, indices], y)
+            order = np.argsort(forest.feature_importances_)
+            support[indices[order][: min(int(step), remaining - n_features)]] = False
+            ranking[~support] += 1
+
+    return support, ranking
+
+
 def _select_by_rfecv(
     X: pd.DataFrame,
     y: pd.Series,
@@ -301,8 +480,13 @@ def _select_by_rfecv(
     else:
         estimator = RandomForestClassifier(n_estimators=100, random_state=42)
 
-    rfecv = RFECV(estimator=estimator, cv=cv_folds, scoring="r2" if task_type == "regression" else "accuracy")
-    rfecv.fit(X, y)
+    step = _elimination_step(len(features))
+    rfecv = RFECV(
+        estimator=estimator, step=step, cv=cv_folds, scoring="r2" if task_type == "regression" else "accuracy"
+    )
+    # 各折在多个进程中并行计算，估计器内部不再并行
+    with cpu_tokens(name="RFECV") as n_jobs:
+        rfecv.set_params(n_jobs=n_jobs).fit(X, y)
 
     # 获取特征排名和掩码
     ranking = rfecv.ranking_
@@ -328,6 +512,7 @@ def _select_by_rfecv(
     result["additional_info"]["feature_ranking"] = {features[i]: int(ranking[i]) for i in range(len(features))}
     result["additional_info"]["cv_scores"] = rfecv.cv_results_["mean_test_score"].tolist()
     result["additional_info"]["optimal_n_features"] = int(rfecv.n_features_)
+    result["additional_info"]["elimination_step"] = step
 
     return result
 
@@ -1,19 +1,22 @@
+import collections
 import inspect
 import io
-import sys
+import threading
 import time
+import warnings
 from typing import TYPE_CHECKING, Any, TypedDict
 
 import numpy as np
 import pandas as pd
 
+from app.core.cpu import cpu_tokens
 from app.log import logger
 from app.utils import configure_matplotlib, escape_tag, resolve_dot_notation
 
-from .model import TaskType
+from .model import TaskType, data_fingerprint
 
 if TYPE_CHECKING:
-    from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
+    from sklearn.model_selection._search_successive_halving import BaseSuccessiveHalving
 
 
 class HyperparamOptResult(TypedDict):
@@ -31,6 +34,184 @@ class HyperparamOptResult(TypedDict):
     param_importance: dict[str, float]
 
 
+# (数据指纹, 估计器参数, 评分指标, 折数, 折序号, 训练样本数)
+type _FoldKey = tuple[str, str, str, int, int, int]
+
+
+class FoldScoreCache:
+    """
+    交叉验证单折得分缓存
+
+    缓存每个 (数据, 估计器参数, 评分指标, 折划分, 训练样本数) 的 (验证集得分, 训练集得分)。
+    超参数搜索与学习曲线使用相同的折划分，学习曲线在完整训练折上的得分直接复用搜索的结果。
+
+    Args:
+        maxsize: 缓存的最大条目数
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self._data: collections.OrderedDict[_FoldKey, tuple[float, float]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: _FoldKey) -> tuple[float, float] | None:
+        with self._lock:
+            if (value := self._data.get(key)) is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: _FoldKey, value: tuple[float, float]) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+fold_score_cache = FoldScoreCache()
+
+
+def _estimator_key(model: Any) -> str:
+    params = sorted(model.get_params(deep=False).items())
+    return f"{type(model).__module__}.{type(model).__qualname__}:{params!r}"
+
+
+def _detect_task_type(y: pd.Series, target: str) -> TaskType:
+    if y.dtype == "object" or y.dtype == "category" or len(y.unique()) < 10:
+        logger.opt(colors=True).info(f"自动检测到<y>分类任务</>，目标列: <e>{escape_tag(target)}</e>")
+        return "classification"
+    logger.opt(colors=True).info(f"自动检测到<y>回归任务</>，目标列: <e>{escape_tag(target)}</e>")
+    return "regression"
+
+
+def _resolve_scoring(task_type: str, scoring: str | None) -> tuple[str, str]:
+    """返回 (评分指标名称, sklearn 评分器名称)"""
+    if scoring is None:
+        scoring = "r2" if task_type == "regression" else "accuracy"
+    if task_type == "regression":
+        return scoring, {"rmse": "neg_root_mean_squared_error", "mse": "neg_mean_squared_error"}.get(scoring, scoring)
+    return scoring, scoring
+
+
+def _cv_splits(model: Any, X: pd.DataFrame, y: pd.Series, cv_folds: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    from sklearn.base import is_classifier
+    from sklearn.model_selection import check_cv
+
+    cv = check_cv(cv_folds, y, classifier=is_classifier(model))
+    return list(cv.split(X, y))
+
+
+def _fit_and_score_fold(
+    model: Any,
+    X: pd.DataFrame,
+    y: pd.Series,
+    train: np.ndarray,
+    test: np.ndarray,
+    scoring: str,
+) -> tuple[float, float]:
+    """在一折数据上训练并评分，返回 (验证集得分, 训练集得分)，训练失败时得分为nan"""
+    from sklearn.base import clone
+    from sklearn.metrics import get_scorer
+
+    scorer = get_scorer(scoring)
+    estimator = clone(model)
+    try:
+        estimator.fit(X.iloc[train], y.iloc[train])
+    except Exception as e:
+        warnings.warn(f"模型训练失败，得分记为nan: {e}", stacklevel=1)
+        return np.nan, np.nan
+    return (
+        float(scorer(estimator, X.iloc[test], y.iloc[test])),
+        float(scorer(estimator, X.iloc[train], y.iloc[train])),
+    )
+
+
+def _cached_search(
+    model: Any,
+    candidates: list[dict[str, Any]],
+    X: pd.DataFrame,
+    y: pd.Series,
+    scoring: tuple[str, str],
+    cv_folds: int,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    使用单折得分缓存评估候选参数
+
+    只对缓存中缺失的候选参数执行交叉验证。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, int]: (各候选各折的验证集得分, 训练集得分, 命中缓存的候选数)
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import GridSearchCV
+
+    data_key = data_fingerprint(X, y)
+    train_sizes = [len(train) for train, _ in _cv_splits(model, X, y, cv_folds)]
+    test_scores = np.full((len(candidates), cv_folds), np.nan)
+    train_scores = np.full((len(candidates), cv_folds), np.nan)
+
+    keys: list[list[_FoldKey]] = []
+    pending: list[int] = []
+    for i, params in enumerate(candidates):
+        estimator_key = _estimator_key(clone(model).set_params(**params))
+        keys.append([(data_key or "", estimator_key, scoring[0], cv_folds, f, n) for f, n in enumerate(train_sizes)])
+        cached = [fold_score_cache.get(key) for key in keys[i]] if data_key else [None]
+        if any(value is None for value in cached):
+            pending.append(i)
+        else:
+            test_scores[i], train_scores[i] = zip(*cached, strict=True)
+
+    if pending:
+        # 每个候选参数作为一个单点网格，按顺序只评估缺失的候选
+        search = GridSearchCV(
+            model,
+            [{k: [v] for k, v in candidates[i].items()} for i in pending],
+            cv=cv_folds,
+            scoring=scoring[1],
+            return_train_score=True,
+            refit=False,
+        )
+        with cpu_tokens(name="超参数搜索") as n_jobs:
+            search.set_params(n_jobs=n_jobs).fit(X, y)
+        for row, i in enumerate(pending):
+            for fold in range(cv_folds):
+                test_scores[i, fold] = search.cv_results_[f"split{fold}_test_score"][row]
+                train_scores[i, fold] = search.cv_results_[f"split{fold}_train_score"][row]
+                if data_key:
+                    fold_score_cache.set(keys[i][fold], (test_scores[i, fold], train_scores[i, fold]))
+
+    return test_scores, train_scores, len(candidates) - len(pending)
+
+
+def _halving_search(
+    model: Any,
+    method: str,
+    grid: dict[str, Any],
+    X: pd.DataFrame,
+    y: pd.Series,
+    scoring: str,
+    cv_folds: int,
+    n_iter: int,
+    random_state: int,
+) -> "BaseSuccessiveHalving":
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV, HalvingRandomSearchCV
+
+    common: dict[str, Any] = {
+        "cv": cv_folds,
+        "scoring": scoring,
+        "return_train_score": True,
+        "refit": False,
+        "random_state": random_state,
+    }
+    if method == "halving_grid":
+        search = HalvingGridSearchCV(model, grid, **common)
+    else:
+        search = HalvingRandomSearchCV(model, grid, n_candidates=n_iter, **common)
+    with cpu_tokens(name="逐次减半搜索") as n_jobs:
+        return search.set_params(n_jobs=n_jobs).fit(X, y)
+
+
 def optimize_hyperparameters(
     df: pd.DataFrame,
     features: list[str],
@@ -45,7 +226,10 @@ def optimize_hyperparameters(
     random_state: int = 42,
 ) -> tuple[HyperparamOptResult, bytes | None]:
     """
-    使用网格搜索或随机搜索优化机器学习模型的超参数。
+    使用网格搜索、随机搜索或逐次减半搜索优化机器学习模型的超参数。
+
+    网格搜索和随机搜索的每折得分会被缓存，重复搜索相同数据和参数时不再重新训练，
+    学习曲线也会复用这些得分。并行度由获得的 CPU 令牌数决定。
 
     Args:
         df: 输入数据框
@@ -61,19 +245,22 @@ def optimize_hyperparameters(
                    - "ridge": 岭回归(仅回归)
                    - "lasso": Lasso回归(仅回归)
         task_type: 任务类型，"regression"、"classification"或"auto"(默认，自动检测)
-        method: 优化方法，"grid"(网格搜索)或"random"(随机搜索)
+        method: 优化方法，可选:
+                - "grid": 网格搜索
+                - "random": 随机搜索
+                - "halving_grid": 逐次减半网格搜索，先用少量样本淘汰候选参数
+                - "halving_random": 逐次减半随机搜索
         cv_folds: 交叉验证折数
         scoring: 评分指标，默认为None(使用模型默认评分)
         param_grid: 超参数网格，为None时使用预定义的网格
-        n_iter: 随机搜索的迭代次数(仅当method="random"时有效)
+        n_iter: 随机搜索的迭代次数(仅当method为"random"或"halving_random"时有效)
         random_state: 随机数种子
 
     Returns:
         HyperparamOptResult: 优化结果，包含最佳参数、得分等
         bytes | None: 参数重要性图表数据
     """
-    from sklearn.metrics import make_scorer, mean_squared_error
-    from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
 
     start_time = time.time()
 
@@ -90,63 +277,23 @@ def optimize_hyperparameters(
 
     # 自动检测任务类型
     if task_type == "auto":
-        if y.dtype == "object" or y.dtype == "category" or len(y.unique()) < 10:
-            task_type = "classification"
-            logger.opt(colors=True).info(f"自动检测到<y>分类任务</>，目标列: <e>{escape_tag(target)}</e>")
-        else:
-            task_type = "regression"
-            logger.opt(colors=True).info(f"自动检测到<y>回归任务</>，目标列: <e>{escape_tag(target)}</e>")
+        task_type = _detect_task_type(y, target)
 
     # 检查数据问题
     if X.isna().any().any():  # type:ignore
         logger.opt(colors=True).warning("<y>数据中包含缺失值</>，这可能影响超参数优化结果")
 
     # 选择评分指标
-    if scoring is None:
-        scoring = "r2" if task_type == "regression" else "accuracy"
-
-    # 将scoring转换为sklearn的评分器
-    scoring_name = scoring
-    if task_type == "regression":
-        if scoring == "rmse":
-            scoring = make_scorer(  # type:ignore
-                lambda y_true, y_pred: -np.sqrt(mean_squared_error(y_true, y_pred)),
-            )
-        elif scoring == "mse":
-            scoring = "neg_mean_squared_error"
-        elif scoring == "r2":
-            scoring = "r2"
-    else:
-        if scoring == "f1":
-            scoring = "f1"
-        elif scoring == "precision":
-            scoring = "precision"
-        elif scoring == "recall":
-            scoring = "recall"
-        elif scoring == "accuracy":
-            scoring = "accuracy"
+    scoring_name, scorer = _resolve_scoring(task_type, scoring)
 
     # 选择模型和参数网格
     model, param_grid_dict = _get_model_and_param_grid(model_type, task_type, random_state)
 
-    # 根据方法选择合适的参数网格
-    if method == "grid":
-        # 网格搜索使用列表形式的参数网格
-        param_grid = param_grid_dict["grid"]
-        search = GridSearchCV(model, param_grid, cv=cv_folds, scoring=scoring, return_train_score=True, n_jobs=-1)
-    elif method == "random":
-        # 随机搜索使用分布形式的参数网格
-        param_grid = param_grid_dict["random"]
-        search = RandomizedSearchCV(
-            model,
-            param_grid,
-            n_iter=n_iter,
-            cv=cv_folds,
-            scoring=scoring,
-            return_train_score=True,
-            random_state=random_state,
-            n_jobs=1 if sys.platform == "win32" else -1,  # Windows下禁用并行处理
-        )
+    # 网格搜索使用列表形式的参数网格，随机搜索使用分布形式的参数网格
+    if method in ("grid", "halving_grid"):
+        grid = param_grid or param_grid_dict["grid"]
+    elif method in ("random", "halving_random"):
+        grid = param_grid or param_grid_dict["random"]
     else:
         raise ValueError(f"不支持的优化方法: {method}")
 
@@ -155,20 +302,48 @@ def optimize_hyperparameters(
         f"开始<g>{escape_tag(method)}搜索优化</> <e>{escape_tag(model_type)}</e> 模型超参数..."
     )
 
-    search.fit(X, y)
-
-    # 计算参数重要性
-    param_importance = _calculate_param_importance(search)
+    additional_info: dict[str, Any] = {}
+    if method.startswith("halving"):
+        search = _halving_search(model, method, grid, X, y, scorer, cv_folds, n_iter, random_state)
+        results = search.cv_results_
+        params: list[dict[str, Any]] = list(results["params"])
+        test_scores = np.column_stack([results[f"split{i}_test_score"] for i in range(cv_folds)])
+        train_scores = np.column_stack([results[f"split{i}_train_score"] for i in range(cv_folds)])
+        best_idx = int(search.best_index_)
+        # 不同轮次使用的样本数不同，参数重要性只比较首轮(所有候选使用相同样本数)的得分
+        first_round = results["iter"] == 0
+        param_importance = _calculate_param_importance(
+            [p for p, first in zip(params, first_round, strict=True) if first],
+            test_scores[first_round].mean(axis=1),
+        )
+        additional_info["halving_iterations"] = int(search.n_iterations_)
+        additional_info["halving_resources"] = [int(n) for n in search.n_resources_]
+    else:
+        if method == "grid":
+            params = list(ParameterGrid(grid))
+        else:
+            # 与 RandomizedSearchCV 相同的候选参数采样方式
+            params = list(ParameterSampler(grid, n_iter, random_state=random_state))
+        test_scores, train_scores, cached = _cached_search(model, params, X, y, (scoring_name, scorer), cv_folds)
+        mean_scores = test_scores.mean(axis=1)
+        if np.isnan(mean_scores).all():
+            raise ValueError("所有超参数组合均训练失败")
+        best_idx = int(np.argmax(np.where(np.isnan(mean_scores), -np.inf, mean_scores)))
+        param_importance = _calculate_param_importance(params, mean_scores)
+        additional_info["cached_candidates"] = cached
+
+    best_params = params[best_idx]
+    best_score = float(test_scores[best_idx].mean())
 
     # 准备结果
     result = HyperparamOptResult(
-        best_params=search.best_params_,
-        best_score=search.best_score_,
+        best_params=best_params,
+        best_score=best_score,
         cv_results={
-            "mean_test_score": search.cv_results_["mean_test_score"].tolist(),
-            "std_test_score": search.cv_results_["std_test_score"].tolist(),
-            "mean_train_score": search.cv_results_["mean_train_score"].tolist(),
-            "std_train_score": search.cv_results_["std_train_score"].tolist(),
+            "mean_test_score": test_scores.mean(axis=1).tolist(),
+            "std_test_score": test_scores.std(axis=1).tolist(),
+            "mean_train_score": train_scores.mean(axis=1).tolist(),
+            "std_train_score": train_scores.std(axis=1).tolist(),
         },
         model_type=model_type,
         optimization_method=method,
@@ -181,6 +356,9 @@ def optimize_hyperparameters(
             "n_samples": len(X),
             "n_features": len(features),
             "feature_list": features,
+            # 交叉验证各折的最佳得分
+            "cv_fold_scores": test_scores[best_idx].tolist(),
+            **additional_info,
         },
         param_importance=param_importance,
     )
@@ -190,22 +368,10 @@ def optimize_hyperparameters(
     if param_importance:
         figure = _create_param_importance_plot(param_importance)
 
-    # 获取交叉验证各折的最佳得分
-    best_idx = np.argmax(search.cv_results_["mean_test_score"])
-    cv_scores = []
-    for i in range(cv_folds):
-        try:
-            cv_scores.append(search.cv_results_[f"split{i}_test_score"][best_idx])
-        except KeyError:
-            break
-
-    if cv_scores:
-        result["additional_info"]["cv_fold_scores"] = cv_scores
-
     logger.opt(colors=True).info(
         f"<g>超参数优化完成</>。方法: <y>{escape_tag(method)}</y>, "
-        f"最佳得分 (<c>{escape_tag(scoring_name)}</c>): <e>{search.best_score_:.4f}</e>, "
-        f"最佳参数: <y>{escape_tag(str(search.best_params_))}</y>"
+        f"最佳得分 (<c>{escape_tag(scoring_name)}</c>): <e>{best_score:.4f}</e>, "
+        f"最佳参数: <y>{escape_tag(str(best_params))}</y>"
     )
     return result, figure
 
@@ -377,6 +543,9 @@ def _get_model_and_param_grid(model_type: str, task_type: str, random_state: int
     init_kwargs = {}
     if "random_state" in init_params:
         init_kwargs["random_state"] = random_state
+    if "n_jobs" in init_params:
+        # 并行度由外层的交叉验证控制，避免嵌套并行
+        init_kwargs["n_jobs"] = 1
 
     # 创建模型实例
     model = ModelClass(**init_kwargs)
@@ -395,7 +564,10 @@ def _get_model_and_param_grid(model_type: str, task_type: str, random_state: int
     # 为随机搜索创建分布形式的参数网格
     random_param_grid = {}
     for key, values in param_grid.items():
-        if isinstance(values, list) and all(isinstance(v, int | float) for v in values if v is not None):
+        # 布尔值是 int 的子类，需要排除，否则会被转换为整数分布
+        if isinstance(values, list) and all(
+            isinstance(v, int | float) and not isinstance(v, bool) for v in values if v is not None
+        ):
             numeric_values = [v for v in values if v is not None]
             if numeric_values:
                 if all(isinstance(v, int) for v in numeric_values):
@@ -414,46 +586,30 @@ def _get_model_and_param_grid(model_type: str, task_type: str, random_state: int
     return model, result
 
 
-def _calculate_param_importance(search: "GridSearchCV | RandomizedSearchCV") -> dict[str, float]:
-    """计算参数重要性"""
-    param_importance = {}
+def _calculate_param_importance(params: list[dict[str, Any]], scores: np.ndarray) -> dict[str, float]:
+    """
+    根据候选参数的平均得分计算参数重要性
 
-    # 获取所有参数组合
-    params = search.cv_results_["params"]
-    scores = search.cv_results_["mean_test_score"]
+    Args:
+        params: 候选参数
+        scores: 每个候选参数的平均验证集得分
+    """
+    param_importance = {}
 
     # 对于每个超参数
-    for param_name in search.best_params_:
-        # 检查该参数是否有多个值
-        param_values = set()
-        for p in params:
-            if param_name in p:
-                param_values.add(str(p[param_name]))
-
-        if len(param_values) <= 1:
+    for param_name in dict.fromkeys(name for p in params for name in p):
+        # 计算每个参数值的平均得分，跳过训练失败的候选
+        value_scores: dict[str, list[float]] = {}
+        for p, score in zip(params, scores, strict=True):
+            if param_name in p and not np.isnan(score):
+                value_scores.setdefault(str(p[param_name]), []).append(float(score))
+
+        if len(value_scores) <= 1:
             continue  # 跳过只有一个值的参数
 
-        # 计算每个参数值的平均得分
-        value_scores = {}
-        value_counts = {}
-
-        for i, p in enumerate(params):
-            if param_name in p:
-                value = str(p[param_name])
-                if value not in value_scores:
-                    value_scores[value] = 0
-                    value_counts[value] = 0
-                value_scores[value] += scores[i]
-                value_counts[value] += 1
-
-        # 计算平均得分
-        for value in value_scores:
-            value_scores[value] /= value_counts[value]
-
         # 参数重要性 = 最大平均得分 - 最小平均得分
-        if value_scores:
-            importance = max(value_scores.values()) - min(value_scores.values())
-            param_importance[param_name] = importance
+        means = [sum(v) / len(v) for v in value_scores.values()]
+        param_importance[param_name] = max(means) - min(means)
 
     # 归一化参数重要性
     if param_importance:
@@ -527,6 +683,63 @@ class LearningCurveResult(TypedDict):
     score_metric: str
 
 
+def _learning_curve(
+    model: Any,
+    X: pd.DataFrame,
+    y: pd.Series,
+    train_sizes: list[float],
+    cv_folds: int,
+    scoring_name: str,
+    scoring: str,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    使用单折得分缓存计算学习曲线
+
+    与 `sklearn.model_selection.learning_curve` 相同，每折取训练折的前 n 个样本训练。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (训练样本数, 训练集得分, 验证集得分)，
+            得分的形状为 (训练样本数, 折数)
+    """
+    from joblib import Parallel, delayed
+
+    splits = _cv_splits(model, X, y, cv_folds)
+    n_max = len(splits[0][0])
+    sizes = np.asarray(train_sizes)
+    if np.issubdtype(sizes.dtype, np.floating):
+        sizes = (sizes * n_max).astype(int)
+    sizes = np.unique(np.clip(sizes, 1, n_max))
+
+    data_key = data_fingerprint(X, y)
+    estimator_key = _estimator_key(model)
+    test_scores = np.full((len(sizes), len(splits)), np.nan)
+    train_scores = np.full((len(sizes), len(splits)), np.nan)
+
+    pending: list[tuple[int, int, _FoldKey]] = []
+    for i, n in enumerate(sizes):
+        for fold, (train, _) in enumerate(splits):
+            key: _FoldKey = (data_key or "", estimator_key, scoring_name, cv_folds, fold, min(int(n), len(train)))
+            if data_key and (cached := fold_score_cache.get(key)) is not None:
+                test_scores[i, fold], train_scores[i, fold] = cached
+            else:
+                pending.append((i, fold, key))
+
+    with cpu_tokens(want=len(pending) or 1, name="学习曲线") as n_jobs:
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_and_score_fold)(model, X, y, splits[fold][0][: sizes[i]], splits[fold][1], scoring)
+            for i, fold, _ in pending
+        )
+    for (i, fold, key), value in zip(pending, results, strict=True):
+        test_scores[i, fold], train_scores[i, fold] = value
+        if data_key:
+            fold_score_cache.set(key, value)
+
+    logger.opt(colors=True).debug(
+        f"学习曲线共 <y>{test_scores.size}</> 次训练，复用缓存 <y>{test_scores.size - len(pending)}</> 次"
+    )
+    return sizes, train_scores, test_scores
+
+
 def plot_learning_curve(
     df: pd.DataFrame,
     features: list[str],
@@ -556,7 +769,7 @@ def plot_learning_curve(
         task_type: 任务类型，"regression"、"classification"或"auto"
         cv_folds: 交叉验证折数
         scoring: 评分指标
-        train_sizes: 训练集大小的相对或绝对值，默认为[0.1, 0.3, 0.5, 0.7, 0.9]
+        train_sizes: 训练集大小的相对或绝对值，默认为[0.1, 0.3, 0.5, 0.7, 1.0]
         hyperparams: 模型超参数，为None时使用默认值
         random_state: 随机数种子
 
@@ -576,23 +789,16 @@ def plot_learning_curve(
 
     import matplotlib.pyplot as plt
     from matplotlib.font_manager import FontProperties
-    from sklearn.model_selection import learning_curve
 
     X = df[features].copy()
     y = df[target].copy()
 
     # 自动检测任务类型
     if task_type == "auto":
-        if y.dtype == "object" or y.dtype == "category" or len(y.unique()) < 10:
-            task_type = "classification"
-            logger.opt(colors=True).info(f"自动检测到<y>分类任务</>，目标列: <e>{escape_tag(target)}</e>")
-        else:
-            task_type = "regression"
-            logger.opt(colors=True).info(f"自动检测到<y>回归任务</>，目标列: <e>{escape_tag(target)}</e>")
+        task_type = _detect_task_type(y, target)
 
     # 选择评分指标
-    if scoring is None:
-        scoring = "r2" if task_type == "regression" else "accuracy"
+    scoring, scorer = _resolve_scoring(task_type, scoring)
 
     # 获取模型
     model, _ = _get_model_and_param_grid(model_type, task_type, random_state)
@@ -601,22 +807,13 @@ def plot_learning_curve(
     if hyperparams:
         model.set_params(**hyperparams)
 
-    # 设置训练集大小
+    # 设置训练集大小，最后一点使用完整训练折以复用超参数搜索的得分
     if train_sizes is None:
-        train_sizes = [0.1, 0.3, 0.5, 0.7, 0.9]
+        train_sizes = [0.1, 0.3, 0.5, 0.7, 1.0]
 
     # 生成学习曲线
     logger.opt(colors=True).info(f"<g>开始生成</> <e>{escape_tag(model_type)}</e> <g>模型的学习曲线...</>")
-    train_sizes_abs, train_scores, test_scores = learning_curve(  # type:ignore
-        model,
-        X,
-        y,
-        train_sizes=train_sizes,  # type:ignore
-        cv=cv_folds,
-        scoring=scoring,
-        n_jobs=-1,
-        random_state=random_state,
-    )
+    train_sizes_abs, train_scores, test_scores = _learning_curve(model, X, y, train_sizes, cv_folds, scoring, scorer)
 
     # 计算平均值和标准差
     train_scores_mean = np.mean(train_scores, axis=1).tolist()
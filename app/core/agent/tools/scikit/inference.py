@@ -0,0 +1,211 @@
+"""
+模型推理
+
+已加载的模型保存在按内存占用限制的 LRU 缓存中，避免重复从磁盘加载；
+预测按块进行，峰值内存只与块大小有关。
+"""
+
+import collections
+import dataclasses
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.log import logger
+from app.utils import escape_tag
+
+from .model import MODEL_TASK_TYPE, EstimatorLike, ModelMetadata, TaskType, load_model_metadata
+
+if TYPE_CHECKING:
+    from sklearn.preprocessing import LabelEncoder
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def build_label_encoder(metadata: ModelMetadata) -> "LabelEncoder | None":
+    """根据元数据中保存的类别恢复标签编码器，无需重新拟合"""
+    if not (classes := metadata.get("label_encoder_classes")):
+        return None
+
+    from sklearn.preprocessing import LabelEncoder
+
+    le = LabelEncoder()
+    le.classes_ = np.asarray(classes)
+    return le
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class LoadedModel:
+    """
+    已加载的模型
+
+    模型对象在多个调用方之间共享，调用方不应修改。
+    """
+
+    path: Path
+    model: EstimatorLike
+    metadata: ModelMetadata
+    label_encoder: "LabelEncoder | None"
+    size: int
+
+    @property
+    def task_type(self) -> TaskType | None:
+        return MODEL_TASK_TYPE.get(self.metadata["model_type"])
+
+
+class ModelCache:
+    """
+    按内存占用限制的模型 LRU 缓存
+
+    以模型文件路径和修改时间为键，文件被覆盖后自动重新加载。
+    模型的内存占用以序列化文件大小估计。
+
+    Args:
+        max_bytes: 缓存模型的总大小上限，至少保留最近使用的一个模型
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._data: collections.OrderedDict[tuple[str, int], LoadedModel] = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path: Path) -> LoadedModel:
+        """
+        获取已加载的模型，未缓存时从文件加载
+
+        Args:
+            file_path: 模型文件路径(不含后缀或以 .joblib 结尾)
+
+        Returns:
+            LoadedModel: 已加载的模型
+        """
+        model_file = file_path.with_suffix(".joblib")
+        stat = model_file.stat()
+        key = (str(model_file.resolve()), stat.st_mtime_ns)
+
+        with self._lock:
+            if (loaded := self._data.get(key)) is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return loaded
+            self.misses += 1
+
+        # 以只读方式内存映射模型中的数组，多个工作进程可以共享同一份页缓存
+        model = cast("EstimatorLike", joblib.load(model_file, mmap_mode="r"))
+        metadata = load_model_metadata(model_file)
+        loaded = LoadedModel(model_file, model, metadata, build_label_encoder(metadata), stat.st_size)
+        logger.opt(colors=True).debug(
+            f"已加载模型 <c>{escape_tag(str(model_file))}</> (<y>{stat.st_size / 1048576:.2f}</> MB)"
+        )
+
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = loaded
+                self._size += loaded.size
+            while self._size > self.max_bytes and len(self._data) > 1:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= evicted.size
+        return loaded
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"models": len(self._data), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+model_cache = ModelCache(settings.MODEL_CACHE_MAX_MB * 1024 * 1024)
+
+
+def iter_predictions(
+    model: EstimatorLike,
+    data: pd.DataFrame,
+    features: list[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[np.ndarray]:
+    """
+    分块预测
+
+    先按行切块再选取特征列，每次只复制一块的特征数据。
+
+    Args:
+        model: 训练好的模型
+        data: 输入数据
+        features: 特征列
+        chunk_size: 每块的行数
+
+    Returns:
+        Iterator[np.ndarray]: 按行顺序产出的每块预测结果
+    """
+    for start in range(0, len(data), chunk_size):
+        yield np.asarray(model.predict(data.iloc[start : start + chunk_size][features]))
+
+
+def predict_in_chunks(
+    model: EstimatorLike,
+    data: pd.DataFrame,
+    features: list[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> np.ndarray:
+    """分块预测并拼接结果"""
+    if len(data) <= chunk_size:
+        return np.asarray(model.predict(data[features]))
+    return np.concatenate(list(iter_predictions(model, data, features, chunk_size)))
+
+
+def decode_predictions(le: "LabelEncoder | None", predictions: np.ndarray) -> np.ndarray | None:
+    """将分类模型的编码预测结果解码为原始类别，无法解码时返回None"""
+    if le is None:
+        return None
+    try:
+        return cast("np.ndarray", le.inverse_transform(predictions.astype(int)))
+    except Exception as e:
+        logger.opt(colors=True).warning(f"无法解码预测结果: <r>{escape_tag(str(e))}</r>")
+        return None
+
+
+def batch_predict(
+    loaded: LoadedModel,
+    data: pd.DataFrame,
+    features: list[str] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    对数据分块预测
+
+    每块只复制该块的特征列，产出的结果保留输入数据的索引。
+
+    Args:
+        loaded: 已加载的模型
+        data: 输入数据
+        features: 特征列，默认使用训练时的特征列
+        chunk_size: 每块的行数
+
+    Returns:
+        Iterator[pd.DataFrame]: 每块的预测结果，包含 `predictions` 列，
+            分类模型额外包含 `predictions_decoded` 列
+    """
+    features = features or loaded.metadata["feature_columns"]
+    if missing := [f for f in features if f not in data.columns]:
+        raise ValueError(f"输入数据中缺少以下特征列: {', '.join(missing)}")
+
+    decode = loaded.task_type == "classification"
+    for start in range(0, len(data), chunk_size):
+        chunk = data.iloc[start : start + chunk_size]
+        predictions = np.asarray(loaded.model.predict(chunk[features]))
+        result = pd.DataFrame({"predictions": predictions}, index=chunk.index)
+        if decode and (decoded := decode_predictions(loaded.label_encoder, predictions)) is not None:
+            result["predictions_decoded"] = decoded
+        yield result
@@ -1,6 +1,8 @@
 import dataclasses
+import hashlib
 import inspect
 import json
+import uuid
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Literal, NotRequired, Protocol, TypedDict, cast
 
@@ -9,6 +11,7 @@ import numpy as np
 import pandas as pd
 from pydantic import TypeAdapter
 
+from app.core.cpu import cpu_tokens
 from app.log import logger
 from app.utils import escape_tag, resolve_dot_notation
 
@@ -77,6 +80,24 @@ COMPOSITE_MODEL_TASK_TYPE: dict[SupportedCompositeModelType, TaskType] = {
 MODEL_TASK_TYPE: dict[SupportedModelType, TaskType] = BASE_MODEL_TASK_TYPE | COMPOSITE_MODEL_TASK_TYPE
 
 
+def data_fingerprint(X: pd.DataFrame, y: pd.Series | None = None) -> str | None:
+    """
+    计算数据内容指纹，用于缓存训练结果
+
+    Returns:
+        str | None: 数据指纹，数据包含无法哈希的值时返回None(不使用缓存)
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(X.columns)).encode())
+    try:
+        h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+        if y is not None:
+            h.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    except TypeError:
+        return None
+    return h.hexdigest()
+
+
 class EstimatorLike(Protocol):
     classes_: list[str]
 
@@ -138,6 +159,7 @@ class ModelInstanceInfo(TypedDict):
     model: EstimatorLike
     model_type: SupportedModelType
     hyperparams: dict[str, Any] | None
+    base_models: NotRequired["list[TrainModelResult]"]  # 集成模型的已训练基础模型
 
 
 def create_model(
@@ -205,6 +227,10 @@ class TrainModelResult:
     dataset_id: str = ""
     label_encoder: "LabelEncoder | None" = dataclasses.field(default=None)
     hyperparams: dict[str, Any] | None = dataclasses.field(default=None)
+    # 训练数据指纹，集成模型据此判断能否直接复用该模型
+    train_fingerprint: str | None = dataclasses.field(default=None)
+    # 训练数据上的交叉验证(out-of-fold)预测: (折数, 预测方法) -> 预测结果
+    oof_predictions: dict[tuple[int, str], np.ndarray] = dataclasses.field(default_factory=dict, repr=False)
 
 
 def fit_model(
@@ -217,6 +243,7 @@ def fit_model(
     random_state: int = 42,
     hyperparams: dict[str, Any] | None = None,
     dataset_id: str = "",
+    base_models: list[TrainModelResult] | None = None,
 ) -> TrainModelResult:
     """
     使用给定的模型实例和数据进行训练。
@@ -231,6 +258,8 @@ def fit_model(
         random_state (int): 随机种子，用于复现结果。
         hyperparams (dict, optional): 记录模型超参数，仅用于信息记录。
         dataset_id (str, optional): 数据集ID，用于记录模型训练的数据来源。
+        base_models (list[TrainModelResult], optional): 集成模型的已训练基础模型，
+            基础模型在相同训练集上训练时直接复用，不再重新训练。
 
     Returns:
         TrainModelResult: 包含训练好的模型、测试集数据、模型类型及相关信息的字典。
@@ -263,20 +292,40 @@ def fit_model(
         assert isinstance(Y_train, pd.Series)
         assert isinstance(Y_test, pd.Series)
 
-    # 训练模型
-    model.fit(X_train, Y_train)
+    # 训练模型，支持并行的模型(如随机森林、XGBoost)按获得的 CPU 令牌数设置并行度
+    get_params = getattr(model, "get_params", None)
+    params = get_params(deep=False) if get_params is not None else {}
+    reused = False
+    with cpu_tokens(want=None if "n_jobs" in params else 1, name="模型训练") as n_jobs:
+        if base_models:
+            from .model_composite import fit_composite_model
+
+            reused = fit_composite_model(model, base_models, X_train, Y_train, n_jobs)
+        if not reused:
+            if "n_jobs" in params:
+                model.set_params(n_jobs=n_jobs)
+            try:
+                model.fit(X_train, Y_train)
+            finally:
+                if "n_jobs" in params:
+                    model.set_params(n_jobs=params["n_jobs"])
+
+    message = f"模型训练成功。模型类型: {model_type}"
+    if reused:
+        message += f"，复用了 {len(base_models or [])} 个已训练的基础模型"
 
     return TrainModelResult(
         model=model,
         X_test=X_test,
         Y_test=Y_test,
         model_type=model_type,
-        message=f"模型训练成功。模型类型: {model_type}",
+        message=message,
         feature_columns=features,
         target_column=target,
         dataset_id=dataset_id,
         label_encoder=le,
         hyperparams=hyperparams,
+        train_fingerprint=data_fingerprint(X_train, pd.Series(np.asarray(Y_train))),
     )
 
 
@@ -392,7 +441,15 @@ def save_model(model_info: TrainModelResult, file_path: Path) -> SaveModelResult
     """
     model = model_info.model
     try:
-        joblib.dump(model, file_path.with_suffix(".joblib"))
+        # 不压缩，使模型中的数组在加载时可以被内存映射；
+        # 先写入临时文件再替换，避免覆盖其他进程正在映射的文件
+        model_file = file_path.with_suffix(".joblib")
+        tmp = model_file.with_name(f".{model_file.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            joblib.dump(model, tmp, compress=0)
+            tmp.replace(model_file)
+        finally:
+            tmp.unlink(missing_ok=True)
         # 保存模型的元数据，例如特征列表、目标列、编码器等
         meta_data: ModelMetadata = {
             "model_type": model_info.model_type,
@@ -427,11 +484,18 @@ def resume_train_result(df: pd.DataFrame, metadata: ModelMetadata, model: Estima
     """
     from sklearn.preprocessing import LabelEncoder
 
+    from .inference import build_label_encoder
+
     Y = df[metadata["target_column"]].copy()
     le = None
     if Y.dtype == "object" or Y.dtype == "category":
-        le = LabelEncoder()
-        Y = le.fit_transform(Y)
+        # 优先使用训练时保存的类别映射，避免在新数据上重新拟合导致编码不一致
+        le = build_label_encoder(metadata)
+        if le is not None and Y.isin(le.classes_).all():
+            Y = le.transform(Y)
+        else:
+            le = LabelEncoder()
+            Y = le.fit_transform(Y)
 
     return TrainModelResult(
         model=model,
@@ -456,10 +520,11 @@ def load_model(df: pd.DataFrame, file_path: Path) -> tuple[ModelMetadata, TrainM
     Returns:
         tuple: 包含加载的模型和元数据的元组。
     """
+    from .inference import model_cache
+
     try:
-        model: EstimatorLike = joblib.load(file_path.with_suffix(".joblib"))
-        metadata = load_model_metadata(file_path)
-        return metadata, resume_train_result(df, metadata, model)
+        loaded = model_cache.get(file_path)
+        return loaded.metadata, resume_train_result(df, loaded.metadata, loaded.model)
     except Exception:
         logger.opt(colors=True).exception("<r>加载模型失败</r>")
         raise
@@ -498,6 +563,7 @@ def predict_with_model(
     model_info: TrainModelResult,
     input_data: pd.DataFrame,
     input_features: list[str] | None = None,
+    chunk_size: int | None = None,
 ) -> tuple[pd.DataFrame, PredictionResult]:
     """
     使用训练好的模型进行预测，并将预测结果保存到新的DataFrame中。
@@ -506,6 +572,7 @@ def predict_with_model(
         model_info (TrainModelResult): 包含训练好的模型及其信息的字典，由 `fit_model` 函数返回。
         input_data (pd.DataFrame): 要进行预测的输入数据
         input_features (list[str], optional): 输入数据的特征列名列表。如果不提供，将使用model_info中的特征列。
+        chunk_size (int, optional): 分块预测的行数，默认为 `DEFAULT_CHUNK_SIZE`。
 
     Returns:
         tuple[pd.DataFrame, PredictionResult]: 包含预测结果的新DataFrame和预测结果信息字典的元组
@@ -526,12 +593,11 @@ def predict_with_model(
     if missing_features:
         raise ValueError(f"输入数据中缺少以下特征列: {', '.join(missing_features)}")
 
-    # 提取特征数据
-    X = cast("pd.DataFrame", input_data[input_features].copy())
+    from .inference import DEFAULT_CHUNK_SIZE, decode_predictions, predict_in_chunks
 
-    # 进行预测
+    # 进行预测，按块提取特征数据以限制峰值内存
     logger.opt(colors=True).info(f"使用模型 <e>{escape_tag(model_type)}</e> 进行预测")
-    predictions: np.ndarray = model.predict(X)
+    predictions = predict_in_chunks(model, input_data, input_features, chunk_size or DEFAULT_CHUNK_SIZE)
 
     # 创建结果DataFrame
     result_df = pd.DataFrame()
@@ -541,12 +607,9 @@ def predict_with_model(
 
     # 处理分类模型的解码
     decoded: np.ndarray | None = None
-    if task_type == "classification" and (le := model_info.label_encoder):
-        try:
-            decoded = cast("np.ndarray", le.inverse_transform(predictions.astype(int)))
-        except Exception as e:
-            logger.opt(colors=True).warning(f"无法解码预测结果: <r>{escape_tag(str(e))}</r>")
-        else:
+    if task_type == "classification":
+        decoded = decode_predictions(model_info.label_encoder, predictions)
+        if decoded is not None:
             result_df["predictions_decoded"] = decoded
             logger.opt(colors=True).info(f"分类预测结果已解码，样例: <y>{escape_tag(str(decoded[:5]))}</y>")
 
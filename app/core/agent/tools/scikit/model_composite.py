@@ -7,7 +7,14 @@ import pandas as pd
 from app.log import logger
 from app.utils import escape_tag
 
-from .model import BASE_MODEL_TASK_TYPE, EstimatorLike, ModelInstanceInfo, TrainModelResult, create_model
+from .model import (
+    BASE_MODEL_TASK_TYPE,
+    EstimatorLike,
+    ModelInstanceInfo,
+    TrainModelResult,
+    create_model,
+    data_fingerprint,
+)
 
 
 # 通用选项 - 所有集成模型都可能使用的选项
@@ -163,6 +170,7 @@ def _create_voting_model(
         "model": cast("EstimatorLike", composite_model),
         "model_type": model_type,
         "hyperparams": hyperparams,
+        "base_models": models,
     }
 
 
@@ -224,6 +232,7 @@ def _create_stacking_model(
         "model": cast("EstimatorLike", composite_model),
         "model_type": model_type,
         "hyperparams": hyperparams,
+        "base_models": models,
     }
 
 
@@ -244,13 +253,13 @@ def _get_blending_classifier_class() -> type[_Estimator]:
 
         def fit(self, X: pd.DataFrame, y: pd.Series) -> Self:
             # 分割数据集
+            from sklearn.base import clone
             from sklearn.model_selection import train_test_split
 
             X_base, X_meta, y_base, y_meta = train_test_split(X, y, test_size=self.validation_split, random_state=42)
 
-            # 训练基础模型
-            for estimator in self.base_estimators:
-                estimator.fit(X_base, y_base)
+            # 训练基础模型，使用副本以免修改已训练的模型
+            self.base_estimators = [clone(estimator).fit(X_base, y_base) for estimator in self.base_estimators]
 
             # 生成元特征
             meta_features = self._generate_meta_features(cast("pd.DataFrame", X_meta))
@@ -297,13 +306,13 @@ def _get_blending_regressor_class() -> type[_Estimator]:
 
         def fit(self, X: pd.DataFrame, y: pd.Series) -> Self:
             # 分割数据集
+            from sklearn.base import clone
             from sklearn.model_selection import train_test_split
 
             X_base, X_meta, y_base, y_meta = train_test_split(X, y, test_size=self.validation_split, random_state=42)
 
-            # 训练基础模型
-            for estimator in self.base_estimators:
-                estimator.fit(X_base, y_base)
+            # 训练基础模型，使用副本以免修改已训练的模型
+            self.base_estimators = [clone(estimator).fit(X_base, y_base) for estimator in self.base_estimators]
 
             # 生成元特征
             meta_features = np.column_stack([model.predict(X_meta).reshape(-1, 1) for model in self.base_estimators])
@@ -374,4 +383,234 @@ def _create_blending_model(
         "model": cast("EstimatorLike", composite_model),
         "model_type": model_type,
         "hyperparams": hyperparams,
+        "base_models": models,
     }
+
+
+# Blending 使用的 out-of-fold 预测折数，与 Stacking 的默认折数一致以便共享
+_BLENDING_OOF_FOLDS = 5
+
+
+def fit_composite_model(
+    model: EstimatorLike,
+    base_models: list[TrainModelResult],
+    X: pd.DataFrame,
+    y: Any,
+    n_jobs: int = 1,
+) -> bool:
+    """
+    复用已训练的基础模型拟合集成模型
+
+    基础模型都在与 X, y 相同的训练集上训练时不再重新训练基础模型:
+    投票集成直接组合基础模型；Stacking 和 Blending 的元模型使用基础模型的 out-of-fold 预测训练，
+    这些预测保存在基础模型的训练结果中，在使用相同折数的集成模型之间共享。
+
+    Args:
+        model: 由 `create_composite_model` 创建的集成模型
+        base_models: 集成模型的基础模型
+        X: 训练集特征
+        y: 训练集目标变量
+        n_jobs: 计算 out-of-fold 预测的并行度
+
+    Returns:
+        bool: 是否已完成拟合，为False时调用方应按常规方式训练
+    """
+    from sklearn.ensemble import StackingClassifier, StackingRegressor, VotingClassifier, VotingRegressor
+
+    if not _is_reusable(base_models, X, y):
+        logger.opt(colors=True).debug("基础模型的训练集与当前训练集不一致，<y>重新训练</>集成模型")
+        return False
+
+    if isinstance(model, VotingClassifier | VotingRegressor):
+        fitted = _fit_voting(model, base_models, X, y)
+    elif isinstance(model, StackingClassifier | StackingRegressor):
+        fitted = _fit_stacking(model, base_models, X, y, n_jobs)
+    elif isinstance(model, (_get_blending_classifier_class(), _get_blending_regressor_class())):
+        fitted = _fit_blending(model, base_models, X, y, n_jobs)
+    else:
+        fitted = False
+
+    if fitted:
+        logger.opt(colors=True).info(f"<g>集成模型拟合完成</>，复用了 <c>{len(base_models)}</> 个已训练的基础模型")
+    return fitted
+
+
+def _is_reusable(base_models: list[TrainModelResult], X: pd.DataFrame, y: Any) -> bool:
+    """基础模型是否都在与 X, y 相同的训练集(包括特征列及其顺序)上训练"""
+    columns = list(X.columns)
+    if any(base.train_fingerprint is None or list(base.feature_columns) != columns for base in base_models):
+        return False
+
+    fingerprint = data_fingerprint(X, pd.Series(np.asarray(y)))
+    return all(base.train_fingerprint == fingerprint for base in base_models)
+
+
+def _same_estimators(estimators: list[Any], base_models: list[TrainModelResult]) -> bool:
+    return len(estimators) == len(base_models) and all(
+        estimator is base.model for estimator, base in zip(estimators, base_models, strict=True)
+    )
+
+
+def _stack_method(estimator: Any, is_classification: bool) -> str:
+    """与 `stack_method="auto"` 一致的基础模型预测方法"""
+    if is_classification:
+        for method in ("predict_proba", "decision_function"):
+            if hasattr(estimator, method):
+                return method
+    return "predict"
+
+
+def _out_of_fold_predictions(
+    base: TrainModelResult,
+    X: pd.DataFrame,
+    y: Any,
+    cv_folds: int,
+    method: str,
+    n_jobs: int,
+) -> np.ndarray:
+    """基础模型在训练集上的 out-of-fold 预测，保存在训练结果中供后续集成模型复用"""
+    if (predictions := base.oof_predictions.get((cv_folds, method))) is not None:
+        return predictions
+
+    from sklearn.base import clone, is_classifier
+    from sklearn.model_selection import check_cv, cross_val_predict
+
+    # 与 Stacking 内部的交叉验证划分一致
+    cv = check_cv(cv_folds, y, classifier=is_classifier(base.model))
+    predictions = cast(
+        "np.ndarray",
+        cross_val_predict(clone(base.model), X[base.feature_columns], y, cv=cv, method=method, n_jobs=n_jobs),
+    )
+    base.oof_predictions[(cv_folds, method)] = predictions
+    return predictions
+
+
+def _fit_voting(model: Any, base_models: list[TrainModelResult], X: pd.DataFrame, y: Any) -> bool:
+    from sklearn.ensemble import VotingClassifier
+    from sklearn.frozen import FrozenEstimator
+    from sklearn.utils import Bunch
+
+    names, estimators = zip(*model.estimators, strict=True)
+    if not _same_estimators(list(estimators), base_models):
+        return False
+    if isinstance(model, VotingClassifier) and model.voting == "hard":
+        # 硬投票要求基础模型预测的是编码后的类别(0..n-1)
+        classes = np.unique(y)
+        if not np.array_equal(classes, np.arange(len(classes))):
+            return False
+
+    original = model.estimators
+    model.set_params(estimators=[(name, FrozenEstimator(est)) for name, est in original])
+    try:
+        model.fit(X, y)
+    finally:
+        model.set_params(estimators=original)
+
+    # 拟合后的基础模型即已训练的模型本身
+    model.estimators_ = list(estimators)
+    model.named_estimators_ = Bunch(**dict(zip(names, estimators, strict=True)))
+    return True
+
+
+def _fit_stacking(model: Any, base_models: list[TrainModelResult], X: pd.DataFrame, y: Any, n_jobs: int) -> bool:
+    from sklearn.base import is_classifier
+    from sklearn.utils import Bunch
+
+    names, estimators = zip(*model.estimators, strict=True)
+    if not _same_estimators(list(estimators), base_models) or not isinstance(model.cv, int):
+        return False
+
+    is_classification = is_classifier(model)
+    classifier_class, regressor_class = _get_precomputed_estimator_classes()
+    placeholder_class = classifier_class if is_classification else regressor_class
+    placeholders = []
+    for name, base in zip(names, base_models, strict=True):
+        method = _stack_method(base.model, is_classification)
+        oof = _out_of_fold_predictions(base, X, y, model.cv, method, n_jobs)
+        placeholders.append((name, placeholder_class(oof, method)))
+
+    # 以保存的 out-of-fold 预测代替 Stacking 内部的交叉验证，只训练元模型
+    params = model.get_params(deep=False)
+    indices = np.arange(len(X))
+    model.set_params(estimators=placeholders, cv=[(indices, indices)], n_jobs=None)
+    try:
+        model.fit(X, y)
+    finally:
+        model.set_params(estimators=params["estimators"], cv=params["cv"], n_jobs=params["n_jobs"])
+
+    model.estimators_ = list(estimators)
+    model.named_estimators_ = Bunch(**dict(zip(names, estimators, strict=True)))
+    if hasattr(estimators[-1], "feature_names_in_"):
+        model.feature_names_in_ = estimators[-1].feature_names_in_
+    return True
+
+
+def _fit_blending(model: Any, base_models: list[TrainModelResult], X: pd.DataFrame, y: Any, n_jobs: int) -> bool:
+    from sklearn.model_selection import train_test_split
+
+    if not _same_estimators(model.base_estimators, base_models):
+        return False
+
+    # 与常规训练相同的验证集划分，元模型使用基础模型在验证集样本上的 out-of-fold 预测训练
+    _, meta_indices = train_test_split(np.arange(len(X)), test_size=model.validation_split, random_state=42)
+    is_classification = isinstance(model, _get_blending_classifier_class())
+    meta_features = []
+    for base in base_models:
+        if is_classification and hasattr(base.model, "predict_proba"):
+            oof = _out_of_fold_predictions(base, X, y, _BLENDING_OOF_FOLDS, "predict_proba", n_jobs)
+        else:
+            oof = _out_of_fold_predictions(base, X, y, _BLENDING_OOF_FOLDS, "predict", n_jobs)
+            oof = np.column_stack([oof, 1 - oof]) if is_classification else oof.reshape(-1, 1)
+        meta_features.append(oof[meta_indices])
+
+    model.meta_estimator.fit(np.column_stack(meta_features), np.asarray(y)[meta_indices])
+    if is_classification:
+        model.classes_ = np.unique(y)
+    return True
+
+
+@functools.cache
+def _get_precomputed_estimator_classes() -> tuple[type, type]:
+    from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
+    from sklearn.utils.metaestimators import available_if
+
+    def _uses(method: str) -> Any:
+        return lambda self: self.method == method
+
+    class PrecomputedPredictions(BaseEstimator):
+        """
+        在 Stacking 拟合元模型时代替基础模型，返回保存的 out-of-fold 预测
+
+        `predict` 始终可用(交叉验证要求模型实现 predict)，其余预测方法只在 method 与之相同时可用，
+        使 Stacking 选择与基础模型相同的预测方法。
+        """
+
+        def __init__(self, predictions: np.ndarray, method: str) -> None:
+            self.predictions = predictions
+            self.method = method
+
+        def __sklearn_clone__(self) -> Self:
+            return self
+
+        def fit(self, _X: Any, y: Any) -> Self:
+            self.classes_ = np.unique(y)
+            return self
+
+        def predict(self, _X: Any) -> np.ndarray:
+            return self.predictions
+
+        @available_if(_uses("predict_proba"))
+        def predict_proba(self, _X: Any) -> np.ndarray:
+            return self.predictions
+
+        @available_if(_uses("decision_function"))
+        def decision_function(self, _X: Any) -> np.ndarray:
+            return self.predictions
+
+    class PrecomputedClassifier(ClassifierMixin, PrecomputedPredictions):
+        pass
+
+    class PrecomputedRegressor(RegressorMixin, PrecomputedPredictions):
+        pass
+
+    return PrecomputedClassifier, PrecomputedRegressor
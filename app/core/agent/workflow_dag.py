@@ -0,0 +1,161 @@
+"""
+工作流依赖图
+
+根据工具调用参数中引用的数据集和模型推断步骤之间的数据依赖，
+没有依赖关系的步骤可以并发执行。
+"""
+
+import dataclasses
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from app.core.agent.resume import get_resumable_params
+
+# 引用已有数据集的参数
+_DATASET_INPUT_KEYS = frozenset({"dataset_id", "left_dataset_id", "right_dataset_id", "dataset_ids"})
+# 以 {变量名: 数据集ID} 形式引用数据集的参数
+_DATASET_MAPPING_KEYS = frozenset({"source_datasets"})
+# 写入数据集的参数
+_DATASET_OUTPUT_KEYS = frozenset({"new_dataset_id", "target_dataset_id", "prediction_dataset_id"})
+# 指定新数据集ID的参数，未指定时由数据源的随机数生成器分配ID
+_DATASET_CREATE_KEYS = frozenset({"new_dataset_id", "prediction_dataset_id"})
+# 引用模型的参数
+_MODEL_KEYS = frozenset({"model_id", "trained_model_id", "model_ids"})
+
+# 只读取数据集/模型、不修改任何状态的工具(进程内加锁的结果缓存除外，见 SHARED_CACHE_TOOLS)
+READ_ONLY_TOOLS = frozenset(
+    {
+        "analyze_data",
+        "inspect_dataframe_tool",
+        "get_missing_values_summary_tool",
+        "correlation_analysis_tool",
+        "detect_outliers_tool",
+        "lag_analysis_tool",
+        "select_features_tool",
+        "analyze_feature_importance_tool",
+        "plot_learning_curve_tool",
+        "check_model_compatibility_tool",
+        "evaluate_model_tool",
+        "list_saved_models_tool",
+    }
+)
+# 使用 matplotlib.pyplot 全局状态绘图的工具，彼此之间不能并发
+PLOTTING_TOOLS = frozenset(
+    {
+        "select_features_tool",
+        "analyze_feature_importance_tool",
+        "optimize_hyperparameters_tool",
+        "plot_learning_curve_tool",
+    }
+)
+# 写入进程内共享结果缓存的工具: 缓存自身线程安全，但按原始顺序执行时后面的步骤能复用前面步骤的结果，
+# 并发执行则会重复训练
+SHARED_CACHE_TOOLS: Mapping[str, frozenset[str]] = {
+    "select_features_tool": frozenset({"cache:random_forest"}),
+    "analyze_feature_importance_tool": frozenset({"cache:random_forest"}),
+    "optimize_hyperparameters_tool": frozenset({"cache:fold_scores"}),
+    "plot_learning_curve_tool": frozenset({"cache:fold_scores"}),
+}
+
+# 特殊资源
+_ALL = "*"  # 无法推断访问范围的步骤，与所有步骤互斥
+_SOURCES_RNG = "sources:rng"  # 数据源ID生成器，决定新数据集的ID
+_PYPLOT = "pyplot"  # matplotlib.pyplot 全局状态
+
+
+@dataclasses.dataclass(frozen=True)
+class WorkflowStep:
+    """
+    工作流中的一个步骤
+
+    Args:
+        index: 步骤在工作流中的位置
+        name: 工具名称
+        reads: 读取的资源
+        writes: 写入的资源
+        deps: 必须在该步骤之前完成的步骤位置，升序排列
+    """
+
+    index: int
+    name: str
+    reads: frozenset[str]
+    writes: frozenset[str]
+    deps: tuple[int, ...] = ()
+
+
+def _ids(value: Any) -> list[str]:
+    if isinstance(value, str) and value:
+        return [value]
+    if isinstance(value, list):
+        return [v for v in value if isinstance(v, str) and v]
+    if isinstance(value, dict):
+        return _ids(list(value.values()))
+    return []
+
+
+def infer_step_access(name: str, args: Mapping[str, Any]) -> tuple[frozenset[str], frozenset[str]]:
+    """
+    推断工具调用读写的资源
+
+    Args:
+        name: 工具名称
+        args: 工具调用参数
+
+    Returns:
+        tuple[frozenset[str], frozenset[str]]: (读取的资源, 写入的资源)
+    """
+    reads: set[str] = set()
+    writes: set[str] = set()
+
+    for key, value in args.items():
+        if key in _DATASET_INPUT_KEYS or key in _DATASET_MAPPING_KEYS:
+            reads.update(f"dataset:{ds}" for ds in _ids(value))
+        elif key in _MODEL_KEYS:
+            reads.update(f"model:{model}" for model in _ids(value))
+        elif key in _DATASET_OUTPUT_KEYS:
+            writes.update(f"dataset:{ds}" for ds in _ids(value))
+
+    if name in PLOTTING_TOOLS:
+        writes.add(_PYPLOT)
+    writes.update(SHARED_CACHE_TOOLS.get(name, ()))
+
+    if name in READ_ONLY_TOOLS:
+        return frozenset(reads), frozenset(writes)
+
+    # 其余工具可能原地修改引用的数据集或模型
+    writes |= reads
+    # 未显式指定输出ID时，新数据集的ID由随机数生成器按调用顺序分配
+    params = get_resumable_params(name)
+    if any(key in _DATASET_CREATE_KEYS and not args.get(key) for key in params):
+        writes.add(_SOURCES_RNG)
+    if not writes:
+        writes.add(_ALL)
+    return frozenset(reads), frozenset(writes)
+
+
+def _conflicts(a: WorkflowStep, b: WorkflowStep) -> bool:
+    if _ALL in a.writes or _ALL in b.writes:
+        return True
+    return bool(a.writes & (b.reads | b.writes) or b.writes & a.reads)
+
+
+def build_workflow_dag(calls: Sequence[tuple[str, Mapping[str, Any]]]) -> list[WorkflowStep]:
+    """
+    构建工作流依赖图
+
+    访问相同资源且至少一方写入的两个步骤按原始顺序执行，
+    因此任意满足依赖的执行顺序都与顺序执行的结果一致。
+
+    Args:
+        calls: 按原始顺序排列的 (工具名称, 参数)
+
+    Returns:
+        list[WorkflowStep]: 与输入顺序一致的步骤列表
+    """
+    steps: list[WorkflowStep] = []
+    for index, (name, args) in enumerate(calls):
+        reads, writes = infer_step_access(name, args)
+        step = WorkflowStep(index, name, reads, writes)
+        deps = tuple(prev.index for prev in steps if _conflicts(prev, step))
+        steps.append(dataclasses.replace(step, deps=deps))
+    return steps
@@ -2,6 +2,7 @@ from .general_analysis import GeneralDataAnalysis as GeneralDataAnalysis
 from .general_analysis import GeneralDataAnalysisInput as GeneralDataAnalysisInput
 from .general_analysis import GeneralSummary as GeneralSummary
 from .general_analysis import GeneralSummaryInput as GeneralSummaryInput
+from .general_analysis import QueryAnalysisResult as QueryAnalysisResult
 from .general_analysis import QueryGenerator as QueryGenerator
 from .general_analysis import QueryGeneratorInput as QueryGeneratorInput
 from .llm import get_chat_model as get_chat_model
@@ -0,0 +1,178 @@
+import ast
+import sys
+from dataclasses import dataclass
+
+import pandas as pd
+
+# 生成代码允许导入的第三方库，其余仅允许标准库
+ALLOWED_MODULES = frozenset({"numpy", "pandas", "scipy", "matplotlib", "seaborn", "statsmodels"})
+# 仅对数值列有意义的聚合方法
+NUMERIC_METHODS = frozenset({"mean", "median", "std", "var", "sem", "skew", "kurt", "quantile", "corr", "cov"})
+# 类型转换函数，出现在这些调用中的列视为已转换
+CONVERT_FUNCS = frozenset({"to_numeric", "to_datetime", "to_timedelta", "astype"})
+# 按标签或位置写入单元格的索引器，可能新增列
+INDEXERS = frozenset({"loc", "iloc", "at", "iat"})
+
+
+@dataclass(frozen=True)
+class CodeSchema:
+    """
+    生成代码可见的数据结构
+
+    Args:
+        columns: 数据列名
+        text_columns: 无法解析为数值的文本列
+    """
+
+    columns: frozenset[str]
+    text_columns: frozenset[str]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "CodeSchema":
+        """
+        根据(预览)数据构建结构信息
+
+        数据在执行器中经过 CSV 往返，数值字符串会被重新识别为数值，
+        因此只有所有非空值都无法解析为数值的列才视为文本列。
+        """
+        text_columns: set[str] = set()
+        for col in df.columns:
+            series = df[col]
+            if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+                continue
+            values = series.dropna()
+            if len(values) and pd.to_numeric(values, errors="coerce").isna().all():
+                text_columns.add(str(col))
+        return cls(frozenset(map(str, df.columns)), frozenset(text_columns))
+
+
+def _is_df(node: ast.AST) -> bool:
+    return isinstance(node, ast.Name) and node.id == "df"
+
+
+def _subscript_columns(node: ast.Subscript) -> list[str]:
+    match node.slice:
+        case ast.Constant(value=str(col)):
+            return [col]
+        case ast.List(elts=elts) | ast.Tuple(elts=elts):
+            return [elt.value for elt in elts if isinstance(elt, ast.Constant) and isinstance(elt.value, str)]
+    return []
+
+
+def _is_inplace(node: ast.Call) -> bool:
+    return any(
+        kw.arg == "inplace" and not (isinstance(kw.value, ast.Constant) and kw.value.value is False)
+        for kw in node.keywords
+    )
+
+
+def _func_name(node: ast.Call) -> str | None:
+    match node.func:
+        case ast.Attribute(attr=name) | ast.Name(id=name):
+            return name
+    return None
+
+
+def _check_imports(tree: ast.Module) -> str | None:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules = [node.module]
+        else:
+            continue
+        for module in modules:
+            top = module.partition(".")[0]
+            if top not in ALLOWED_MODULES and top not in sys.stdlib_module_names:
+                allowed = ", ".join(sorted(ALLOWED_MODULES))
+                return f"禁止导入的模块 (行 {node.lineno}): {module}，仅允许标准库和 {allowed}"
+    return None
+
+
+def _check_columns(tree: ast.Module, schema: CodeSchema) -> str | None:
+    known = set(schema.columns)
+    converted: set[str] = set()
+    loads: list[tuple[int, str]] = []
+    numeric_ops: list[tuple[int, str, str]] = []
+
+    for node in ast.walk(tree):
+        match node:
+            # df 被整体替换或重命名列后无法静态推断列名
+            case ast.Assign(targets=targets) if any(
+                _is_df(t) or (isinstance(t, ast.Attribute) and _is_df(t.value) and t.attr == "columns") for t in targets
+            ):
+                return None
+            case ast.Subscript(value=value, ctx=ast.Store()) if _is_df(value):
+                cols = _subscript_columns(node)
+                known.update(cols)
+                converted.update(cols)
+            case ast.Subscript(value=value, ctx=ast.Load()) if _is_df(value):
+                loads.extend((node.lineno, col) for col in _subscript_columns(node))
+            case ast.Call(func=ast.Attribute(value=value, attr="rename")) if _is_df(value):
+                for kw in node.keywords:
+                    if kw.arg != "columns":
+                        continue
+                    match kw.value:
+                        case ast.Dict(values=new_names):
+                            known.update(
+                                v.value for v in new_names if isinstance(v, ast.Constant) and isinstance(v.value, str)
+                            )
+                        case _:
+                            return None
+            case ast.Call(func=ast.Attribute(value=value, attr="insert")) if _is_df(value):
+                match node.args:
+                    case [_, ast.Constant(value=str(col)), *_]:
+                        known.add(col)
+            # 通过索引器写入、原地修改或 assign 链式调用可能新增列，无法静态推断列名
+            case ast.Subscript(value=ast.Attribute(value=value, attr=attr), ctx=ast.Store()) if (
+                _is_df(value) and attr in INDEXERS
+            ):
+                return None
+            case ast.Call(func=ast.Attribute(value=value, attr=method)) if _is_df(value) and (
+                method == "assign" or _is_inplace(node)
+            ):
+                return None
+
+        if isinstance(node, ast.Call) and _func_name(node) in CONVERT_FUNCS:
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Subscript) and _is_df(sub.value):
+                    converted.update(_subscript_columns(sub))
+
+        match node:
+            case ast.Call(func=ast.Attribute(value=ast.Subscript(value=value) as sub, attr=method)) if (
+                _is_df(value) and method in NUMERIC_METHODS
+            ):
+                numeric_ops.extend((node.lineno, col, method) for col in _subscript_columns(sub))
+
+    for lineno, col in sorted(loads):
+        if col not in known:
+            available = ", ".join(map(repr, sorted(schema.columns)))
+            return f"列不存在 (行 {lineno}): {col!r}，可用列: {available}"
+
+    for lineno, col, method in sorted(numeric_ops):
+        if col in schema.text_columns and col not in converted:
+            return f"类型不兼容 (行 {lineno}): 文本列 {col!r} 不能直接调用 {method}()，请先转换为数值类型"
+
+    return None
+
+
+def validate_code(code: str, schema: CodeSchema) -> str | None:
+    """
+    在执行前对生成的代码进行静态检查
+
+    检查语法、导入的模块、引用的列以及对文本列的数值运算，
+    只报告可以确定会失败的问题，无法静态推断时放行交给执行器。
+
+    Args:
+        code: 生成的Python代码
+        schema: 数据结构信息
+
+    Returns:
+        str | None: 错误描述，检查通过时返回None
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as err:
+        return f"代码语法错误 (行 {err.lineno} 列 {err.offset}): {err.msg}"
+
+    return _check_imports(tree) or _check_columns(tree, schema)
@@ -1,16 +1,18 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import override
+from typing import cast, override
 
 from langchain.prompts import PromptTemplate
-from langchain_core.runnables import RunnableLambda
-from langchain_core.runnables.base import RunnableEach
 
+from app.core.config import settings
 from app.core.datasource import DataSource
-from app.core.executor import ExecuteResult
+from app.core.executor import CodeExecutor, ExecuteResult
 from app.log import logger
+from app.utils import with_semaphore
 
 from ._base import BaseLLMRunnable
-from .llm import LLM
+from .llm import LLM, rate_limiter
 from .nl_analysis import NL2DataAnalysis
 
 GENERAL_DATA_ANALYSIS_QUERIES_PROMPT = """\
@@ -184,29 +186,93 @@ class GeneralDataAnalysisInput:
     focus_areas: list[str] | None = None
 
 
+@dataclass
+class QueryAnalysisResult:
+    """单条分析查询的执行结果"""
+
+    index: int
+    query: str
+    result: ExecuteResult
+    summary: str
+    elapsed: float
+
+
 class GeneralDataAnalysis(
     BaseLLMRunnable[
         GeneralDataAnalysisInput,
         tuple[str, list[bytes]],
     ]
 ):
-    def __init__(self, llm: LLM) -> None:
+    """
+    通用数据分析
+
+    生成若干分析查询并发执行，每条查询使用独立的代码执行器，最后汇总为分析报告。
+    同时运行的执行器数量由配置 EXECUTOR_MAX_CONCURRENCY 限制，所有实例共享该上限。
+
+    Args:
+        llm: 语言模型
+        max_llm_calls_per_minute: 所有查询共享的 LLM 调用速率上限，None表示不限制
+    """
+
+    def __init__(self, llm: LLM, max_llm_calls_per_minute: int | None = None) -> None:
+        if max_llm_calls_per_minute is not None:
+            llm = cast("LLM", rate_limiter(max_llm_calls_per_minute) | llm)
         super().__init__(llm)
-        self.analyzer = NL2DataAnalysis(llm)
+
+    @with_semaphore(max(1, settings.EXECUTOR_MAX_CONCURRENCY))
+    def _analyze_query(self, index: int, source: DataSource, query: str) -> QueryAnalysisResult:
+        logger.info(f"开始分析: {query}")
+        start = time.perf_counter()
+        result: ExecuteResult
+        try:
+            with CodeExecutor(source) as executor:
+                result = NL2DataAnalysis(self.llm, executor=executor).invoke((source, query))
+        except Exception as e:
+            result = {
+                "success": False,
+                "output": "",
+                "error": f"执行异常: {e}",
+                "result": None,
+                "figure": None,
+            }
+        summary = format_analysis_result(query, result)
+        return QueryAnalysisResult(index, query, result, summary, time.perf_counter() - start)
+
+    def _analyze_queries(self, source: DataSource, queries: list[str]) -> list[QueryAnalysisResult]:
+        """
+        并发执行分析查询
+
+        Args:
+            source: 数据源
+            queries: 分析查询列表
+
+        Returns:
+            list[QueryAnalysisResult]: 与查询顺序一致的分析结果
+        """
+        if not queries:
+            return []
+
+        # 预先加载完整数据，避免多个执行器并发触发加载
+        source.get_full()
+
+        items: list[QueryAnalysisResult] = []
+        workers = min(max(1, settings.EXECUTOR_MAX_CONCURRENCY), len(queries))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="general-analysis") as pool:
+            futures = [pool.submit(self._analyze_query, idx, source, query) for idx, query in enumerate(queries)]
+            for finished, future in enumerate(as_completed(futures), 1):
+                item = future.result()
+                logger.opt(colors=True).info(
+                    f"分析完成 (<y>{finished}</>/<y>{len(queries)}</>): "
+                    f"success=<y>{item.result['success']}</> 耗时 <y>{item.elapsed:.2f}</>s"
+                )
+                items.append(item)
+        return sorted(items, key=lambda item: item.index)
 
     def _run(self, input: GeneralDataAnalysisInput) -> tuple[str, list[bytes]]:
         overview = input.source.format_overview()
         query_focus, summary_focus = format_focus(input.focus_areas)
 
-        @RunnableLambda
-        def worker(query: str) -> tuple[str, ExecuteResult]:
-            logger.info(f"开始分析: {query}")
-            return query, self.analyzer.invoke((input.source, query))
-
-        chain = (
-            QueryGenerator(self.llm)
-            | RunnableEach(bound=worker)
-            | (lambda results: GeneralSummaryInput(overview, results, summary_focus))
-            | GeneralSummary(self.llm)
-        )
-        return chain.invoke(QueryGeneratorInput(overview, query_focus))
+        queries = QueryGenerator(self.llm).invoke(QueryGeneratorInput(overview, query_focus))
+        items = self._analyze_queries(input.source, queries)
+        results = [(item.query, item.result) for item in items]
+        return GeneralSummary(self.llm).invoke(GeneralSummaryInput(overview, results, summary_focus))
@@ -29,19 +29,22 @@ def rate_limiter(max_call_per_minute: int) -> Runnable[Any, Any]:
 
     calls: list[datetime.datetime] = []
     delta = datetime.timedelta(minutes=1)
+    # 多个线程共享同一个限流器时，超限的调用依次排队等待
+    lock = threading.Lock()
 
     def limiter(input: Any) -> Any:
-        now = datetime.datetime.now()
-        calls.append(now)
-        # 清理超过一分钟的调用记录
-        expired = now - delta
-        calls[:] = [call for call in calls if call > expired]
-        if len(calls) > max_call_per_minute:
-            wait_time = 60 - (now - calls[0]).total_seconds()
-            if wait_time > 0:
-                logger.opt(colors=True).warning(f"超过速率限制，等待 <y>{wait_time:.2f}</> 秒")
-                threading.Event().wait(wait_time)
-                logger.info("等待结束，继续处理请求")
+        with lock:
+            now = datetime.datetime.now()
+            calls.append(now)
+            # 清理超过一分钟的调用记录
+            expired = now - delta
+            calls[:] = [call for call in calls if call > expired]
+            if len(calls) > max_call_per_minute:
+                wait_time = 60 - (now - calls[0]).total_seconds()
+                if wait_time > 0:
+                    logger.opt(colors=True).warning(f"超过速率限制，等待 <y>{wait_time:.2f}</> 秒")
+                    threading.Event().wait(wait_time)
+                    logger.info("等待结束，继续处理请求")
 
         if isinstance(input, dict):  # graph input (state)
             # remove keys to avoid warnings
@@ -1,4 +1,6 @@
 import re
+import threading
+from collections import OrderedDict
 
 import pandas as pd
 from langchain.prompts import PromptTemplate
@@ -8,6 +10,7 @@ from app.core.executor import AbstractCodeExecutor, CodeExecutor, ExecuteResult
 from app.log import logger
 
 from ._base import BaseLLMRunnable
+from .code_check import CodeSchema, validate_code
 from .llm import LLM
 
 _filter_patterns = [
@@ -189,6 +192,51 @@ class FixCode(
         return (prompt | self.llm | code_parser).invoke(params)
 
 
+type CodeCacheKey = tuple[str, tuple[tuple[str, str], ...], str]
+
+
+class AnalysisCodeCache:
+    """
+    成功执行的分析代码缓存
+
+    以 (数据源ID, 列名和数据类型, 查询) 为键，相同结构数据上的重复查询直接复用代码，跳过代码生成。
+    键只取决于数据结构，与完整数据是否已加载无关。
+
+    Args:
+        max_size: 最大缓存条目数
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        self.max_size = max_size
+        self._data: OrderedDict[CodeCacheKey, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source: DataSource, preview: pd.DataFrame, query: str) -> CodeCacheKey:
+        schema = tuple((str(col), str(dtype)) for col, dtype in preview.dtypes.items())
+        return source.metadata.id, schema, query.strip()
+
+    def get(self, key: CodeCacheKey) -> str | None:
+        with self._lock:
+            if (code := self._data.get(key)) is not None:
+                self._data.move_to_end(key)
+            return code
+
+    def put(self, key: CodeCacheKey, code: str) -> None:
+        with self._lock:
+            self._data[key] = code
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def discard(self, key: CodeCacheKey) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+code_cache = AnalysisCodeCache()
+
+
 class NL2DataAnalysis(
     BaseLLMRunnable[
         tuple[DataSource, str],
@@ -205,18 +253,36 @@ class NL2DataAnalysis(
         self.max_retry: int = max_retry
         self.executor = executor
 
-    def execute(self, source: DataSource, query: str) -> ExecuteResult:
+    def _execute_code(self, source: DataSource, schema: CodeSchema, code: str) -> ExecuteResult:
+        # 先在本地进行静态检查，明显会失败的代码不提交给执行器
+        if error := validate_code(code, schema):
+            logger.info(f"分析代码未通过检查: {error}")
+            return {"success": False, "output": "", "error": error, "result": None, "figure": None}
+
         if self.executor is None:
             self.executor = CodeExecutor(source)
+        return self.executor.execute(code)
 
+    def execute(self, source: DataSource, query: str) -> ExecuteResult:
         overview = source.format_overview()
+        preview = source.get_preview(source.metadata.preview_rows)
+        schema = CodeSchema.from_dataframe(preview)
+        cache_key = code_cache.key(source, preview, query)
+
+        if (code := code_cache.get(cache_key)) is not None:
+            result = self._execute_code(source, schema, code)
+            logger.info(f"复用已缓存的分析代码: success={result['success']}")
+            if result["success"]:
+                return result
+            code_cache.discard(cache_key)
 
         code = NL2Code(self.llm).invoke((overview, query))
 
-        result = self.executor.execute(code)
+        result = self._execute_code(source, schema, code)
         logger.info(f"初始分析执行结果: success={result['success']}")
 
         if result["success"]:
+            code_cache.put(cache_key, code)
             return result
 
         fix = FixCode(self.llm)
@@ -224,9 +290,10 @@ class NL2DataAnalysis(
             error = result["error"] + "\n\n" + result["output"]
             logger.info(f"尝试修复分析代码并重新执行: {attempt}/{self.max_retry}\n{error}")
             code = fix.invoke((query, overview, code, error))
-            result = self.executor.execute(code)
+            result = self._execute_code(source, schema, code)
             logger.info(f"修复后分析执行结果: success={result['success']}")
             if result["success"]:
+                code_cache.put(cache_key, code)
                 return result
 
         logger.warning(f"分析执行失败: \n{result['error']}")
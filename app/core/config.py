@@ -35,6 +35,14 @@ class Settings(BaseSettings):
     # Docker Executor
     DOCKER_RUNNER_IMAGE: str | None = None
     EXECUTOR_DATA_DIR: Path | None = None
+    # 同时运行的代码执行器数量上限
+    EXECUTOR_MAX_CONCURRENCY: int = 4
+    # 推理时缓存的已加载模型总大小上限(MB)
+    MODEL_CACHE_MAX_MB: int = 1024
+    # 节点上计算密集型工具可同时使用的 CPU 核数，默认为可用核数
+    CPU_TOKENS: int | None = None
+    # 工作流中同时执行的工具调用数量上限
+    WORKFLOW_MAX_PARALLEL: int = 4
 
     # Dremio REST API config
     DREMIO_BASE_URL: str = "http://localhost"
@@ -0,0 +1,261 @@
+"""
+CPU 资源预算
+
+计算密集型工具在并行计算前从节点级的 CPU 令牌池获取令牌，并按获得的令牌数设置并行度，
+避免多个工作进程中的并发会话同时占满所有核心。
+
+令牌以文件锁实现: 每个令牌对应令牌目录中的一个锁文件，同一节点上的所有工作进程共享，
+进程退出时操作系统自动释放其持有的锁。
+"""
+
+import contextlib
+import dataclasses
+import os
+import random
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from app.const import TEMP_DIR
+from app.core.config import settings
+from app.log import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    """
+    节点上的 Web 工作进程数
+
+    在 gunicorn 下运行时与 `docker/gunicorn_conf.py` 的计算方式一致，否则为1。
+    """
+    if "gunicorn" not in sys.modules:
+        return 1
+
+    if web_concurrency := os.getenv("WEB_CONCURRENCY"):
+        return max(int(web_concurrency), 1)
+
+    workers = max(int(float(os.getenv("WORKERS_PER_CORE", "1")) * (os.cpu_count() or 1)), 2)
+    if max_workers := os.getenv("MAX_WORKERS"):
+        workers = min(workers, int(max_workers))
+    return max(workers, 1)
+
+
+def cpu_budget() -> int:
+    """
+    单个工作进程可用于并行计算的 CPU 核数
+
+    Returns:
+        int: 传给 `n_jobs` 等参数的并行度，至少为1
+    """
+    if sys.platform == "win32":
+        # Windows 下 loky 进程池开销较大且不稳定，禁用并行处理
+        return 1
+    return max(_available_cores() // worker_count(), 1)
+
+
+@dataclasses.dataclass
+class CpuSchedulerStats:
+    """
+    CPU 令牌获取统计(当前进程)
+
+    Args:
+        acquisitions: 获取次数
+        waiting: 正在等待令牌的调用数
+        in_use: 当前进程持有的令牌数
+        tokens_granted: 累计获得的令牌数
+        total_wait: 累计等待时间(秒)
+        max_wait: 最长等待时间(秒)
+    """
+
+    acquisitions: int = 0
+    waiting: int = 0
+    in_use: int = 0
+    tokens_granted: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.acquisitions if self.acquisitions else 0.0
+
+
+class CpuScheduler:
+    """
+    节点级 CPU 令牌调度器
+
+    每次获取最多 `want` 个令牌，有空闲令牌时立即返回实际获得的数量，
+    没有空闲令牌时等待。同一线程内嵌套获取时直接复用外层的令牌。
+
+    Args:
+        total: 节点上的令牌总数
+        directory: 令牌锁文件目录，同一节点上的工作进程必须使用相同目录
+        poll_interval: 等待令牌时的初始轮询间隔(秒)
+    """
+
+    def __init__(self, total: int, directory: Path, poll_interval: float = 0.02) -> None:
+        self.total = max(total, 1)
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._stats = CpuSchedulerStats()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 无文件锁的平台退化为进程内计数
+        self._free = self.total
+        self._cond = threading.Condition(self._lock)
+
+    def _slot(self, index: int) -> Path:
+        return self.directory / f"cpu-{index}.lock"
+
+    def _try_acquire_files(self, want: int) -> list[int]:
+        assert fcntl is not None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fds: list[int] = []
+        # 从随机位置开始扫描，减少进程之间在同一批锁文件上的竞争
+        offset = random.randrange(self.total)
+        for i in range(self.total):
+            fd = os.open(self._slot((offset + i) % self.total), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            fds.append(fd)
+            if len(fds) == want:
+                break
+        return fds
+
+    def _release_files(self, fds: list[int]) -> None:
+        assert fcntl is not None
+        for fd in fds:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+    def _acquire(self, want: int) -> tuple[int, list[int]]:
+        if fcntl is None:
+            with self._cond:
+                self._cond.wait_for(lambda: self._free > 0)
+                granted = min(want, self._free)
+                self._free -= granted
+            return granted, []
+
+        delay = self.poll_interval
+        while not (fds := self._try_acquire_files(want)):
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, 0.1)
+        return len(fds), fds
+
+    def _release(self, granted: int, fds: list[int]) -> None:
+        if fcntl is None:
+            with self._cond:
+                self._free += granted
+                self._cond.notify_all()
+        else:
+            self._release_files(fds)
+
+    @contextlib.contextmanager
+    def acquire(self, want: int | None = None, *, name: str = "") -> Iterator[int]:
+        """
+        获取 CPU 令牌
+
+        Args:
+            want: 希望获得的令牌数，默认为当前工作进程的公平份额 `cpu_budget()`
+            name: 调用方名称，用于日志
+
+        Returns:
+            Iterator[int]: 实际获得的令牌数，应作为 `n_jobs` 等并行度参数
+        """
+        if held := getattr(self._local, "held", 0):
+            yield held
+            return
+
+        want = min(max(want or cpu_budget(), 1), self.total)
+        start = time.perf_counter()
+        with self._lock:
+            self._stats.waiting += 1
+        try:
+            granted, fds = self._acquire(want)
+        finally:
+            with self._lock:
+                self._stats.waiting -= 1
+        wait = time.perf_counter() - start
+
+        with self._lock:
+            stats = self._stats
+            stats.acquisitions += 1
+            stats.in_use += granted
+            stats.tokens_granted += granted
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+        if wait > 1:
+            logger.opt(colors=True).debug(
+                f"<y>{name or 'CPU 任务'}</> 等待 CPU 令牌 <y>{wait:.2f}</>s，获得 <c>{granted}</>/{want} 个"
+            )
+
+        self._local.held = granted
+        try:
+            yield granted
+        finally:
+            self._local.held = 0
+            self._release(granted, fds)
+            with self._lock:
+                self._stats.in_use -= granted
+
+    def node_in_use(self) -> int:
+        """节点上所有工作进程当前持有的令牌数"""
+        if fcntl is None:
+            with self._lock:
+                return self.total - self._free
+        assert fcntl is not None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        in_use = 0
+        # 逐个探测并立即释放，任意时刻最多占用一个空闲令牌，不影响其他进程获取
+        for i in range(self.total):
+            fd = os.open(self._slot(i), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                in_use += 1
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        return in_use
+
+    def stats(self) -> dict[str, float]:
+        """令牌池和当前进程的等待统计"""
+        with self._lock:
+            stats = dataclasses.replace(self._stats)
+        return {
+            "total_tokens": self.total,
+            "node_in_use": self.node_in_use(),
+            **dataclasses.asdict(stats),
+            "mean_wait": stats.mean_wait,
+        }
+
+
+cpu_scheduler = CpuScheduler(settings.CPU_TOKENS or _available_cores(), TEMP_DIR / "cpu_tokens")
+
+
+def cpu_tokens(want: int | None = None, *, name: str = "") -> contextlib.AbstractContextManager[int]:
+    """
+    从节点级令牌池获取 CPU 令牌
+
+    用法:
+        with cpu_tokens(name="RFECV") as n_jobs:
+            RFECV(..., n_jobs=n_jobs).fit(X, y)
+    """
+    return cpu_scheduler.acquire(want, name=name)
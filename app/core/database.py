@@ -1,7 +1,9 @@
+import contextlib
 from collections.abc import AsyncGenerator
 from contextvars import ContextVar
 from typing import Annotated
 
+import anyio
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, declarative_base
@@ -21,6 +23,7 @@ _session_maker = async_sessionmaker(autocommit=False, autoflush=False, bind=_eng
 _current_session = ContextVar[AsyncSession]("current_session")
 
 Base: type[DeclarativeBase] = declarative_base()
+_tables_lock = anyio.Lock()
 
 
 async def get_db() -> AsyncGenerator[AsyncSession]:
@@ -38,6 +41,22 @@ async def get_db() -> AsyncGenerator[AsyncSession]:
         await session.close()
 
 
+@contextlib.asynccontextmanager
+async def session_scope() -> AsyncGenerator[AsyncSession]:
+    """
+    在请求之外使用的数据库会话
+
+    退出时提交事务，发生异常时回滚。
+    """
+    async with _session_maker() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
 def get_current_session() -> AsyncSession:
     """
     获取当前的数据库会话
@@ -53,7 +72,8 @@ def get_current_session() -> AsyncSession:
 
 @lifespan.on_startup
 async def create_all_tables() -> None:
-    async with _engine.begin() as conn:
+    """创建所有数据表，可以重复调用(已存在的表会被跳过)，依赖数据表的启动函数应先调用此函数"""
+    async with _tables_lock, _engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 
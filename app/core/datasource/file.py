@@ -1,10 +1,13 @@
+import functools
+from collections.abc import AsyncGenerator
 from pathlib import Path
 from typing import Any, override
 
+import anyio.to_thread
 import pandas as pd
 from pydantic import BaseModel
 
-from .source import DataSource, DataSourceMetadata
+from .source import DataSource, DataSourceMetadata, iter_frame_chunks
 
 
 class CSVDataSourceModel(BaseModel):
@@ -54,6 +57,20 @@ class FileDataSource(DataSource):
 
         return (pd.read_csv if self.file_path.suffix == ".csv" else pd.read_excel)(self.file_path, **kwargs)
 
+    @override
+    async def iter_data_async(self, chunk_size: int) -> AsyncGenerator[pd.DataFrame]:
+        """按块读取文件数据，CSV 文件逐块解析，Excel 文件需完整读取后切分"""
+        if self._full_data is not None or self.file_path.suffix != ".csv":
+            for chunk in iter_frame_chunks(await self.get_full_async(), chunk_size):
+                yield chunk
+            return
+
+        kwargs = self.pandas_kwargs | {"chunksize": chunk_size}
+        reader = await anyio.to_thread.run_sync(functools.partial(pd.read_csv, self.file_path, **kwargs))
+        with reader:
+            while (chunk := await anyio.to_thread.run_sync(next, reader, None)) is not None:
+                yield chunk
+
     @override
     def _shape(self) -> tuple[int, int]:
         return self._full_data.shape if self._full_data is not None else self._load().shape
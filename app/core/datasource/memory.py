@@ -1,8 +1,9 @@
+from collections.abc import AsyncGenerator
 from typing import Any, cast, override
 
 import pandas as pd
 
-from .source import DataSource, DataSourceMetadata
+from .source import DataSource, DataSourceMetadata, iter_frame_chunks
 
 
 class InMemoryDataSource(DataSource):
@@ -46,6 +47,13 @@ class InMemoryDataSource(DataSource):
         # 直接调用同步方法避免线程切换开销
         return self._load(n_rows, skip)
 
+    @override
+    async def iter_data_async(self, chunk_size: int) -> AsyncGenerator[pd.DataFrame]:
+        """按块读取内存数据，保留原数据的索引"""
+        data = self._full_data if self._full_data is not None else self._data
+        for chunk in iter_frame_chunks(data, chunk_size):
+            yield chunk
+
     @override
     def _shape(self) -> tuple[int, int]:
         """获取数据源的形状"""
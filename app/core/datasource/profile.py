@@ -0,0 +1,228 @@
+"""
+数据框概况
+
+一次遍历计算每列的空值数量、唯一值数量、内存占用和数值统计摘要，
+供数据查看工具、缺失值摘要和系统提示词中的数据概览共用。
+
+概况按数据版本和列缓存: 数据源的数据被修改后版本号随之变化，同一版本的数据上
+重复查看时直接复用已计算的列，无需再读取数据。
+"""
+
+import dataclasses
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+SUMMARY_PERCENTILES = (0.25, 0.5, 0.75)
+PROFILE_CACHE_SIZE = 16
+
+
+@dataclasses.dataclass(frozen=True)
+class ColumnProfile:
+    """
+    单列概况
+
+    Args:
+        dtype: 数据类型
+        null_count: 空值数量
+        unique_count: 唯一值数量(不含空值)
+        memory_bytes: 内存占用(字节，包含对象引用的内容)
+        summary: 数值列的统计摘要，键与 `Series.describe()` 一致，非数值列为None
+    """
+
+    dtype: str
+    null_count: int
+    unique_count: int
+    memory_bytes: int
+    summary: dict[str, float] | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class DataFrameProfile:
+    """
+    数据框概况
+
+    Args:
+        n_rows: 行数
+        index_memory_bytes: 索引的内存占用(字节)
+        columns: 每列的概况，顺序与数据框一致
+    """
+
+    n_rows: int
+    index_memory_bytes: int
+    columns: dict[Hashable, ColumnProfile]
+
+    @property
+    def memory_bytes(self) -> int:
+        """包含索引在内的总内存占用，与 `DataFrame.memory_usage(deep=True).sum()` 一致"""
+        return self.index_memory_bytes + sum(col.memory_bytes for col in self.columns.values())
+
+    @property
+    def total_nulls(self) -> int:
+        return sum(col.null_count for col in self.columns.values())
+
+    def null_counts(self) -> dict[Hashable, int]:
+        return {name: col.null_count for name, col in self.columns.items()}
+
+    def unique_counts(self) -> dict[Hashable, int]:
+        return {name: col.unique_count for name, col in self.columns.items()}
+
+    def summary_stats(self) -> dict[str, dict[str, float]]:
+        """数值列的统计摘要，与 `DataFrame.describe().to_dict()` 的结构一致"""
+        return {str(name): col.summary for name, col in self.columns.items() if col.summary is not None}
+
+
+def _is_summary_dtype(dtype: Any) -> bool:
+    # 与 select_dtypes(include="number") 一致: 整数和浮点数，不含布尔和复数
+    return getattr(dtype, "kind", None) in {"i", "u", "f"}
+
+
+def _percentile_keys() -> list[str]:
+    return [f"{q:.0%}" for q in SUMMARY_PERCENTILES]
+
+
+def _empty_summary() -> dict[str, float]:
+    return {"count": 0.0} | dict.fromkeys(("mean", "std", "min", *_percentile_keys(), "max"), np.nan)
+
+
+def _profile_numeric(col: pd.Series, memory: int) -> ColumnProfile:
+    if isinstance(col.dtype, np.dtype) and col.dtype.kind in "iu":
+        valid = np.asarray(col)
+    else:
+        values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = values[~np.isnan(values)]
+
+    # 排序一次，同时得到唯一值数量、最值和分位数
+    ordered = np.sort(valid)
+    n = len(ordered)
+    if n == 0:
+        return ColumnProfile(str(col.dtype), len(col), 0, memory, _empty_summary())
+
+    summary = {
+        "count": float(n),
+        "mean": float(valid.mean()),
+        "std": float(valid.std(ddof=1)) if n > 1 else np.nan,
+        "min": float(ordered[0]),
+    }
+    for key, q in zip(_percentile_keys(), SUMMARY_PERCENTILES, strict=True):
+        # 线性插值，与 Series.quantile 的默认方式一致
+        pos = q * (n - 1)
+        lo = int(pos)
+        frac = pos - lo
+        low = float(ordered[lo])
+        summary[key] = low + (float(ordered[lo + 1]) - low) * frac if frac else low
+    summary["max"] = float(ordered[-1])
+
+    unique_count = int(np.count_nonzero(ordered[1:] != ordered[:-1])) + 1
+    return ColumnProfile(str(col.dtype), len(col) - n, unique_count, memory, summary)
+
+
+def _profile_arrow(col: pd.Series, memory: int) -> ColumnProfile:
+    assert pa is not None
+    assert pc is not None
+
+    array = pa.array(col.array)
+    null_count = array.null_count
+    unique_count = pc.count_distinct(array, mode="only_valid").as_py()
+    summary = None
+    if _is_summary_dtype(col.dtype):
+        n = len(array) - null_count
+        if n == 0:
+            summary = _empty_summary()
+        else:
+            min_max = pc.min_max(array)
+            quantiles = pc.quantile(array, q=list(SUMMARY_PERCENTILES), interpolation="linear").to_pylist()
+            summary = {
+                "count": float(n),
+                "mean": float(pc.mean(array).as_py()),
+                "std": float(pc.stddev(array, ddof=1).as_py()) if n > 1 else np.nan,
+                "min": float(min_max["min"].as_py()),
+                **dict(zip(_percentile_keys(), map(float, quantiles), strict=True)),
+                "max": float(min_max["max"].as_py()),
+            }
+    return ColumnProfile(str(col.dtype), null_count, unique_count, memory, summary)
+
+
+def _profile_column(col: pd.Series) -> ColumnProfile:
+    memory = int(col.memory_usage(deep=True, index=False))
+    if pa is not None and isinstance(col.array, pd.arrays.ArrowExtensionArray):
+        return _profile_arrow(col, memory)
+    if _is_summary_dtype(col.dtype):
+        return _profile_numeric(col, memory)
+    return ColumnProfile(str(col.dtype), int(col.isna().sum()), int(col.nunique()), memory)
+
+
+@dataclasses.dataclass
+class _ProfileEntry:
+    index_memory: int
+    columns: dict[Hashable, ColumnProfile] = dataclasses.field(default_factory=dict)
+
+
+_profile_cache: OrderedDict[Hashable, _ProfileEntry] = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+
+def _get_entry(df: pd.DataFrame, version: Hashable) -> _ProfileEntry:
+    with _profile_cache_lock:
+        if (entry := _profile_cache.get(version)) is not None:
+            _profile_cache.move_to_end(version)
+            return entry
+
+    entry = _ProfileEntry(int(df.index.memory_usage(deep=True)))
+    with _profile_cache_lock:
+        entry = _profile_cache.setdefault(version, entry)
+        _profile_cache.move_to_end(version)
+        while len(_profile_cache) > PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+    return entry
+
+
+def profile_dataframe(
+    df: pd.DataFrame,
+    columns: Iterable[Hashable] | None = None,
+    *,
+    version: Hashable | None = None,
+    base: DataFrameProfile | None = None,
+    changed: Iterable[Hashable] = (),
+) -> DataFrameProfile:
+    """
+    获取数据框的概况
+
+    Args:
+        df: 数据框
+        columns: 需要的列，默认为全部列
+        version: 数据版本号(如 `DataSource.version`)，提供时按版本缓存各列的概况，数据被修改后版本号必须变化
+        base: 修改前的数据框概况，除 `changed` 以外的列直接复用其中的结果
+        changed: 相对 `base` 被替换或新增的列
+
+    Returns:
+        DataFrameProfile: 数据框概况
+    """
+    if version is not None:
+        entry = _get_entry(df, version)
+    else:
+        entry = _ProfileEntry(base.index_memory_bytes if base is not None else int(df.index.memory_usage(deep=True)))
+    changed = set(changed)
+    reusable = {} if base is None else {name: col for name, col in base.columns.items() if name not in changed}
+    wanted = None if columns is None else set(columns)
+
+    profiles: dict[Hashable, ColumnProfile] = {}
+    for name, col in df.items():
+        if wanted is not None and name not in wanted:
+            continue
+        if (profile := entry.columns.get(name)) is None:
+            profile = reusable.get(name) or _profile_column(col)
+            entry.columns[name] = profile
+        profiles[name] = profile
+
+    return DataFrameProfile(len(df), entry.index_memory, profiles)
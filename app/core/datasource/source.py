@@ -1,5 +1,8 @@
 import abc
 import io
+import itertools
+import uuid
+from collections.abc import AsyncGenerator, Iterator
 from datetime import datetime
 from typing import Any
 
@@ -9,6 +12,18 @@ from pydantic import BaseModel, Field
 
 from app.log import logger
 
+from .profile import profile_dataframe
+
+# 数据版本号: 进程标识 + 全局递增计数，重启后不会与旧版本号冲突
+_VERSION_PREFIX = uuid.uuid4().hex[:12]
+_version_counter = itertools.count()
+
+
+def iter_frame_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """按行切分数据框，每块为原数据的切片"""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start : start + chunk_size]
+
 
 class DataSourceMetadata(BaseModel):
     """数据源元数据"""
@@ -39,6 +54,12 @@ class DataSource(abc.ABC):
         self.metadata = metadata
         self._full_data: pd.DataFrame | None = None
         self._preview_data: pd.DataFrame | None = None
+        self._version = next(_version_counter)
+
+    @property
+    def version(self) -> str:
+        """数据版本号，完整数据被设置、修改或缓存被清除时更新"""
+        return f"{_VERSION_PREFIX}-{self._version}"
 
     @abc.abstractmethod
     def _load(self, n_rows: int | None = None, skip: int | None = None) -> pd.DataFrame:
@@ -203,6 +224,34 @@ class DataSource(abc.ABC):
 
         return await self._load_async(n_rows, skip)
 
+    async def iter_data_async(self, chunk_size: int) -> AsyncGenerator[pd.DataFrame]:
+        """
+        按块异步读取数据源的数据
+
+        已加载完整数据时直接切片，否则每次只从数据源读取一块，峰值内存只与块大小有关。
+
+        Args:
+            chunk_size: 每块的行数
+
+        Yields:
+            pd.DataFrame: 按行顺序的数据块
+        """
+        if self._full_data is not None:
+            for chunk in iter_frame_chunks(self._full_data, chunk_size):
+                yield chunk
+            return
+
+        skip = 0
+        while True:
+            chunk = await self._load_async(chunk_size, skip)
+            if len(chunk):
+                # 分页读取的每块索引都从0开始，改为在整个数据源中的行号
+                chunk.index = pd.RangeIndex(skip, skip + len(chunk))
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            skip += len(chunk)
+
     def get_full(self) -> pd.DataFrame:
         """
         获取数据源的完整数据
@@ -235,6 +284,7 @@ class DataSource(abc.ABC):
         """清除数据缓存"""
         self._full_data = None
         self._preview_data = None
+        self._version = next(_version_counter)
 
     def set_full_data(self, data: pd.DataFrame) -> None:
         """
@@ -244,11 +294,23 @@ class DataSource(abc.ABC):
             data: 完整数据的DataFrame
         """
         self._full_data = data
+        self._version = next(_version_counter)
         self.metadata.row_count = len(data)
         self.metadata.column_count = len(data.columns)
         self.metadata.columns = data.columns.tolist()
         self.metadata.dtypes = {col: str(dtype) for col, dtype in data.dtypes.items()}
 
+    def mark_modified(self) -> None:
+        """
+        标记完整数据已被原地修改
+
+        直接修改 `get_full()` 返回的 DataFrame 后必须调用，以更新数据版本号和元数据。
+        """
+        if self._full_data is not None:
+            self.set_full_data(self._full_data)
+        else:
+            self._version = next(_version_counter)
+
     def format_overview(self) -> str:
         df = self.get_preview(self.metadata.preview_rows)
         w, h = self.get_shape()
@@ -280,9 +342,24 @@ class DataSource(abc.ABC):
             f"- 数据规模: {w} 行 × {h} 列\n"
             f"- 列数据类型:\n<dtypes>\n{display_df.dtypes}\n</dtypes>\n"
             f"<column_info>\n{column_info}</column_info>\n"
+            f"{self._format_column_stats(aliases)}"
             f"- 数据预览:\n<preview>\n{display_df.to_string()}\n</preview>\n"
         )
 
+    def _format_column_stats(self, aliases: dict[str, str]) -> str:
+        # 仅在完整数据已加载时附加列统计，避免为生成概览而读取整个数据源
+        if self._full_data is None:
+            return ""
+
+        profile = profile_dataframe(self._full_data, version=self.version)
+        n_rows = profile.n_rows or 1
+        lines = "".join(
+            f"  - {aliases.get(name, name)}: 空值 {col.null_count} ({col.null_count / n_rows:.1%}), "
+            f"唯一值 {col.unique_count}\n"
+            for name, col in profile.columns.items()
+        )
+        return f"- 列统计(空值/唯一值):\n<column_stats>\n{lines}</column_stats>\n"
+
     @abc.abstractmethod
     def copy[S](self: S) -> S:
         raise NotImplementedError("子类必须实现copy方法")
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import time
+from typing import TYPE_CHECKING, Any, cast
+
+import anyio
+from anyio.abc import TaskStatus
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import _list_all_tools
+from pydantic_core import to_jsonable_python
+
+from app.core.lifespan import Lifespan
+from app.log import logger
+from app.utils import escape_tag
+
+if TYPE_CHECKING:
+    from langchain_mcp_adapters.sessions import Connection
+    from mcp import ClientSession
+    from mcp.types import CallToolResult, InitializeResult
+    from mcp.types import Tool as MCPTool
+
+# 会话已断开时抛出的异常，此时请求尚未送达服务器，可以安全地重连后重试
+_DISCONNECTED_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+
+def connection_key(connection: "Connection") -> str:
+    """
+    计算 MCP 连接配置的键
+
+    Args:
+        connection: MCP 连接配置
+
+    Returns:
+        str: 连接配置的摘要，配置相同的连接摘要相同
+    """
+    data = json.dumps(connection, sort_keys=True, default=to_jsonable_python)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+class PooledMCPSession:
+    """
+    长连接 MCP 会话
+
+    会话在所属生命周期的任务组中由独立任务持有，多个工具调用复用同一会话并发发送请求。
+    会话断开后在下一次使用时自动重连。
+    """
+
+    def __init__(self, lifespan: Lifespan, connection: "Connection", name: str, tools_ttl: float) -> None:
+        self.connection = connection
+        self.name = name
+        self.tools_ttl = tools_ttl
+        self._lifespan = lifespan
+        self._lock = anyio.Lock()
+        self._session: ClientSession | None = None
+        self._closed: anyio.Event | None = None
+        self._init_result: InitializeResult | None = None
+        self._tools: list[MCPTool] | None = None
+        self._tools_expire_at = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self._session is not None
+
+    async def _hold(self, *, task_status: TaskStatus[None] = anyio.TASK_STATUS_IGNORED) -> None:
+        closed = self._closed = anyio.Event()
+        started = False
+        try:
+            async with create_session(self.connection) as session:
+                self._init_result = await session.initialize()
+                self._session = session
+                started = True
+                task_status.started()
+                await closed.wait()
+        except Exception:
+            # 连接建立前的异常交由 connect 的调用方处理
+            if not started:
+                raise
+            logger.opt(colors=True, exception=True).warning(
+                f"MCP 服务器 <c>{escape_tag(self.name)}</> 连接已断开，将在下次使用时重连"
+            )
+        finally:
+            if self._closed is closed:
+                self._session = None
+                self._closed = None
+
+    async def connect(self) -> "ClientSession":
+        """获取存活的会话，未连接时建立新连接"""
+        async with self._lock:
+            if self._session is None:
+                await self._lifespan.task_group.start(self._hold)
+                logger.opt(colors=True).debug(f"已连接 MCP 服务器 <c>{escape_tag(self.name)}</>")
+            assert self._session is not None
+            return self._session
+
+    async def reset(self) -> None:
+        """断开当前会话，下一次使用时重新连接"""
+        if self._closed is not None:
+            self._closed.set()
+        self._session = None
+        self._closed = None
+
+    async def initialize_result(self) -> "InitializeResult":
+        """获取服务器初始化信息"""
+        await self.connect()
+        assert self._init_result is not None
+        return self._init_result
+
+    async def list_tools(self) -> "list[MCPTool]":
+        """
+        获取服务器提供的工具列表
+
+        工具列表在 tools_ttl 秒内复用缓存，过期后通过已有会话重新获取。
+
+        Returns:
+            list[MCPTool]: 工具列表，缓存未过期时返回同一个列表对象
+        """
+        if self._tools is not None and time.monotonic() < self._tools_expire_at:
+            return self._tools
+
+        session = await self.connect()
+        try:
+            tools = await _list_all_tools(session)
+        except _DISCONNECTED_ERRORS:
+            await self.reset()
+            tools = await _list_all_tools(await self.connect())
+
+        self._tools = tools
+        self._tools_expire_at = time.monotonic() + self.tools_ttl
+        return tools
+
+    async def call_tool(
+        self,
+        name: str,
+        arguments: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> "CallToolResult":
+        """
+        通过已有会话调用工具
+
+        与 `ClientSession.call_tool` 签名兼容，可以直接作为 langchain-mcp-adapters 的会话使用。
+        仅在请求发送前发现会话已断开时重连重试，避免重复执行非幂等的工具。
+        """
+        session = await self.connect()
+        try:
+            return await session.call_tool(name, arguments, **kwargs)
+        except _DISCONNECTED_ERRORS:
+            logger.opt(colors=True).info(f"MCP 服务器 <c>{escape_tag(self.name)}</> 会话已断开，重新连接")
+            await self.reset()
+            session = await self.connect()
+            return await session.call_tool(name, arguments, **kwargs)
+
+    def as_client_session(self) -> "ClientSession":
+        """以 ClientSession 的形式提供给 langchain-mcp-adapters"""
+        return cast("ClientSession", self)
+
+
+class MCPSessionPool:
+    """
+    MCP 会话池
+
+    以连接配置为键复用长连接会话，会话随所属生命周期关闭。
+    """
+
+    def __init__(self, lifespan: Lifespan, tools_ttl: float = 300) -> None:
+        self.tools_ttl = tools_ttl
+        self._lifespan = lifespan
+        self._sessions: dict[str, PooledMCPSession] = {}
+        lifespan.on_shutdown(self.close)
+
+    def get(self, connection: "Connection", name: str = "") -> PooledMCPSession:
+        """
+        获取连接配置对应的会话，不存在时创建(延迟到首次使用时连接)
+
+        Args:
+            connection: MCP 连接配置
+            name: 用于日志的服务器名称
+
+        Returns:
+            PooledMCPSession: 长连接会话
+        """
+        key = connection_key(connection)
+        if (session := self._sessions.get(key)) is None:
+            session = PooledMCPSession(self._lifespan, connection, name or key, self.tools_ttl)
+            self._sessions[key] = session
+        return session
+
+    async def discard(self, session: PooledMCPSession) -> None:
+        """关闭并移除指定会话"""
+        self._sessions.pop(connection_key(session.connection), None)
+        await session.reset()
+
+    async def close(self) -> None:
+        """关闭所有会话"""
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.reset()
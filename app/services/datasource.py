@@ -229,6 +229,10 @@ class DataSourceService:
 class TempFileService:
     def __init__(self) -> None:
         self._data: dict[str, tuple[anyio.Path, dict[str, Any]]] = {}
+        # 通过 link 注册的文件ID，删除时保留原文件
+        self._linked: set[str] = set()
+        # 等待引用全部删除后再删除的文件
+        self._pending_release: set[anyio.Path] = set()
 
         lifespan.on_shutdown(self.delete_all)
 
@@ -252,6 +256,27 @@ class TempFileService:
 
         return file_id
 
+    async def link(self, file_path: Path, ttl: float | None = None) -> str:
+        """
+        注册已有文件的引用，不移动文件，删除时保留原文件
+
+        用于多次分发同一个缓存文件。
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 临时文件ID
+        """
+        file_id = str(uuid.uuid4())
+        self._data[file_id] = anyio.Path(file_path), {}
+        self._linked.add(file_id)
+
+        if ttl is not None and ttl > 0:
+            lifespan.start_soon(self._delete_after, file_id, ttl)
+
+        return file_id
+
     async def allocate(self, suffix: str = "", ttl: float | None = None) -> tuple[str, Path]:
         """
         分配临时文件路径
@@ -272,6 +297,24 @@ class TempFileService:
 
         return file_id, Path(temp_path)
 
+    def _is_linked(self, file_path: anyio.Path) -> bool:
+        return any(self._data[file_id][0] == file_path for file_id in self._linked)
+
+    async def release(self, file_path: Path) -> None:
+        """
+        删除可能通过 link 分发的文件
+
+        没有引用时立即删除，否则在最后一个引用被删除或过期后再删除。
+
+        Args:
+            file_path: 文件路径
+        """
+        path = anyio.Path(file_path)
+        if self._is_linked(path):
+            self._pending_release.add(path)
+            return
+        await path.unlink(missing_ok=True)
+
     def get(self, file_id: str) -> Path | None:
         """
         获取临时文件路径
@@ -294,6 +337,14 @@ class TempFileService:
         Args:
             file_id: 临时文件ID
         """
+        if file_id in self._linked:
+            self._linked.discard(file_id)
+            file_path, _ = self._data.pop(file_id)
+            if file_path in self._pending_release and not self._is_linked(file_path):
+                self._pending_release.discard(file_path)
+                await file_path.unlink(missing_ok=True)
+            return
+
         if (file_entry := self._data.pop(file_id, None)) and await (file_path := file_entry[0]).exists():
             try:
                 await file_path.unlink()
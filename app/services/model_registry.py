@@ -1,9 +1,14 @@
 """
 模型注册表 - 统一管理所有训练好的模型
+
+模型记录保存在数据库中，内存中维护按ID、会话、数据集和模型类型的索引供同步调用方查询。
 """
 
-import shutil
+import hashlib
+import threading
 import uuid
+import zipfile
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 from typing import Any
@@ -11,8 +16,11 @@ from typing import Any
 import anyio
 import anyio.to_thread
 from pydantic import TypeAdapter
+from sqlalchemy import JSON, Float, String, Text, delete, select
+from sqlalchemy.orm import Mapped, mapped_column
 
 from app.const import DATA_DIR, MODEL_DIR, TEMP_DIR
+from app.core.database import Base, create_all_tables, session_scope
 from app.core.lifespan import lifespan
 from app.log import logger
 from app.schemas.ml_model import MLModelInfo
@@ -20,6 +28,43 @@ from app.schemas.session import SessionID
 from app.services.datasource import temp_file_service
 
 _models_ta = TypeAdapter(dict[str, MLModelInfo])
+_ARCHIVE_DIR = TEMP_DIR / "model_archives"
+
+
+class MLModelRecord(Base):
+    """模型注册表数据表"""
+
+    __tablename__ = "ml_models"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    name: Mapped[str] = mapped_column(String(255))
+    type: Mapped[str] = mapped_column(String(64), index=True)
+    description: Mapped[str] = mapped_column(Text, default="")
+    created_at: Mapped[str] = mapped_column(String(32), index=True)
+    last_used: Mapped[str] = mapped_column(String(32), default="")
+    session_id: Mapped[str] = mapped_column(String(64), index=True, default="")
+    session_name: Mapped[str] = mapped_column(String(255), default="")
+    dataset_id: Mapped[str] = mapped_column(String(255), index=True, default="")
+    dataset_name: Mapped[str] = mapped_column(String(255), default="")
+    dataset_description: Mapped[str] = mapped_column(Text, default="")
+    accuracy: Mapped[float] = mapped_column(Float, default=0.0)
+    metrics: Mapped[dict[str, Any]] = mapped_column(JSON, default=dict)
+    features: Mapped[list[str]] = mapped_column(JSON, default=list)
+    target_column: Mapped[str] = mapped_column(String(255), default="")
+    status: Mapped[str] = mapped_column(String(16), default="trained")
+    version: Mapped[str] = mapped_column(String(32), default="v1.0.0")
+    model_path: Mapped[str] = mapped_column(Text)
+    metadata_path: Mapped[str] = mapped_column(Text)
+
+    @classmethod
+    def from_info(cls, info: MLModelInfo) -> "MLModelRecord":
+        data = info.model_dump(mode="json", exclude={"feature_count"})
+        return cls(**data)
+
+    def to_info(self) -> MLModelInfo:
+        return MLModelInfo.model_validate(
+            {column.key: getattr(self, column.key) for column in self.__mapper__.column_attrs}
+        )
 
 
 class ModelRegistry:
@@ -29,36 +74,71 @@ class ModelRegistry:
         self.models_dir = anyio.Path(MODEL_DIR)
         self.registry_file = anyio.Path(DATA_DIR / "model_registry.json")
         self._models: dict[str, MLModelInfo] = {}
+        self._by_session: defaultdict[str, set[str]] = defaultdict(set)
+        # (文件路径, 大小, 修改时间) -> 内容哈希
+        self._digests: dict[tuple[tuple[str, int, int], ...], str] = {}
+        self._digest_lock = threading.Lock()
 
         lifespan.on_startup(self._load_registry)
-        lifespan.on_shutdown(self._save_registry)
 
-    async def _load_registry(self) -> None:
-        """加载模型注册表"""
-        if await self.registry_file.exists():
-            try:
-                data = _models_ta.validate_json(await self.registry_file.read_bytes())
-                self._models.update(data)
-                logger.info(f"已加载模型注册表: {len(self._models)} 个模型")
-            except Exception as e:
-                logger.warning(f"加载模型注册表失败: {e}")
-                self._models = {}
-
-    async def _save_registry(self) -> None:
-        """保存模型注册表"""
+    def _index(self, model: MLModelInfo) -> None:
+        self._models[model.id] = model
+        self._by_session[model.session_id].add(model.id)
+
+    def _unindex(self, model_id: str) -> MLModelInfo | None:
+        if (model := self._models.pop(model_id, None)) is not None:
+            self._by_session[model.session_id].discard(model_id)
+        return model
+
+    async def _import_json_registry(self) -> None:
+        """将旧版 JSON 注册表导入数据库，导入后重命名原文件"""
+        if not await self.registry_file.exists():
+            return
+
         try:
-            await self.registry_file.write_bytes(_models_ta.dump_json(self._models))
-            logger.debug("模型注册表已保存")
+            models = _models_ta.validate_json(await self.registry_file.read_bytes())
         except Exception as e:
-            logger.error(f"保存模型注册表失败: {e}")
+            logger.warning(f"读取旧版模型注册表失败，跳过导入: {e}")
+            return
+
+        async with session_scope() as session:
+            existing = set((await session.scalars(select(MLModelRecord.id))).all())
+            session.add_all(MLModelRecord.from_info(m) for m in models.values() if m.id not in existing)
+
+        await self.registry_file.rename(self.registry_file.with_suffix(".json.imported"))
+        logger.info(f"已从 {self.registry_file.name} 导入 {len(models.keys() - existing)} 个模型")
+
+    async def _load_registry(self) -> None:
+        """加载模型注册表"""
+        await create_all_tables()
+        await self._import_json_registry()
+
+        async with session_scope() as session:
+            models = [record.to_info() for record in await session.scalars(select(MLModelRecord))]
+        for model in models:
+            self._index(model)
+        logger.info(f"已加载模型注册表: {len(self._models)} 个模型")
 
-    def _save_registry_sync(self) -> None:
-        """保存模型注册表"""
+    async def _insert(self, model: MLModelInfo) -> None:
         try:
-            Path(self.registry_file).write_bytes(_models_ta.dump_json(self._models))
-            logger.debug("模型注册表已保存")
-        except Exception as e:
-            logger.error(f"保存模型注册表失败: {e}")
+            async with session_scope() as session:
+                session.add(MLModelRecord.from_info(model))
+        except Exception:
+            # 写入失败时撤销内存索引，保持 get_model 与数据库查询结果一致
+            self._unindex(model.id)
+            logger.warning(f"模型 {model.id} 写入注册表失败，已从索引中移除")
+            raise
+        logger.debug(f"模型 {model.id} 已写入注册表")
+
+    def _persist(self, model: MLModelInfo) -> None:
+        try:
+            anyio.get_current_task()
+        except RuntimeError:
+            # 工作线程中等待写入完成，不阻塞事件循环
+            lifespan.from_thread(self._insert, model)
+        else:
+            # 事件循环中调用时在后台写入
+            lifespan.start_soon(self._insert, model, name=f"register_model:{model.id}")
 
     def register_model(
         self,
@@ -99,8 +179,8 @@ class ModelRegistry:
             accuracy=metrics.get("accuracy", 0.0) if metrics else 0.0,
         )
 
-        self._models[model_id] = model_info
-        self._save_registry_sync()
+        self._index(model_info)
+        self._persist(model_info)
 
         logger.info(f"已注册新模型: {name} ({model_id})")
         return model_id
@@ -111,11 +191,45 @@ class ModelRegistry:
 
     def list_models(self, session_id: SessionID | None = None) -> list[MLModelInfo]:
         """列出所有模型"""
-        models = list(self._models.values())
         if session_id:
-            models = [m for m in models if m.session_id == session_id]
+            models = [self._models[model_id] for model_id in self._by_session.get(session_id, ())]
+        else:
+            models = list(self._models.values())
         return sorted(models, key=lambda x: x.created_at, reverse=True)
 
+    async def find_models(
+        self,
+        *,
+        session_id: SessionID | None = None,
+        dataset_id: str | None = None,
+        model_type: str | None = None,
+        limit: int | None = None,
+    ) -> list[MLModelInfo]:
+        """
+        按条件查询模型
+
+        Args:
+            session_id: 会话ID
+            dataset_id: 训练数据集ID
+            model_type: 模型类型
+            limit: 最大返回数量
+
+        Returns:
+            list[MLModelInfo]: 按创建时间倒序排列的模型
+        """
+        stmt = select(MLModelRecord).order_by(MLModelRecord.created_at.desc())
+        if session_id:
+            stmt = stmt.where(MLModelRecord.session_id == session_id)
+        if dataset_id:
+            stmt = stmt.where(MLModelRecord.dataset_id == dataset_id)
+        if model_type:
+            stmt = stmt.where(MLModelRecord.type == model_type)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        async with session_scope() as session:
+            return [record.to_info() for record in await session.scalars(stmt)]
+
     async def delete_model(self, model_id: str) -> bool:
         """删除模型"""
         if model_id not in self._models:
@@ -127,6 +241,8 @@ class ModelRegistry:
         try:
             model.model_path.unlink(missing_ok=True)
             model.metadata_path.unlink(missing_ok=True)
+            for archive in _ARCHIVE_DIR.glob(f"{model_id}_*.zip"):
+                await temp_file_service.release(archive)
 
             # 删除模型目录（如果为空）
             model_dir = self.models_dir / model_id
@@ -136,8 +252,9 @@ class ModelRegistry:
             logger.warning(f"删除模型文件失败: {e}")
 
         # 从注册表中删除
-        del self._models[model_id]
-        await self._save_registry()
+        async with session_scope() as session:
+            await session.execute(delete(MLModelRecord).where(MLModelRecord.id == model_id))
+        self._unindex(model_id)
 
         logger.info(f"已删除模型: {model_id}")
         return True
@@ -148,36 +265,76 @@ class ModelRegistry:
 
     def get_session_models(self, session_id: SessionID) -> list[MLModelInfo]:
         """获取会话的所有模型"""
-        return [m for m in self._models.values() if m.session_id == session_id]
-
-    def _pack_model_archive(self, model_id: str) -> Path:
-        """打包模型为二进制数据"""
+        return [self._models[model_id] for model_id in self._by_session.get(session_id, ())]
+
+    def _content_digest(self, paths: list[Path]) -> str:
+        """计算模型文件的内容哈希，文件未变化时复用上次的结果"""
+        stats = tuple((str(path), path.stat().st_size, path.stat().st_mtime_ns) for path in paths)
+        with self._digest_lock:
+            if (digest := self._digests.get(stats)) is not None:
+                return digest
+
+        h = hashlib.blake2b(digest_size=16)
+        for path in paths:
+            with path.open("rb") as f:
+                while block := f.read(1 << 20):
+                    h.update(block)
+        digest = h.hexdigest()
+
+        with self._digest_lock:
+            self._digests[stats] = digest
+        return digest
+
+    def _pack_model_archive(self, model_id: str) -> tuple[Path, str]:
+        """
+        打包模型文件
+
+        归档以模型文件的内容哈希命名并缓存，模型文件未变化时直接复用已有归档。
+
+        Returns:
+            tuple[Path, str]: (归档路径, 内容哈希)
+        """
         model = self.get_model(model_id)
         if not model:
             raise ValueError(f"Model {model_id} not found")
 
-        temp_id = uuid.uuid4()
-        temp_dir = TEMP_DIR / f"pack_model_{temp_id}"
-        archive = TEMP_DIR / f"packed_{temp_id}.zip"
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        try:
-            # 复制模型文件到临时目录
-            shutil.copyfile(model.model_path, temp_dir / model.model_path.name)
-            shutil.copyfile(model.metadata_path, temp_dir / model.metadata_path.name)
-
-            # 打包为 zip 文件
-            archive = Path(shutil.make_archive(str(archive.with_suffix("")), "zip", temp_dir))
-
-            logger.info(f"模型 {model_id} 已打包为 {archive}")
-            return archive
+        files = [model.model_path, model.metadata_path]
+        digest = self._content_digest(files)
+        archive = _ARCHIVE_DIR / f"{model_id}_{digest}.zip"
+        if archive.exists():
+            logger.debug(f"复用模型 {model_id} 的已有归档 {archive.name}")
+            return archive, digest
 
+        _ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = archive.with_name(f".{archive.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+                for path in files:
+                    zf.write(path, path.name)
+            tmp.replace(archive)
         finally:
-            # 清理临时目录
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            tmp.unlink(missing_ok=True)
+
+        logger.info(f"模型 {model_id} 已打包为 {archive}")
+        return archive, digest
 
     async def pack_model(self, model_id: str) -> str:
-        archive = await anyio.to_thread.run_sync(self._pack_model_archive, model_id)
-        return await temp_file_service.register(archive, ttl=3600)
+        """
+        获取模型归档的临时文件ID
+
+        Returns:
+            str: 临时文件ID，其元数据中的 `etag` 为归档的内容哈希
+        """
+        archive, digest = await anyio.to_thread.run_sync(self._pack_model_archive, model_id)
+        # 清理该模型过期的归档，仍被下载链接引用的归档在链接过期后删除
+        for stale in _ARCHIVE_DIR.glob(f"{model_id}_*.zip"):
+            if stale != archive:
+                await temp_file_service.release(stale)
+        file_id = await temp_file_service.link(archive, ttl=3600)
+        entry = temp_file_service.get_entry(file_id)
+        assert entry is not None
+        entry[1]["etag"] = f'"{digest}"'
+        return file_id
 
 
 # 全局模型注册表实例
@@ -9,7 +9,7 @@ import uuid
 from collections.abc import AsyncGenerator, Callable
 from contextvars import Context
 from datetime import datetime
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING
 
 import anyio
 import anyio.to_thread
@@ -24,12 +24,15 @@ from app.core.agent.events import LlmTokenEvent, StreamEvent, ToolCallEvent, Too
 from app.core.agent.prompts.data_analyzer import PROMPTS as DAA_PROMPTS
 from app.core.agent.resume import get_resumable_tools, is_resumable_tool, resume_tool_call
 from app.core.agent.sources import Sources
+from app.core.agent.workflow_dag import WorkflowStep, build_workflow_dag
 from app.core.chain import get_llm_async
+from app.core.config import settings
 from app.log import logger
 from app.schemas.session import Session
 from app.schemas.workflow import WorkflowDefinition, WorkflowToolCall
 from app.services.agent import daa_service
 from app.services.datasource import datasource_service
+from app.services.workflow_store import WorkflowStore
 
 if TYPE_CHECKING:
     from app.core.datasource import DataSource
@@ -176,89 +179,148 @@ async def _fetch_context_for_workflow(
         await agent.save_state()
 
 
-async def execute_workflow_stream(
-    session: Session,
-    workflow: WorkflowDefinition,
-    datasource_mappings: dict[str, str],
-) -> AsyncGenerator[StreamEvent]:
-    """流式执行工作流，生成事件供前端显示"""
-
-    # 检查工作流中的工具调用
-    logger.info(f"工作流 {workflow.id} 中有 {len(workflow.tool_calls)} 个工具调用")
-    if len(workflow.tool_calls) == 0:
-        logger.warning(f"工作流 {workflow.id} 不包含任何工具调用")
-        return
-
-    def append_tool_call() -> None:
-        for m in reversed(messages):
-            if isinstance(m, AIMessage):
-                break
-        else:
-            m = AIMessage(content="", tool_calls=[])
-            messages.append(m)
-        m.tool_calls.append(tc)
-
-    def tool_call_success(result: str, artifact: dict | None = None) -> None:
-        append_tool_call()
-        messages.append(ToolMessage(tool_call_id=tool_call_id, content=result, artifact=artifact, status="success"))
-
-    def tool_call_error(error_msg: str) -> None:
-        append_tool_call()
-        messages.append(ToolMessage(tool_call_id=tool_call_id, content=error_msg, status="error"))
+@dataclasses.dataclass
+class _StepOutcome:
+    tool_call: ToolCall
+    content: str
+    artifact: dict | None = None
+    success: bool = True
 
-    def run_in_context(tool_call: ToolCall) -> Any:
-        return ctx.context.run(resume_tool_call, tool_call)
 
-    async with _fetch_context_for_workflow(session, workflow, datasource_mappings) as ctx:
-        messages = ctx.messages
-        messages.append(HumanMessage(content=f"执行工作流：{workflow.name}"))
+async def _run_workflow_steps(
+    ctx: WorkflowContext,
+    tool_calls: list[WorkflowToolCall],
+    max_parallel: int,
+) -> AsyncGenerator[StreamEvent]:
+    """按依赖图并发执行工具调用，按完成顺序生成事件，执行结果按原始顺序写入消息"""
+    calls: list[ToolCall] = [
+        {
+            "name": tool_call.name or "",
+            "args": tool_call.args.copy() if isinstance(tool_call.args, dict) else tool_call.args,
+            "id": tool_call.id or f"tool_{id(tool_call)}",
+        }
+        for tool_call in tool_calls
+    ]
+    steps = build_workflow_dag([(call["name"], call["args"]) for call in calls])
+    logger.opt(colors=True).info(
+        f"工作流依赖图: <y>{len(steps)}</> 个步骤, "
+        f"<y>{sum(not step.deps for step in steps)}</> 个无依赖步骤, 并发上限 <y>{max_parallel}</>"
+    )
 
-        # 逐个执行工具调用并生成事件
-        for idx, tool_call in enumerate(workflow.tool_calls, 1):
-            tool_call_id = tool_call.id or f"tool_{id(tool_call)}"
-            tool_name = tool_call.name or ""
-            tool_args = tool_call.args.copy() if isinstance(tool_call.args, dict) else tool_call.args
-
-            logger.info(f"处理第 {idx}/{len(workflow.tool_calls)} 个工具调用: {tool_name}")
-            logger.info(f"工具参数(原始): {tool_args}")
-            logger.info(f"当前Sources中的数据源: {list(ctx.sources.sources.keys())}")
-
-            # 发送工具调用事件
-            yield ToolCallEvent(
-                id=tool_call_id,
-                name=tool_name,
-                human_repr=tool_name_human_repr(tool_name),
-                source=ctx.lookup_tool_source(tool_name),
-                args=tool_args,
+    finished = [anyio.Event() for _ in steps]
+    outcomes: list[_StepOutcome | None] = [None] * len(steps)
+    limiter = anyio.CapacityLimiter(max_parallel)
+    # 每个步骤最多产生两个事件，缓冲区足够时执行不会被消费速度阻塞
+    send, recv = anyio.create_memory_object_stream[StreamEvent](len(steps) * 2)
+
+    async def run_step(step: WorkflowStep) -> None:
+        for dep in step.deps:
+            await finished[dep].wait()
+
+        tc = calls[step.index]
+        tool_call_id, tool_name = tc["id"] or "", tc["name"]
+        async with limiter:
+            logger.info(f"处理第 {step.index + 1}/{len(steps)} 个工具调用: {tool_name}")
+            logger.info(f"工具参数(原始): {tc['args']}")
+            await send.send(
+                ToolCallEvent(
+                    id=tool_call_id,
+                    name=tool_name,
+                    human_repr=tool_name_human_repr(tool_name),
+                    source=ctx.lookup_tool_source(tool_name),
+                    args=tc["args"],
+                )
             )
 
+            event: StreamEvent
             try:
-                # 执行工具调用
-                tc: ToolCall = {"name": tool_name, "args": tool_args, "id": tool_call_id}
-                result = await anyio.to_thread.run_sync(run_in_context, tc)
+                # 并发执行的步骤不能同时进入同一个 Context，使用各自的副本
+                result = await anyio.to_thread.run_sync(ctx.context.copy().run, resume_tool_call, tc)
 
                 # 处理工具返回的结果
                 if isinstance(result, tuple) and len(result) == 2:
                     # 处理可能的图像结果
                     text_result, artifact = result
                     result_content = str(text_result.content if isinstance(text_result, ToolMessage) else text_result)
-                    yield ToolResultEvent(id=tool_call_id, result=result_content, artifact=artifact)
-                    tool_call_success(result_content, artifact)
+                    event = ToolResultEvent(id=tool_call_id, result=result_content, artifact=artifact)
+                    outcomes[step.index] = _StepOutcome(tc, result_content, artifact)
                 else:
                     # 标准的文本结果处理
                     result_content = str(result.content if isinstance(result, ToolMessage) else result)
-                    yield ToolResultEvent(id=tool_call_id, result=result_content)
-                    tool_call_success(result_content)
+                    event = ToolResultEvent(id=tool_call_id, result=result_content)
+                    outcomes[step.index] = _StepOutcome(tc, result_content)
 
                 logger.info(f"工具调用执行成功: {tool_name}")
 
             except Exception as e:
-                # 发送错误事件
                 error_msg = str(e)
-                yield ToolErrorEvent(id=tool_call_id, error=error_msg)
-                tool_call_error(error_msg)
+                event = ToolErrorEvent(id=tool_call_id, error=error_msg)
+                outcomes[step.index] = _StepOutcome(tc, error_msg, success=False)
                 logger.exception(f"工具调用 {tool_name} 执行失败: {e}")
 
+            await send.send(event)
+        finished[step.index].set()
+
+    async def run_all() -> None:
+        async with send, anyio.create_task_group() as tg:
+            for step in steps:
+                tg.start_soon(run_step, step)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(run_all)
+        async with recv:
+            async for event in recv:
+                yield event
+
+    # 按工作流中的原始顺序记录工具调用，保证会话历史与执行调度无关
+    ai_message = AIMessage(content="", tool_calls=[])
+    ctx.messages.append(ai_message)
+    for outcome in outcomes:
+        assert outcome is not None
+        ai_message.tool_calls.append(outcome.tool_call)
+        ctx.messages.append(
+            ToolMessage(
+                tool_call_id=outcome.tool_call["id"],
+                content=outcome.content,
+                artifact=outcome.artifact,
+                status="success" if outcome.success else "error",
+            )
+        )
+
+
+async def execute_workflow_stream(
+    session: Session,
+    workflow: WorkflowDefinition,
+    datasource_mappings: dict[str, str],
+    max_parallel: int | None = None,
+) -> AsyncGenerator[StreamEvent]:
+    """
+    流式执行工作流，生成事件供前端显示
+
+    没有数据依赖的工具调用并发执行，事件按完成顺序生成。
+
+    Args:
+        session: 会话
+        workflow: 工作流定义
+        datasource_mappings: 工作流初始数据源ID -> 当前会话数据源ID
+        max_parallel: 同时执行的工具调用数量上限，默认为 `settings.WORKFLOW_MAX_PARALLEL`
+    """
+
+    # 检查工作流中的工具调用
+    logger.info(f"工作流 {workflow.id} 中有 {len(workflow.tool_calls)} 个工具调用")
+    if len(workflow.tool_calls) == 0:
+        logger.warning(f"工作流 {workflow.id} 不包含任何工具调用")
+        return
+
+    async with _fetch_context_for_workflow(session, workflow, datasource_mappings) as ctx:
+        messages = ctx.messages
+        messages.append(HumanMessage(content=f"执行工作流：{workflow.name}"))
+
+        async for event in _run_workflow_steps(
+            ctx, workflow.tool_calls, max_parallel or settings.WORKFLOW_MAX_PARALLEL
+        ):
+            yield event
+
         # 总结工作流执行结果
         conversation, _ = format_conversation(messages, include_figures=False)
         chat_llm = await get_llm_async(session.agent_model_config.fixed.chat)
@@ -280,39 +342,28 @@ class WorkflowService:
 
     def __init__(self) -> None:
         """初始化工作流服务"""
-        self._workflows_dir = anyio.Path(WORKFLOWS_DIR)
+        self._store = WorkflowStore(WORKFLOWS_DIR)
 
     async def list_workflows(self) -> list[WorkflowDefinition]:
         """获取所有工作流"""
-        workflows: list[WorkflowDefinition] = []
-
         try:
-            # 列出所有工作流JSON文件
-            async for file_path in self._workflows_dir.glob("*.json"):
-                try:
-                    if workflow := await self._load_workflow_file(file_path):
-                        workflows.append(workflow)
-                except Exception as e:
-                    logger.error(f"加载工作流文件 {file_path} 失败: {e}")
+            return await self._store.load_all()
         except Exception as e:
             logger.error(f"列出工作流失败: {e}")
-
-        return workflows
+            return []
 
     async def get_workflow(self, workflow_id: str) -> WorkflowDefinition | None:
         """获取指定ID的工作流"""
-        file_path = self._workflows_dir / f"{workflow_id}.json"
-
-        if not await file_path.exists():
-            logger.warning(f"工作流文件不存在: {file_path}")
-            return None
-
         try:
-            return await self._load_workflow_file(file_path)
+            workflow = await self._store.get(workflow_id)
         except Exception as e:
             logger.error(f"加载工作流 {workflow_id} 失败: {e}")
             return None
 
+        if workflow is None:
+            logger.warning(f"工作流不存在: {workflow_id}")
+        return workflow
+
     async def save_workflow(self, workflow: WorkflowDefinition) -> bool:
         """保存工作流"""
         try:
@@ -326,24 +377,7 @@ class WorkflowService:
                 workflow.created_at = now
             workflow.updated_at = now
 
-            # 准备文件路径
-            file_path = self._workflows_dir / f"{workflow.id}.json"
-
-            # 创建备份（如果文件已存在）
-            if await file_path.exists():
-                # 创建备份
-                backup_path = file_path.with_suffix(".json.bak")
-                if await backup_path.exists():
-                    # 如果已经有一个备份，创建第二个备份
-                    second_backup = file_path.with_suffix(".json.bak2")
-                    await second_backup.unlink(missing_ok=True)
-                    await backup_path.rename(second_backup)
-
-                # 创建新的备份
-                await file_path.rename(backup_path)
-
-            # 保存工作流
-            await self._save_workflow_file(file_path, workflow)
+            await self._store.save(workflow)
             logger.info(f"工作流 {workflow.id} 已保存")
             return True
         except Exception as e:
@@ -352,56 +386,16 @@ class WorkflowService:
 
     async def delete_workflow(self, workflow_id: str) -> bool:
         """删除工作流"""
-        file_path = self._workflows_dir / f"{workflow_id}.json"
-
-        if not await file_path.exists():
-            logger.warning(f"工作流 {workflow_id} 不存在，无法删除")
-            return False
-
         try:
-            # 删除文件
-            await file_path.unlink()
+            if not await self._store.delete(workflow_id):
+                logger.warning(f"工作流 {workflow_id} 不存在，无法删除")
+                return False
             logger.info(f"工作流 {workflow_id} 已删除")
             return True
         except Exception as e:
             logger.error(f"删除工作流 {workflow_id} 失败: {e}")
             return False
 
-    async def _load_workflow_file(self, file_path: anyio.Path) -> WorkflowDefinition | None:
-        """加载工作流文件"""
-        try:
-            data = await file_path.read_bytes()
-            return WorkflowDefinition.model_validate_json(data)
-        except Exception as e:
-            logger.error(f"加载工作流文件 {file_path} 失败: {e}")
-            return None
-
-    async def _save_workflow_file(self, file_path: anyio.Path, workflow: WorkflowDefinition) -> None:
-        """保存工作流到文件"""
-        try:
-            data = workflow.model_dump_json(exclude_none=True, indent=2)
-            await file_path.write_text(data, encoding="utf-8")
-
-            # 验证保存是否成功
-            saved_data = await file_path.read_text(encoding="utf-8")
-            saved_workflow = WorkflowDefinition.model_validate_json(saved_data)
-
-            logger.info(
-                f"工作流已保存到 {file_path.name}:\n"
-                f"  - 工具调用数: {len(workflow.tool_calls)}\n"
-                f"  - 文件大小: {len(data)} 字节\n"
-                f"  - 验证: 保存后读取到 {len(saved_workflow.tool_calls)} 个工具调用"
-            )
-
-            if len(saved_workflow.tool_calls) != len(workflow.tool_calls):
-                logger.error(
-                    f"⚠️ 工作流保存验证失败! "
-                    f"原始: {len(workflow.tool_calls)} vs 保存后: {len(saved_workflow.tool_calls)}"
-                )
-        except Exception as e:
-            logger.error(f"保存工作流文件失败: {e}")
-            raise
-
 
 # 创建单例实例
 workflow_service = WorkflowService()
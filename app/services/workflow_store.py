@@ -0,0 +1,249 @@
+"""
+工作流存储
+
+每个工作流保存为一个 JSON 文件，另维护一份索引文件记录摘要、校验和与文件状态。
+启动时根据文件状态校对索引，只重新解析在索引之外被修改的文件；
+工作流内容在首次访问时加载并缓存。
+"""
+
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import anyio
+import anyio.to_thread
+from pydantic import BaseModel, TypeAdapter
+
+from app.log import logger
+from app.schemas.workflow import WorkflowDefinition
+
+INDEX_FILE_NAME = "_index.json"
+
+
+class WorkflowIndexEntry(BaseModel):
+    """工作流索引条目"""
+
+    id: str
+    name: str
+    description: str = ""
+    created_at: datetime
+    updated_at: datetime
+    tool_call_count: int
+    checksum: str
+    size: int
+    mtime_ns: int
+
+
+_index_adapter = TypeAdapter(list[WorkflowIndexEntry])
+
+
+def _checksum(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes) -> os.stat_result:
+    """写入临时文件后原子替换目标文件，返回写入后的文件状态"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path.stat()
+
+
+def _backup(path: Path) -> None:
+    """保留最近两个版本的备份"""
+    if not path.exists():
+        return
+    backup = path.with_suffix(".json.bak")
+    if backup.exists():
+        backup.replace(path.with_suffix(".json.bak2"))
+    try:
+        os.link(path, backup)
+    except OSError:
+        # 文件系统不支持硬链接时复制文件
+        shutil.copy2(path, backup)
+
+
+class WorkflowStore:
+    """
+    带内存索引的工作流存储
+
+    Args:
+        directory: 工作流文件目录
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self._dir = directory
+        self._index_file = directory / INDEX_FILE_NAME
+        self._index: dict[str, WorkflowIndexEntry] | None = None
+        self._bodies: dict[str, WorkflowDefinition] = {}
+        self._lock = anyio.Lock()
+
+    def _path(self, workflow_id: str) -> Path:
+        return self._dir / f"{workflow_id}.json"
+
+    @staticmethod
+    def _make_entry(workflow: WorkflowDefinition, data: bytes, stat: os.stat_result) -> WorkflowIndexEntry:
+        return WorkflowIndexEntry(
+            id=workflow.id,
+            name=workflow.name,
+            description=workflow.description,
+            created_at=workflow.created_at,
+            updated_at=workflow.updated_at,
+            tool_call_count=len(workflow.tool_calls),
+            checksum=_checksum(data),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    def _read_persisted_index(self) -> dict[str, WorkflowIndexEntry]:
+        try:
+            entries = _index_adapter.validate_json(self._index_file.read_bytes())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"工作流索引文件损坏，将重建索引: {e}")
+            return {}
+        return {entry.id: entry for entry in entries}
+
+    def _write_index(self, index: dict[str, WorkflowIndexEntry]) -> None:
+        _atomic_write(self._index_file, _index_adapter.dump_json(list(index.values())))
+
+    def _build_index(self) -> dict[str, WorkflowIndexEntry]:
+        persisted = self._read_persisted_index()
+        index: dict[str, WorkflowIndexEntry] = {}
+        reparsed = 0
+
+        for path in self._dir.glob("*.json"):
+            if path.name == INDEX_FILE_NAME:
+                continue
+            stat = path.stat()
+            entry = persisted.get(path.stem)
+            if entry is None or entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+                # 文件不在索引中或在索引之外被修改，重新解析
+                data = path.read_bytes()
+                try:
+                    workflow = WorkflowDefinition.model_validate_json(data)
+                except Exception as e:
+                    logger.error(f"加载工作流文件 {path} 失败: {e}")
+                    continue
+                entry = self._make_entry(workflow, data, stat)
+                self._bodies[entry.id] = workflow
+                reparsed += 1
+            index[entry.id] = entry
+
+        index = dict(sorted(index.items(), key=lambda item: item[1].created_at))
+        if reparsed or index.keys() != persisted.keys():
+            self._write_index(index)
+        logger.opt(colors=True).info(f"已加载工作流索引: <y>{len(index)}</> 个工作流, 重新解析 <y>{reparsed}</> 个文件")
+        return index
+
+    async def _ensure_index(self) -> dict[str, WorkflowIndexEntry]:
+        if self._index is None:
+            async with self._lock:
+                if self._index is None:
+                    self._index = await anyio.to_thread.run_sync(self._build_index)
+        return self._index
+
+    def _load_body(self, entry: WorkflowIndexEntry) -> WorkflowDefinition:
+        data = self._path(entry.id).read_bytes()
+        if _checksum(data) != entry.checksum:
+            logger.warning(f"工作流文件 {entry.id} 校验和与索引不一致，可能已在外部被修改")
+        return WorkflowDefinition.model_validate_json(data)
+
+    async def _get_body(self, entry: WorkflowIndexEntry) -> WorkflowDefinition | None:
+        if (workflow := self._bodies.get(entry.id)) is None:
+            try:
+                workflow = await anyio.to_thread.run_sync(self._load_body, entry)
+            except Exception as e:
+                logger.error(f"加载工作流 {entry.id} 失败: {e}")
+                return None
+            self._bodies[entry.id] = workflow
+        return workflow
+
+    async def entries(self) -> list[WorkflowIndexEntry]:
+        """获取所有工作流的索引条目，不加载工作流内容"""
+        return list((await self._ensure_index()).values())
+
+    async def load_all(self) -> list[WorkflowDefinition]:
+        """
+        获取所有工作流
+
+        Returns:
+            list[WorkflowDefinition]: 按创建时间排序的工作流，返回的对象为缓存，调用方不应修改
+        """
+        return [workflow for entry in await self.entries() if (workflow := await self._get_body(entry)) is not None]
+
+    async def get(self, workflow_id: str) -> WorkflowDefinition | None:
+        """
+        获取指定ID的工作流
+
+        Returns:
+            WorkflowDefinition | None: 工作流的副本，不存在时返回None
+        """
+        index = await self._ensure_index()
+        if (entry := index.get(workflow_id)) is None:
+            return None
+        workflow = await self._get_body(entry)
+        return workflow.model_copy(deep=True) if workflow is not None else None
+
+    async def save(self, workflow: WorkflowDefinition) -> WorkflowIndexEntry:
+        """
+        保存工作流
+
+        先写入临时文件再原子替换，写入后比较文件大小确认写入完整。
+
+        Returns:
+            WorkflowIndexEntry: 更新后的索引条目
+        """
+        index = await self._ensure_index()
+        data = workflow.model_dump_json(exclude_none=True, indent=2).encode("utf-8")
+        path = self._path(workflow.id)
+
+        def write() -> os.stat_result:
+            _backup(path)
+            return _atomic_write(path, data)
+
+        async with self._lock:
+            stat = await anyio.to_thread.run_sync(write)
+            if stat.st_size != len(data):
+                raise OSError(f"工作流文件写入不完整: {stat.st_size} / {len(data)} 字节")
+
+            entry = self._make_entry(workflow, data, stat)
+            index[workflow.id] = entry
+            self._bodies[workflow.id] = workflow.model_copy(deep=True)
+            await anyio.to_thread.run_sync(self._write_index, index)
+
+        logger.info(
+            f"工作流已保存到 {path.name}:\n"
+            f"  - 工具调用数: {entry.tool_call_count}\n"
+            f"  - 文件大小: {entry.size} 字节\n"
+            f"  - 校验和: {entry.checksum}"
+        )
+        return entry
+
+    async def delete(self, workflow_id: str) -> bool:
+        """
+        删除工作流
+
+        Returns:
+            bool: 工作流存在并已删除时返回True
+        """
+        index = await self._ensure_index()
+        if workflow_id not in index:
+            return False
+
+        async with self._lock:
+            await anyio.to_thread.run_sync(lambda: self._path(workflow_id).unlink(missing_ok=True))
+            index.pop(workflow_id, None)
+            self._bodies.pop(workflow_id, None)
+            await anyio.to_thread.run_sync(self._write_index, index)
+        return True
@@ -0,0 +1,87 @@
+# ruff: noqa: T201
+"""
+CPU 令牌调度基准
+
+模拟多个工作进程中的并发会话同时执行计算密集型工具(随机森林训练)，
+对比旧方式(每个任务 `n_jobs=-1` 占满所有核心)与令牌调度(按获得的令牌数设置并行度)
+的总耗时、任务延迟分位数以及令牌等待时间。
+
+Run:
+    python bench_cpu_scheduler.py
+    python bench_cpu_scheduler.py --sessions 8 --tasks 4 --rows 20000
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.cpu import CpuScheduler
+
+
+def make_data(rows: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, 20))
+    y = X[:, :5].sum(axis=1) + rng.normal(scale=0.1, size=rows)
+    return X, y
+
+
+def session(args: tuple[bool, int, int, int, str, int]) -> tuple[list[float], list[float]]:
+    """一个会话: 依次执行若干训练任务，返回每个任务的延迟和令牌等待时间"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    scheduled, tasks, rows, total, token_dir, want = args
+    scheduler = CpuScheduler(total, Path(token_dir))
+    X, y = make_data(rows)
+    latencies: list[float] = []
+    waits: list[float] = []
+
+    for _ in range(tasks):
+        start = time.perf_counter()
+        if scheduled:
+            with scheduler.acquire(want, name="bench") as n_jobs:
+                waits.append(time.perf_counter() - start)
+                RandomForestRegressor(n_estimators=50, n_jobs=n_jobs, random_state=0).fit(X, y)
+        else:
+            RandomForestRegressor(n_estimators=50, n_jobs=-1, random_state=0).fit(X, y)
+        latencies.append(time.perf_counter() - start)
+    return latencies, waits
+
+
+def run(name: str, scheduled: bool, args: argparse.Namespace, cores: int) -> None:
+    with tempfile.TemporaryDirectory() as token_dir:
+        want = max(cores // args.workers, 1)
+        jobs = [(scheduled, args.tasks, args.rows, cores, token_dir, want)] * args.sessions
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.sessions) as pool:
+            results = pool.map(session, jobs)
+        wall = time.perf_counter() - start
+
+    latencies = np.array([lat for lats, _ in results for lat in lats])
+    waits = np.array([w for _, ws in results for w in ws]) if scheduled else np.zeros(1)
+    print(
+        f"{name:<10} wall={wall:7.2f}s  p50={np.percentile(latencies, 50):6.2f}s  "
+        f"p95={np.percentile(latencies, 95):6.2f}s  wait_mean={waits.mean():6.3f}s  wait_max={waits.max():6.3f}s"
+    )
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=max(cores, 4), help="并发会话数(每个会话一个进程)")
+    parser.add_argument("--workers", type=int, default=max(cores, 2), help="模拟的 Web 工作进程数，决定公平份额")
+    parser.add_argument("--tasks", type=int, default=3, help="每个会话执行的训练任务数")
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"cores={cores} sessions={args.sessions} fair_share={max(cores // args.workers, 1)}")
+    run("legacy", False, args, cores)
+    run("scheduled", True, args, cores)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# ruff: noqa: T201
+"""
+数据类型推断基准
+
+在宽表、以字符串为主的数据上，对比旧的类型推断(复制整表 + 对每个对象列的所有值做正则匹配)
+与新的类型推断(先在样本上判断，仅对可能转换的列做向量化转换 + 浅拷贝替换列)的耗时。
+
+Run:
+    python bench_dtype_inference.py
+    python bench_dtype_inference.py --rows 200000 --cols 300 --repeat 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.core.agent.sources import Sources
+from app.core.agent.tools.dataframe.clean import infer_and_convert_dtypes
+from app.core.datasource import create_df_source
+
+COLUMN_KINDS = ("numeric", "dirty_numeric", "datetime", "label", "text")
+
+
+def make_column(kind: str, rows: int, rng: np.random.Generator) -> np.ndarray:
+    match kind:
+        case "numeric":
+            values = rng.normal(scale=100, size=rows).round(3).astype(str)
+        case "dirty_numeric":
+            # 约2%的脏值，仍应被识别为数值列
+            values = rng.integers(0, 10_000, size=rows).astype(str)
+            values[rng.random(rows) < 0.02] = "N/A"
+        case "datetime":
+            days = rng.integers(0, 3650, size=rows)
+            values = (np.datetime64("2015-01-01") + days).astype(str)
+        case "label":
+            values = rng.choice(np.array(["north", "south", "east", "west", "central"]), size=rows)
+        case _:
+            values = np.char.add("item-", rng.integers(0, 10**9, size=rows).astype(str))
+
+    result = values.astype(object)
+    result[rng.random(rows) < 0.05] = None
+    return result
+
+
+def make_data(rows: int, cols: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(cols):
+        kind = COLUMN_KINDS[i % len(COLUMN_KINDS)]
+        columns[f"{kind}_{i}"] = make_column(kind, rows, rng)
+    return pd.DataFrame(columns, dtype=object)
+
+
+def legacy_infer(df: pd.DataFrame, category_threshold: float = 0.05) -> list[str]:
+    # 旧实现: 复制整表，对每个对象列的全部值转换为字符串并做正则匹配
+    df_copy = df.copy()
+    numeric_pattern = r"^[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?$"
+    converted = []
+    for column in df_copy.columns:
+        if df_copy[column].dtype == "object":
+            if df_copy[column].dropna().astype(str).str.match(numeric_pattern).mean() > 0.9:
+                df_copy[column] = pd.to_numeric(df_copy[column], errors="coerce")
+                converted.append(column)
+        elif df_copy[column].nunique() / len(df_copy) < category_threshold:
+            df_copy[column] = df_copy[column].astype("category")
+            converted.append(column)
+    # 旧实现在统计信息中计算整表的内存占用
+    df.memory_usage(deep=True).sum()
+    df_copy.memory_usage(deep=True).sum()
+    return converted
+
+
+def sampled_infer(df: pd.DataFrame) -> list[str]:
+    sources = Sources({"bench": create_df_source(df, "bench")})
+    return infer_and_convert_dtypes(sources, "bench")["converted_columns"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000, help="数据行数")
+    parser.add_argument("--cols", type=int, default=200, help="数据列数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    timings: dict[str, float] = {}
+    converted: dict[str, list[str]] = {}
+    for name, func in (("legacy", legacy_infer), ("sampled", sampled_infer)):
+        elapsed = 0.0
+        for seed in range(args.repeat):
+            # 每次使用新的数据，避免概况缓存影响结果
+            data = make_data(args.rows, args.cols, seed)
+            start = time.perf_counter()
+            converted[name] = func(data)
+            elapsed += time.perf_counter() - start
+        timings[name] = elapsed / args.repeat
+
+    legacy, sampled = timings["legacy"], timings["sampled"]
+    print(f"table: {args.rows:,} rows x {args.cols} object columns")
+    print(f"legacy  {legacy * 1000:>10.1f} ms  converted={len(converted['legacy'])}")
+    print(
+        f"sampled {sampled * 1000:>10.1f} ms  converted={len(converted['sampled'])}  speedup={legacy / sampled:5.2f}x"
+    )
+    for name, columns in converted.items():
+        by_kind = {kind: sum(col.startswith(f"{kind}_") for col in columns) for kind in COLUMN_KINDS}
+        print(f"{name} conversions by column kind: {by_kind}")
+
+
+if __name__ == "__main__":
+    main()
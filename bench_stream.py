@@ -0,0 +1,125 @@
+# ruff: noqa: T201
+"""
+Agent 流式事件管道基准
+
+对比旧管道(轮询读取工具调用 + 逐 token 序列化)与新管道(通知唤醒 + token 合并帧 + 预编译 TypeAdapter)
+的首字节时间、每个 token 的 CPU 时间和输出帧数。
+
+Run:
+    python bench_stream.py
+    python bench_stream.py --tokens 2000 --interval 0.002
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+
+import anyio
+import anyio.lowlevel
+
+from app.core.agent.events import (
+    BufferedStreamEventReader,
+    LlmTokenEvent,
+    StreamEvent,
+    ToolResultEvent,
+    dump_stream_event,
+)
+from app.utils import buffered_stream, stream_with_heartbeats
+
+HEARTBEAT = json.dumps({"type": "heart_beat"}) + "\n"
+# 工具结果中的示例文件路径，只作为负载内容，不会被写入
+RESULT_PATH = str(Path(tempfile.gettempdir()) / "result.csv")
+
+
+async def fake_llm(n_tokens: int, interval: float, tool_every: int) -> AsyncIterator[StreamEvent]:
+    for i in range(n_tokens):
+        await anyio.sleep(interval)
+        yield LlmTokenEvent(content=f"token{i} ")
+        if tool_every and (i + 1) % tool_every == 0:
+            yield ToolResultEvent(id=f"call_{i}", result={"path": RESULT_PATH, "success": True})
+
+
+async def legacy_tool_call_reader(pending: list[object]) -> None:
+    # 旧实现: 没有工具调用时在检查点之间空转
+    while True:
+        while pending:
+            pending.pop(0)
+            await anyio.lowlevel.checkpoint()
+        await anyio.lowlevel.checkpoint()
+
+
+async def notified_tool_call_reader(pending: list[object], wakeup: Callable[[], anyio.Event]) -> None:
+    # 新实现: 没有工具调用时挂起等待通知
+    while True:
+        while pending:
+            pending.pop(0)
+        event = wakeup()
+        if not pending:
+            await event.wait()
+
+
+async def legacy_pipeline(events: AsyncIterator[StreamEvent]) -> AsyncIterator[str]:
+    async for event in buffered_stream(events, max_buffer_size=10):
+        yield event.model_dump_json().replace("/", "\\/") + "\n"
+
+
+async def coalesced_pipeline(events: AsyncIterator[StreamEvent]) -> AsyncIterator[str]:
+    reader = BufferedStreamEventReader(max_chars=512, max_delay=0.05)
+    async for event in reader.aread(events):
+        yield dump_stream_event(event)
+
+
+async def run(name: str, legacy: bool, n_tokens: int, interval: float, tool_every: int) -> None:
+    pending: list[object] = []
+    holder: list[anyio.Event] = []
+
+    def wakeup() -> anyio.Event:
+        holder[:] = [anyio.Event()]
+        return holder[0]
+
+    pipeline = legacy_pipeline if legacy else coalesced_pipeline
+    frames = 0
+    size = 0
+    ttfb = None
+
+    async with anyio.create_task_group() as tg:
+        if legacy:
+            tg.start_soon(legacy_tool_call_reader, pending)
+        else:
+            tg.start_soon(notified_tool_call_reader, pending, wakeup)
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        stream = pipeline(fake_llm(n_tokens, interval, tool_every))
+        async for chunk in stream_with_heartbeats(stream, HEARTBEAT, interval=5.0):
+            if ttfb is None:
+                ttfb = time.perf_counter() - start_wall
+            frames += 1
+            size += len(chunk)
+        wall = time.perf_counter() - start_wall
+        cpu = time.process_time() - start_cpu
+        tg.cancel_scope.cancel()
+
+    assert ttfb is not None
+    print(
+        f"{name:<10} ttfb={ttfb * 1000:7.2f}ms  wall={wall:6.2f}s  cpu={cpu:6.2f}s  "
+        f"cpu/token={cpu / n_tokens * 1e6:8.1f}us  frames={frames:>6}  bytes={size:>8}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=0.005, help="模拟 LLM 的 token 间隔(秒)")
+    parser.add_argument("--tool-every", type=int, default=200, help="每隔多少个 token 插入一次工具结果")
+    args = parser.parse_args()
+
+    await run("legacy", True, args.tokens, args.interval, args.tool_every)
+    await run("coalesced", False, args.tokens, args.interval, args.tool_every)
+
+
+if __name__ == "__main__":
+    anyio.run(main)
@@ -6,13 +6,27 @@ FastMCP 故障诊断服务器
 
 from __future__ import annotations
 
+import functools
 from typing import TYPE_CHECKING
 
+import anyio.to_thread
 from mcp.server import FastMCP
 
-from .data_source import read_agent_source_data
+from .data_source import (
+    close_agent_source_client,
+    create_agent_source,
+    read_agent_source_data_versioned,
+)
 from .log import LOGGING_CONFIG
-from .tools import analyze_fault_patterns, calculate_health_score, fault_vs_normal_analysis
+from .tools import (
+    BaselineProfile,
+    ProfileCache,
+    analyze_fault_patterns,
+    calculate_health_score,
+    calculate_health_scores,
+    data_version,
+    fault_vs_normal_analysis,
+)
 
 if TYPE_CHECKING:
     import pandas as pd
@@ -22,7 +36,7 @@ instructions = """\
 
 主要功能:
 1. 故障特征对比分析 - 识别正常vs故障样本的显著差异特征
-2. 健康度评分 - 评估设备当前的健康状态和故障风险
+2. 健康度评分 - 评估设备当前的健康状态和故障风险，支持全表批量评分
 4. 故障模式分析 - 将故障聚类，识别不同类型的故障模式
 
 适用场景:
@@ -35,22 +49,36 @@ instructions = """\
 1. 先用 fault_vs_normal_analysis 了解哪些特征与故障相关
 2. 用 analyze_fault_patterns 识别故障类型
 4. 用 calculate_health_score 评估当前设备健康状况
+5. 用 health_score_batch 对整段时间的数据逐行评分，定位健康度最低的时段
 """
 
 app = FastMCP(
     name="fault-diagnosis",
     instructions=instructions,
 )
+profile_cache = ProfileCache()
 
 
-async def read_source(source_id: str) -> pd.DataFrame:
+def agent_token() -> str:
     # See app/core/agent/agents/data_analyzer/context.py
     ctx = app.get_context()
     params = ctx.request_context.session.client_params
     client_name = params and params.clientInfo.name
     assert client_name is not None, "Agent Token is required"
+    return client_name
+
+
+async def read_profile(source_id: str, target_col: str) -> tuple[pd.DataFrame, BaselineProfile]:
+    """读取数据源并获取共享的基线画像，数据版本变化时重新计算"""
+    token = agent_token()
+    df, version = await read_agent_source_data_versioned(token, source_id)
 
-    return await read_agent_source_data(client_name, source_id)
+    def get_profile() -> BaselineProfile:
+        # 优先使用服务端返回的数据版本，避免重复计算内容哈希
+        key = (token, source_id, target_col)
+        return profile_cache.get_or_build(key, version or data_version(df), df, target_col)
+
+    return df, await anyio.to_thread.run_sync(get_profile)
 
 
 @app.tool(title="故障与正常样本对比分析")
@@ -79,8 +107,8 @@ async def fault_vs_normal(source_id: str, target_col: str) -> dict:
         # 输出: "CS偏高45%、RP偏低32%、VOC偏高153% 是故障的主要特征"
         ```
     """
-    df = await read_source(source_id)
-    return fault_vs_normal_analysis(df, target_col)
+    df, profile = await read_profile(source_id, target_col)
+    return fault_vs_normal_analysis(df, target_col, profile)
 
 
 @app.tool(title="计算设备健康度评分")
@@ -112,12 +140,71 @@ async def health_score(source_id: str, target_col: str, sample_index: int | None
         print(f"建议: {result['recommendation']}")
         ```
     """
-    df = await read_source(source_id)
-    return calculate_health_score(df, target_col, sample_index)
+    df, profile = await read_profile(source_id, target_col)
+    return calculate_health_score(df, target_col, sample_index, profile)
+
+
+@app.tool(title="全表健康度批量评分")
+async def health_score_batch(
+    source_id: str,
+    target_col: str,
+    chunk_size: int = 100_000,
+    save_scores: bool = True,
+) -> dict:
+    """
+    全表健康度批量评分
+
+    基于正常样本拟合一次均值与协方差，对数据源中的每一行计算健康度评分，
+    无需逐行调用 health_score。评分结果可保存为新的数据源供后续分析使用。
+
+    Args:
+        source_id: 数据源ID
+        target_col: 故障标签列名
+        chunk_size: 每批评分的行数，默认100000
+        save_scores: 是否将逐行评分结果保存为新的数据源，默认True
+
+    Returns:
+        dict: 包含以下内容:
+            - total_samples: 评分样本数
+            - mean_score / std_score / min_score / max_score: 健康度统计
+            - quantiles: 健康度分位数
+            - risk_distribution: 各风险等级的样本数
+            - abnormal_samples: 存在异常传感器的样本数
+            - worst_samples: 健康度最低的样本
+            - fault_samples_mean_score / normal_samples_mean_score: 实际故障与正常样本的平均健康度
+            - scores_source_id: 逐行评分结果的数据源ID(启用save_scores时)，
+              包含 health_score, mahalanobis_distance, risk_level, abnormal_sensor_count, actual_failure 列
+
+    Example:
+        ```python
+        result = await health_score_batch("machine_data", "fail")
+        print(result["risk_distribution"])
+        print(result["worst_samples"][:3])
+        ```
+    """
+    df, profile = await read_profile(source_id, target_col)
+    if profile.health_baseline is None:
+        return {"error": "正常样本数量不足，无法计算健康度"}
+    fn = functools.partial(
+        calculate_health_scores,
+        df,
+        target_col,
+        baseline=profile.health_baseline,
+        chunk_size=chunk_size,
+    )
+    scores, summary = await anyio.to_thread.run_sync(fn)
+
+    if save_scores:
+        summary["scores_source_id"] = await create_agent_source(
+            agent_token(),
+            scores,
+            description=f"数据源 {source_id} 的逐行健康度评分结果",
+        )
+    return summary
 
 
 @app.tool(title="故障模式聚类分析")
-async def fault_patterns(source_id: str, target_col: str, n_clusters: int = 3) -> dict:
+async def fault_patterns(source_id: str, target_col: str, n_clusters: int | None = 3) -> dict:
     """
     故障模式聚类分析
 
@@ -127,7 +214,7 @@ async def fault_patterns(source_id: str, target_col: str, n_clusters: int = 3) -
     Args:
         source_id: 数据源ID
         target_col: 故障标签列名
-        n_clusters: 聚类数量，默认3
+        n_clusters: 聚类数量，默认3；传入null时基于抽样轮廓系数在2~8之间自动选择
 
     Returns:
         dict: 包含以下内容:
@@ -138,6 +225,7 @@ async def fault_patterns(source_id: str, target_col: str, n_clusters: int = 3) -
                 - characteristics: 特征描述
                 - severity: 严重程度
             - insights: 洞察总结
+            - silhouette_scores: 自动选择聚类数时各候选聚类数的轮廓系数
 
     Example:
         ```python
@@ -148,8 +236,9 @@ async def fault_patterns(source_id: str, target_col: str, n_clusters: int = 3) -
             print(f"  严重程度: {pattern['severity']}")
         ```
     """
-    df = await read_source(source_id)
-    return analyze_fault_patterns(df, target_col, n_clusters=n_clusters)
+    df, profile = await read_profile(source_id, target_col)
+    fn = functools.partial(analyze_fault_patterns, df, target_col, n_clusters=n_clusters, profile=profile)
+    return await anyio.to_thread.run_sync(fn)
 
 
 def run_server_sse() -> None:
@@ -169,7 +258,14 @@ def run_server_sse() -> None:
         log_config=LOGGING_CONFIG,
     )
     server = uvicorn.Server(config)
-    anyio.run(server.serve)
+
+    async def serve() -> None:
+        try:
+            await server.serve()
+        finally:
+            await close_agent_source_client()
+
+    anyio.run(serve)
 
 
 if __name__ == "__main__":
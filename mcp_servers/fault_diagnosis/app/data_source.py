@@ -1,13 +1,19 @@
 import io
 import os
+import threading
 import types
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Any, Self
 
+import anyio.to_thread
 import httpx
 import pandas as pd
 
+from .log import logger
+
 API_BASE_URL = os.getenv("AGENT_API_BASE_URL", "http://localhost:8000/api")
+SOURCE_CACHE_SIZE = int(os.getenv("AGENT_SOURCE_CACHE_SIZE", "8"))
 
 
 @dataclass
@@ -37,12 +43,79 @@ class DataSourceInfo:
         )
 
 
+class SourceFrameCache:
+    """
+    数据源数据缓存
+
+    以 (会话token, 数据源ID) 为键保存最近读取的数据及其版本(ETag)，
+    按最近访问顺序淘汰，最多保留 max_entries 份数据。
+    """
+
+    def __init__(self, max_entries: int = SOURCE_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[str, pd.DataFrame]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, agent_token: str, source_id: str) -> str | None:
+        """获取已缓存数据的版本，未缓存时返回None"""
+        with self._lock:
+            entry = self._entries.get((agent_token, source_id))
+            return entry[0] if entry is not None else None
+
+    def get(self, agent_token: str, source_id: str, version: str) -> pd.DataFrame | None:
+        """
+        读取缓存数据
+
+        Args:
+            agent_token: 会话token
+            source_id: 数据源ID
+            version: 期望的数据版本
+
+        Returns:
+            DataFrame | None: 缓存数据，未缓存或版本不一致时返回None
+        """
+        with self._lock:
+            entry = self._entries.get((agent_token, source_id))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((agent_token, source_id))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, agent_token: str, source_id: str, version: str, df: pd.DataFrame) -> None:
+        """写入缓存数据，超出容量时淘汰最久未访问的条目"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(agent_token, source_id)] = (version, df)
+            self._entries.move_to_end((agent_token, source_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, agent_token: str, source_id: str | None = None) -> None:
+        """使指定会话(或其中某个数据源)的缓存失效"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == agent_token and source_id in (None, k[1])]:
+                del self._entries[key]
+
+
 class AsyncAgentSourceClient:
     """Agent 数据源异步客户端"""
 
-    def __init__(self, base_url: str = API_BASE_URL) -> None:
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        frame_cache: SourceFrameCache | None = None,
+    ) -> None:
         self.base_url = base_url
-        self.client = httpx.AsyncClient()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60),
+            timeout=httpx.Timeout(30, read=300),
+        )
+        self.frame_cache = frame_cache
 
     async def close(self) -> None:
         """关闭客户端连接"""
@@ -94,23 +167,57 @@ class AsyncAgentSourceClient:
 
         return DataSourceInfo.from_dict(response.json())
 
-    async def read_source_data(self, agent_token: str, source_id: str) -> pd.DataFrame:
-        """读取指定数据源的数据（以pickle文件形式返回）
+    async def read_source_data_versioned(self, agent_token: str, source_id: str) -> tuple[pd.DataFrame, str | None]:
+        """读取指定数据源的数据及其版本（以pickle文件形式返回）
+
+        启用数据缓存时，携带已缓存数据的 ETag 发起条件请求，
+        服务端返回 304 时直接复用缓存数据，不再重复下载。
 
         Args:
             agent_token: 会话token
             source_id: 数据源ID
 
         Returns:
-            DataFrame数据
+            (DataFrame数据, 数据版本)，服务端未返回版本时为None
         """
         url = f"{self.base_url}/agent_source/data/{source_id}"
-        response = await self.client.get(url, headers=self._auth_headers(agent_token))
+        headers = self._auth_headers(agent_token)
+        cached_version = self.frame_cache and self.frame_cache.version(agent_token, source_id)
+        if cached_version is not None:
+            headers["If-None-Match"] = cached_version
+
+        response = await self.client.get(url, headers=headers)
+        if response.status_code == httpx.codes.NOT_MODIFIED and cached_version is not None:
+            assert self.frame_cache is not None
+            df = self.frame_cache.get(agent_token, source_id, cached_version)
+            if df is not None:
+                logger.debug(f"数据源 {source_id} 未变化，使用缓存数据")
+                # 返回副本，避免工具对数据的修改污染缓存
+                return df.copy(), cached_version
+            # 缓存条目恰好被淘汰，重新完整下载
+            response = await self.client.get(url, headers=self._auth_headers(agent_token))
         response.raise_for_status()
 
-        pickle_data = response.content
-        df = pd.read_pickle(io.BytesIO(pickle_data))  # noqa: S301
+        df = await anyio.to_thread.run_sync(pd.read_pickle, io.BytesIO(response.content))
         assert isinstance(df, pd.DataFrame)
+
+        version = response.headers.get("ETag")
+        if self.frame_cache is not None and version is not None:
+            self.frame_cache.put(agent_token, source_id, version, df)
+            df = df.copy()
+        return df, version
+
+    async def read_source_data(self, agent_token: str, source_id: str) -> pd.DataFrame:
+        """读取指定数据源的数据（以pickle文件形式返回）
+
+        Args:
+            agent_token: 会话token
+            source_id: 数据源ID
+
+        Returns:
+            DataFrame数据
+        """
+        df, _ = await self.read_source_data_versioned(agent_token, source_id)
         return df
 
     async def create_source_from_dataframe(
@@ -151,22 +258,44 @@ class AsyncAgentSourceClient:
         return response.json()
 
 
+frame_cache = SourceFrameCache()
+_shared_client: AsyncAgentSourceClient | None = None
+
+
+def get_agent_source_client() -> AsyncAgentSourceClient:
+    """获取进程内共享的数据源客户端，复用连接池与数据缓存"""
+    global _shared_client
+    if _shared_client is None or _shared_client.client.is_closed:
+        _shared_client = AsyncAgentSourceClient(frame_cache=frame_cache)
+    return _shared_client
+
+
+async def close_agent_source_client() -> None:
+    """关闭共享的数据源客户端"""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
+
+
 async def list_agent_sources(agent_token: str) -> list[DataSourceInfo]:
     """列出Agent数据源"""
-    async with AsyncAgentSourceClient() as client:
-        return await client.list_sources(agent_token)
+    return await get_agent_source_client().list_sources(agent_token)
 
 
 async def get_agent_source_info(agent_token: str, source_id: str) -> DataSourceInfo:
     """获取Agent数据源信息"""
-    async with AsyncAgentSourceClient() as client:
-        return await client.get_source_info(agent_token, source_id)
+    return await get_agent_source_client().get_source_info(agent_token, source_id)
 
 
 async def read_agent_source_data(agent_token: str, source_id: str) -> pd.DataFrame:
     """读取Agent数据源数据"""
-    async with AsyncAgentSourceClient() as client:
-        return await client.read_source_data(agent_token, source_id)
+    return await get_agent_source_client().read_source_data(agent_token, source_id)
+
+
+async def read_agent_source_data_versioned(agent_token: str, source_id: str) -> tuple[pd.DataFrame, str | None]:
+    """读取Agent数据源数据及其版本"""
+    return await get_agent_source_client().read_source_data_versioned(agent_token, source_id)
 
 
 async def create_agent_source(
@@ -176,6 +305,5 @@ async def create_agent_source(
     description: str | None = None,
 ) -> str:
     """创建Agent数据源，返回数据源ID"""
-    async with AsyncAgentSourceClient() as client:
-        result = await client.create_source_from_dataframe(agent_token, df, new_id, description)
-        return result["dataset_id"]
+    result = await get_agent_source_client().create_source_from_dataframe(agent_token, df, new_id, description)
+    return result["dataset_id"]
@@ -2,11 +2,17 @@
 工具模块包
 """
 
-from .fault_analysis import calculate_health_score, fault_vs_normal_analysis
+from .fault_analysis import calculate_health_score, calculate_health_scores, fault_vs_normal_analysis
+from .profile import BaselineProfile, HealthBaseline, ProfileCache, data_version
 from .rule_mining import analyze_fault_patterns
 
 __all__ = [
+    "BaselineProfile",
+    "HealthBaseline",
+    "ProfileCache",
     "analyze_fault_patterns",
     "calculate_health_score",
+    "calculate_health_scores",
+    "data_version",
     "fault_vs_normal_analysis",
 ]
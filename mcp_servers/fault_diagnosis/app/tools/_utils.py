@@ -3,6 +3,26 @@ from typing import cast
 import pandas as pd
 
 
+def split_masks(df: pd.DataFrame, target_col: str) -> tuple[pd.Series, pd.Series]:
+    """
+    工具: 计算正常/故障样本掩码
+
+    Args:
+        df: 包含故障标签的数据框
+        target_col: 故障标签列名
+
+    Returns:
+        (正常样本掩码, 故障样本掩码)
+    """
+    target = cast("pd.Series", df[target_col])
+    if pd.api.types.is_integer_dtype(target):
+        return target == 0, target == 1
+    if pd.api.types.is_bool_dtype(target):
+        return target == False, target == True  # noqa: E712
+    labels = target.astype(str).str.lower()
+    return labels == "false", labels == "true"
+
+
 def filter_fault_samples(df: pd.DataFrame, target_col: str) -> pd.DataFrame:
     """
     工具: 过滤故障样本
@@ -16,14 +36,8 @@ def filter_fault_samples(df: pd.DataFrame, target_col: str) -> pd.DataFrame:
     Returns:
         仅包含故障样本的数据框
     """
-    target = cast("pd.Series", df[target_col])
-    if pd.api.types.is_integer_dtype(target):
-        fault_samples = df[target == 1]
-    elif pd.api.types.is_bool_dtype(target):
-        fault_samples = df[target == True]  # noqa: E712
-    else:
-        fault_samples = df[target.astype(str).str.lower() == "true"]
-    return cast("pd.DataFrame", fault_samples)
+    _, fault_mask = split_masks(df, target_col)
+    return cast("pd.DataFrame", df[fault_mask])
 
 
 def filter_normal_samples(df: pd.DataFrame, target_col: str) -> pd.DataFrame:
@@ -39,11 +53,5 @@ def filter_normal_samples(df: pd.DataFrame, target_col: str) -> pd.DataFrame:
     Returns:
         仅包含正常样本的数据框
     """
-    target = cast("pd.Series", df[target_col])
-    if pd.api.types.is_integer_dtype(target):
-        normal_samples = df[target == 0]
-    elif pd.api.types.is_bool_dtype(target):
-        normal_samples = df[target == False]  # noqa: E712
-    else:
-        normal_samples = df[target.astype(str).str.lower() == "false"]
-    return cast("pd.DataFrame", normal_samples)
+    normal_mask, _ = split_masks(df, target_col)
+    return cast("pd.DataFrame", df[normal_mask])
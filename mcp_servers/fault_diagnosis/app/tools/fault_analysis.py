@@ -7,16 +7,20 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Any, cast
 
 import numpy as np
-from scipy.spatial.distance import mahalanobis
-from scipy.stats import ttest_ind
+import pandas as pd
 
-from ._utils import filter_fault_samples, filter_normal_samples
+from ._utils import filter_normal_samples, split_masks
+from .profile import BaselineProfile, HealthBaseline
 
 if TYPE_CHECKING:
-    import pandas as pd
+    from collections.abc import Iterable, Iterator
 
 
-def fault_vs_normal_analysis(df: pd.DataFrame, target_col: str) -> dict[str, Any]:
+def fault_vs_normal_analysis(
+    df: pd.DataFrame,
+    target_col: str,
+    profile: BaselineProfile | None = None,
+) -> dict[str, Any]:
     """
     工具1: 故障与正常样本对比分析
 
@@ -25,52 +29,36 @@ def fault_vs_normal_analysis(df: pd.DataFrame, target_col: str) -> dict[str, Any
     Args:
         df: 包含故障标签的数据框
         target_col: 故障标签列名
+        profile: 预先计算的基线画像，默认为None(即时计算)
 
     Returns:
         包含对比分析结果的字典
     """
-    # 分离正常和故障样本
-    normal_samples = filter_normal_samples(df, target_col)
-    fault_samples = filter_fault_samples(df, target_col)
-
-    # 获取特征列（排除目标列）
-    feature_cols = [col for col in df.columns if col != target_col]
+    if profile is None:
+        profile = BaselineProfile.build(df, target_col)
 
     # 计算故障率
-    fault_rate = len(fault_samples) / len(df)
+    fault_rate = len(profile.fault_rows) / profile.total_samples
 
     # 对比每个特征
-    comparisons = []
-    for col in feature_cols:
-        try:
-            normal_mean = normal_samples[col].mean()
-            fault_mean = fault_samples[col].mean()
-
-            # 计算差异百分比
-            diff_pct = float((fault_mean - normal_mean) / abs(normal_mean) * 100) if normal_mean != 0 else 0.0
-
-            # 计算t检验p值
-            test_result = ttest_ind(normal_samples[col].dropna(), fault_samples[col].dropna())
-            # 获取p值（不同scipy版本返回格式不同）
-            try:
-                p_value = float(test_result.pvalue)  # type: ignore
-            except (AttributeError, TypeError):
-                p_value = float(test_result[1])  # type: ignore
-
-            comparisons.append(
-                {
-                    "feature": col,
-                    "normal_mean": round(float(normal_mean), 2),
-                    "fault_mean": round(float(fault_mean), 2),
-                    "difference": round(float(fault_mean - normal_mean), 2),
-                    "diff_percentage": round(float(diff_pct), 1),
-                    "p_value": round(p_value, 4),
-                    "significant": bool(p_value < 0.05),
-                }
-            )
-        except Exception:  # noqa: S112
-            # 跳过无法处理的列
-            continue
+    normal_means = profile.normal_mean
+    fault_means = profile.fault_mean
+    differences = fault_means - normal_means
+    with np.errstate(divide="ignore", invalid="ignore"):
+        diff_pcts = np.where(normal_means != 0, differences / normal_means.abs() * 100, 0.0)
+
+    comparisons = [
+        {
+            "feature": col,
+            "normal_mean": round(float(normal_means[col]), 2),
+            "fault_mean": round(float(fault_means[col]), 2),
+            "difference": round(float(differences[col]), 2),
+            "diff_percentage": round(float(diff_pct), 1),
+            "p_value": round(float(profile.p_value[col]), 4),
+            "significant": bool(profile.p_value[col] < 0.05),
+        }
+        for col, diff_pct in zip(profile.feature_cols, diff_pcts, strict=True)
+    ]
 
     # 按差异绝对值排序
     comparisons.sort(key=lambda x: abs(x["diff_percentage"]), reverse=True)
@@ -88,9 +76,9 @@ def fault_vs_normal_analysis(df: pd.DataFrame, target_col: str) -> dict[str, Any
 
     return {
         "fault_rate": round(fault_rate, 3),
-        "total_samples": len(df),
-        "normal_samples": len(normal_samples),
-        "fault_samples": len(fault_samples),
+        "total_samples": profile.total_samples,
+        "normal_samples": len(profile.normal_rows),
+        "fault_samples": len(profile.fault_rows),
         "top_discriminators": top_discriminators,
         "all_comparisons": comparisons,
         "interpretation": interpretation,
@@ -101,6 +89,7 @@ def calculate_health_score(
     df: pd.DataFrame,
     target_col: str,
     sample_index: int | None = None,
+    profile: BaselineProfile | None = None,
 ) -> dict[str, Any]:
     """
     工具2: 健康度评分
@@ -111,47 +100,33 @@ def calculate_health_score(
         df: 数据框
         target_col: 故障标签列名
         sample_index: 要评估的样本索引，None表示最新样本（最后一行）
+        profile: 预先计算的基线画像，默认为None(即时计算)
 
     Returns:
         包含健康度评分和诊断信息的字典
     """
-    # 获取特征列
-    feature_cols = [col for col in df.columns if col != target_col]
-
-    # 提取正常样本作为基线
-    normal_samples = cast("pd.DataFrame", filter_normal_samples(df, target_col)[feature_cols])
+    if profile is None:
+        profile = BaselineProfile.build(df, target_col)
 
-    if len(normal_samples) < 2:
+    baseline = profile.health_baseline
+    if baseline is None:
         return {"error": "正常样本数量不足，无法计算健康度", "health_score": None}
 
-    # 计算正常样本的均值和协方差矩阵
-    normal_mean = cast("pd.Series", normal_samples.mean())
-    normal_cov = cast("pd.Series", normal_samples.cov())
-
-    # 处理奇异协方差矩阵
-    try:
-        normal_cov_inv = np.linalg.inv(normal_cov)
-    except np.linalg.LinAlgError:
-        # 使用伪逆
-        normal_cov_inv = np.linalg.pinv(normal_cov)
-
     # 选择要评估的样本
     if sample_index is None:
         sample_index = len(df) - 1
 
-    sample = df.iloc[sample_index][feature_cols]
+    feature_cols = baseline.feature_cols
+    sample = cast("pd.Series", df.iloc[sample_index][feature_cols]).astype(float)
     actual_fail = df.iloc[sample_index][target_col]
+    values = sample.to_numpy(dtype=float)
 
     # 计算马氏距离
-    try:
-        mahal_dist = mahalanobis(sample, normal_mean, normal_cov_inv)
-    except Exception:
-        # 如果失败，使用欧氏距离的标准化版本
-        mahal_dist = np.sqrt(np.sum(((sample - normal_mean) / normal_samples.std()) ** 2))
+    mahal_dist = float(baseline.mahalanobis(values[np.newaxis, :])[0])
 
     # 将马氏距离转换为健康度评分 (0-100)
     # 距离越大，健康度越低
-    health_score = float(max(0.0, min(100.0, 100.0 - float(mahal_dist) * 10)))
+    health_score = float(max(0.0, min(100.0, 100.0 - mahal_dist * 10)))
 
     # 确定风险等级
     if health_score >= 80:
@@ -161,20 +136,16 @@ def calculate_health_score(
     else:
         risk_level = "高风险"
 
-    # 识别异常的传感器
-    abnormal_sensors = []
-    for col in feature_cols:
-        sample_val = sample[col]
-        normal_mean_val = normal_mean[col]
-        normal_std_val = normal_samples[col].std()
+    # 识别异常的传感器（偏离超过1.5个标准差）
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_scores = (values - baseline.mean) / np.where(baseline.std > 0, baseline.std, np.nan)
+        deviation_pcts = np.abs((values - baseline.mean) / baseline.mean * 100)
 
-        if normal_std_val > 0:
-            z_score = (sample_val - normal_mean_val) / normal_std_val
-
-            if abs(z_score) > 1.5:  # 偏离超过1.5个标准差
-                direction = "偏高" if z_score > 0 else "偏低"
-                deviation_pct = abs((sample_val - normal_mean_val) / normal_mean_val * 100)
-                abnormal_sensors.append(f"{col}: {direction}{deviation_pct:.0f}%")
+    abnormal_sensors = [
+        f"{col}: {'偏高' if z_score > 0 else '偏低'}{deviation_pct:.0f}%"
+        for col, z_score, deviation_pct in zip(feature_cols, z_scores, deviation_pcts, strict=True)
+        if abs(z_score) > 1.5
+    ]
 
     # 生成建议
     if health_score >= 80:
@@ -196,5 +167,105 @@ def calculate_health_score(
         "total_abnormal_count": len(abnormal_sensors),
         "actual_failure": bool(actual_fail),
         "recommendation": recommendation,
-        "sample_values": {col: round(sample[col], 2) for col in feature_cols},
+        "sample_values": {col: round(float(sample[col]), 2) for col in feature_cols},
+    }
+
+
+def _iter_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start : start + chunk_size]
+
+
+def calculate_health_scores(
+    data: pd.DataFrame | Iterable[pd.DataFrame],
+    target_col: str,
+    baseline: HealthBaseline | None = None,
+    chunk_size: int = 100_000,
+) -> tuple[pd.DataFrame, dict[str, Any]]:
+    """
+    工具2(批量): 全表健康度评分
+
+    正常状态的均值与协方差只拟合一次，随后按块对每一行进行矩阵化评分，
+    中间矩阵的内存占用与块大小成正比。
+
+    Args:
+        data: 数据框，或按块读取的数据框迭代器(如 `pd.read_csv(..., chunksize=...)`)
+        target_col: 故障标签列名
+        baseline: 预先拟合的正常状态基线，传入数据框时可省略
+        chunk_size: 传入数据框时每块的行数
+
+    Returns:
+        tuple: (scores, summary)
+            - scores: 每行的评分结果
+            - summary: 评分汇总统计
+    """
+    if isinstance(data, pd.DataFrame):
+        if baseline is None:
+            feature_cols = [
+                col for col in data.columns if col != target_col and pd.api.types.is_numeric_dtype(data[col])
+            ]
+            normal_samples = filter_normal_samples(data, target_col)
+            if len(normal_samples) < 2:
+                raise ValueError("正常样本数量不足，无法计算健康度")
+            baseline = HealthBaseline.fit(normal_samples, feature_cols)
+        chunks: Iterable[pd.DataFrame] = _iter_chunks(data, chunk_size)
+    elif baseline is None:
+        raise ValueError("分块输入需要预先拟合的正常状态基线")
+    else:
+        chunks = data
+
+    parts = []
+    for chunk in chunks:
+        part = baseline.score(chunk)
+        if target_col in chunk.columns:
+            part["actual_failure"] = split_masks(chunk, target_col)[1].to_numpy(dtype=bool, na_value=False)
+        parts.append(part)
+
+    if not parts:
+        raise ValueError("没有可评分的样本")
+
+    scores = pd.concat(parts)
+    return scores, summarize_health_scores(scores)
+
+
+def summarize_health_scores(scores: pd.DataFrame, n_worst: int = 10) -> dict[str, Any]:
+    """
+    汇总全表健康度评分
+
+    Args:
+        scores: `calculate_health_scores` 返回的评分结果
+        n_worst: 返回健康度最低的样本数量
+
+    Returns:
+        评分汇总统计
+    """
+    health = cast("pd.Series", scores["health_score"])
+    quantiles = health.quantile([0.05, 0.25, 0.5, 0.75, 0.95])
+    worst = scores.nsmallest(n_worst, "health_score")
+
+    summary: dict[str, Any] = {
+        "total_samples": len(scores),
+        "mean_score": round(float(health.mean()), 2),
+        "std_score": round(float(health.std()), 2),
+        "min_score": round(float(health.min()), 1),
+        "max_score": round(float(health.max()), 1),
+        "quantiles": {f"p{int(q * 100):02d}": round(float(v), 1) for q, v in quantiles.items()},
+        "risk_distribution": {str(k): int(v) for k, v in scores["risk_level"].value_counts().items()},
+        "abnormal_samples": int((scores["abnormal_sensor_count"] > 0).sum()),
+        "worst_samples": [
+            {
+                "sample_index": int(idx) if isinstance(idx, int | np.integer) else str(idx),
+                "health_score": float(row["health_score"]),
+                "risk_level": row["risk_level"],
+                "abnormal_sensor_count": int(row["abnormal_sensor_count"]),
+            }
+            for idx, row in worst.iterrows()
+        ],
     }
+
+    if "actual_failure" in scores.columns:
+        failed = cast("pd.Series", scores["actual_failure"])
+        summary["fault_samples_mean_score"] = round(float(health[failed].mean()), 2) if failed.any() else None
+        summary["normal_samples_mean_score"] = round(float(health[~failed].mean()), 2) if (~failed).any() else None
+
+    return summary
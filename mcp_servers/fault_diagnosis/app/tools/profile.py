@@ -0,0 +1,296 @@
+"""
+基线画像模块
+
+为 (数据源, 故障标签列) 计算一次正常/故障样本划分及各特征统计量，
+供故障对比分析、健康度评分和故障模式聚类共享。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, cast
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import solve_triangular
+from scipy.stats import ttest_ind
+
+from ._utils import split_masks
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable
+
+
+@dataclass
+class HealthBaseline:
+    """
+    正常状态基线
+
+    保存正常样本的均值、标准差以及协方差矩阵的Cholesky分解，
+    拟合一次后可对任意多批样本进行矩阵化评分。
+    协方差矩阵奇异时退化为伪逆。
+    """
+
+    feature_cols: list[Hashable]
+    mean: np.ndarray
+    std: np.ndarray
+    cholesky: np.ndarray | None = None
+    cov_pinv: np.ndarray | None = None
+
+    @classmethod
+    def from_moments(
+        cls,
+        feature_cols: list[Hashable],
+        mean: np.ndarray,
+        std: np.ndarray,
+        cov: np.ndarray,
+    ) -> HealthBaseline:
+        """
+        基于正常样本的统计量构建基线
+
+        Args:
+            feature_cols: 参与评分的特征列
+            mean: 正常样本均值
+            std: 正常样本标准差
+            cov: 正常样本协方差矩阵
+
+        Returns:
+            HealthBaseline: 正常状态基线
+        """
+        baseline = cls(feature_cols=feature_cols, mean=mean, std=std)
+        try:
+            baseline.cholesky = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            baseline.cov_pinv = np.linalg.pinv(cov)
+        return baseline
+
+    @classmethod
+    def fit(cls, normal_samples: pd.DataFrame, feature_cols: list[Hashable]) -> HealthBaseline:
+        """
+        基于正常样本拟合基线
+
+        Args:
+            normal_samples: 正常样本数据框
+            feature_cols: 参与评分的特征列
+
+        Returns:
+            HealthBaseline: 正常状态基线
+        """
+        features = cast("pd.DataFrame", normal_samples[feature_cols])
+        return cls.from_moments(
+            feature_cols,
+            features.mean().to_numpy(dtype=float),
+            features.std().to_numpy(dtype=float),
+            features.cov().to_numpy(),
+        )
+
+    def mahalanobis(self, X: np.ndarray) -> np.ndarray:
+        """
+        批量计算马氏距离
+
+        Args:
+            X: 形状为 (n_samples, n_features) 的样本矩阵
+
+        Returns:
+            np.ndarray: 每个样本到正常状态的马氏距离
+        """
+        D = X - self.mean
+        if self.cholesky is not None:
+            # L y = d  =>  d^T Σ^-1 d = ||y||^2
+            Y = solve_triangular(self.cholesky, D.T, lower=True, check_finite=False)
+            return np.sqrt(np.sum(Y**2, axis=0))
+        squared = np.einsum("ij,jk,ik->i", D, self.cov_pinv, D)
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def score(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        对一批样本评分
+
+        Args:
+            chunk: 包含特征列的数据框
+
+        Returns:
+            pd.DataFrame: 与输入同索引的评分结果，包含健康度、马氏距离、风险等级和异常传感器数量
+        """
+        X = chunk[self.feature_cols].to_numpy(dtype=float)
+        distances = self.mahalanobis(X)
+        scores = np.clip(100.0 - distances * 10, 0.0, 100.0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_scores = (X - self.mean) / np.where(self.std > 0, self.std, np.nan)
+        abnormal_counts = np.sum(np.abs(z_scores) > 1.5, axis=1)
+
+        risk_levels = np.select(
+            [np.isnan(scores), scores >= 80, scores >= 60],
+            ["未知", "低风险", "中等风险"],
+            default="高风险",
+        )
+
+        return pd.DataFrame(
+            {
+                "health_score": scores.round(1),
+                "mahalanobis_distance": distances.round(4),
+                "risk_level": risk_levels,
+                "abnormal_sensor_count": abnormal_counts,
+            },
+            index=chunk.index,
+        )
+
+
+@dataclass
+class BaselineProfile:
+    """
+    基线画像
+
+    保存正常/故障样本的划分位置、各特征的均值与标准差、
+    正常样本协方差矩阵以及逐特征的t检验结果。
+    """
+
+    target_col: str
+    feature_cols: list[Hashable]
+    total_samples: int
+    normal_rows: np.ndarray
+    fault_rows: np.ndarray
+    normal_mean: pd.Series
+    normal_std: pd.Series
+    fault_mean: pd.Series
+    fault_std: pd.Series
+    normal_cov: pd.DataFrame
+    t_statistic: pd.Series
+    p_value: pd.Series
+    health_baseline: HealthBaseline | None = None
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, target_col: str) -> BaselineProfile:
+        """
+        一次性计算基线画像
+
+        Args:
+            df: 包含故障标签的数据框
+            target_col: 故障标签列名
+
+        Returns:
+            BaselineProfile: 基线画像
+        """
+        normal_mask, fault_mask = split_masks(df, target_col)
+        # 保留原始列标签，列名不是字符串(如无表头CSV的整数列名)时也能按标签取列
+        feature_cols = [col for col in df.columns if col != target_col and pd.api.types.is_numeric_dtype(df[col])]
+        features = df[feature_cols].astype(float)
+        normal = cast("pd.DataFrame", features[normal_mask])
+        fault = cast("pd.DataFrame", features[fault_mask])
+
+        normal_mean = cast("pd.Series", normal.mean())
+        normal_std = cast("pd.Series", normal.std())
+        normal_cov = normal.cov()
+
+        # 所有特征的t检验在一次向量化调用中完成，缺失值按列忽略
+        if len(normal) >= 2 and len(fault) >= 2:
+            test_result = ttest_ind(normal.to_numpy(), fault.to_numpy(), axis=0, nan_policy="omit")
+            t_statistic = np.asarray(test_result.statistic, dtype=float)  # pyright: ignore[reportAttributeAccessIssue]
+            p_value = np.asarray(test_result.pvalue, dtype=float)  # pyright: ignore[reportAttributeAccessIssue]
+        else:
+            t_statistic = p_value = np.full(len(feature_cols), np.nan)
+
+        profile = cls(
+            target_col=target_col,
+            feature_cols=feature_cols,
+            total_samples=len(df),
+            normal_rows=np.flatnonzero(normal_mask.to_numpy(dtype=bool, na_value=False)),
+            fault_rows=np.flatnonzero(fault_mask.to_numpy(dtype=bool, na_value=False)),
+            normal_mean=normal_mean,
+            normal_std=normal_std,
+            fault_mean=cast("pd.Series", fault.mean()),
+            fault_std=cast("pd.Series", fault.std()),
+            normal_cov=normal_cov,
+            t_statistic=pd.Series(t_statistic, index=feature_cols),
+            p_value=pd.Series(p_value, index=feature_cols),
+        )
+        if len(normal) >= 2:
+            profile.health_baseline = HealthBaseline.from_moments(
+                feature_cols,
+                normal_mean.to_numpy(dtype=float),
+                normal_std.to_numpy(dtype=float),
+                normal_cov.to_numpy(),
+            )
+        return profile
+
+
+def data_version(df: pd.DataFrame) -> str:
+    """
+    工具: 计算数据框的内容版本
+
+    Args:
+        df: 数据框
+
+    Returns:
+        str: 数据内容摘要，内容变化时随之变化
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(json.dumps([str(c) for c in df.columns]).encode())
+    try:
+        hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # 含不可哈希的值时无法判断内容是否变化，视为新版本
+        return uuid.uuid4().hex
+    return hasher.hexdigest()
+
+
+class ProfileCache:
+    """
+    基线画像缓存
+
+    以 (作用域, 数据源ID, 故障标签列) 为键保存画像，数据版本变化时自动失效。
+    """
+
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[Hashable, ...], tuple[str, BaselineProfile]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(
+        self,
+        key: tuple[Hashable, ...],
+        version: str,
+        df: pd.DataFrame,
+        target_col: str,
+    ) -> BaselineProfile:
+        """
+        获取基线画像，缓存缺失或数据版本变化时重新计算
+
+        Args:
+            key: 缓存键
+            version: 数据版本
+            df: 数据框
+            target_col: 故障标签列名
+
+        Returns:
+            BaselineProfile: 基线画像
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        profile = BaselineProfile.build(df, target_col)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, profile)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, *key_prefix: Any) -> None:
+        """使以给定前缀开头的缓存条目失效"""
+        with self._lock:
+            for key in [k for k in self._entries if k[: len(key_prefix)] == key_prefix]:
+                del self._entries[key]
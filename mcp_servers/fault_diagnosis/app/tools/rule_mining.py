@@ -7,15 +7,89 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Any, cast
 
 import numpy as np
-from sklearn.cluster import KMeans
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
 
-from ._utils import filter_fault_samples, filter_normal_samples
+from .profile import BaselineProfile
 
 if TYPE_CHECKING:
     import pandas as pd
 
 
-def analyze_fault_patterns(df: pd.DataFrame, target_col: str, n_clusters: int = 3) -> dict[str, Any]:
+# 故障样本数超过该值时使用 MiniBatchKMeans
+MINIBATCH_THRESHOLD = 50_000
+
+
+def _make_kmeans(n_clusters: int, n_samples: int, minibatch_threshold: int | None) -> KMeans | MiniBatchKMeans:
+    if minibatch_threshold is not None and n_samples > minibatch_threshold:
+        return MiniBatchKMeans(
+            n_clusters=n_clusters,
+            random_state=42,
+            batch_size=4096,
+            n_init=3,
+        )
+    return KMeans(n_clusters=n_clusters, random_state=42, n_init=10)  # pyright: ignore[reportArgumentType]
+
+
+def select_n_clusters(
+    X: np.ndarray,
+    k_range: tuple[int, int] = (2, 8),
+    sample_size: int = 5_000,
+    minibatch_threshold: int | None = MINIBATCH_THRESHOLD,
+    n_jobs: int | None = None,
+) -> tuple[int, dict[int, float], KMeans | MiniBatchKMeans]:
+    """
+    基于抽样轮廓系数自动选择聚类数
+
+    各候选聚类数并行拟合，轮廓系数在固定随机抽样的子集上计算，
+    避免在大规模数据上计算 O(n²) 的完整轮廓系数。最佳聚类数的模型已在全部样本上拟合，调用方直接使用。
+
+    Args:
+        X: 故障样本特征矩阵
+        k_range: 候选聚类数范围(闭区间)
+        sample_size: 计算轮廓系数的抽样数量
+        minibatch_threshold: 样本数超过该值时使用 MiniBatchKMeans，None表示始终使用 KMeans
+        n_jobs: 并行任务数，默认为 min(4, 候选数量)
+
+    Returns:
+        (最佳聚类数, 各候选聚类数的轮廓系数, 最佳聚类数的已拟合模型)
+    """
+    low, high = k_range
+    candidates = [k for k in range(max(low, 2), high + 1) if k < len(X)]
+    if not candidates:
+        raise ValueError(f"故障样本数量({len(X)})不足以自动选择聚类数")
+
+    rng = np.random.default_rng(42)
+    sample_idx = rng.choice(len(X), size=min(sample_size, len(X)), replace=False)
+    X_sample = X[sample_idx]
+
+    def evaluate(k: int) -> tuple[float, KMeans | MiniBatchKMeans]:
+        model = _make_kmeans(k, len(X), minibatch_threshold).fit(X)
+        labels = model.predict(X_sample)
+        if len(np.unique(labels)) < 2:
+            return -1.0, model
+        return float(silhouette_score(X_sample, labels)), model
+
+    # KMeans 的计算主要在释放GIL的底层实现中完成，线程并行即可
+    results = cast(
+        "list[tuple[float, KMeans | MiniBatchKMeans]]",
+        Parallel(n_jobs=n_jobs or min(4, len(candidates)), prefer="threads")(delayed(evaluate)(k) for k in candidates),
+    )
+    silhouette_scores = {k: score for k, (score, _) in zip(candidates, results, strict=True)}
+    best_k = max(silhouette_scores, key=lambda k: silhouette_scores[k])
+    return best_k, silhouette_scores, results[candidates.index(best_k)][1]
+
+
+def analyze_fault_patterns(
+    df: pd.DataFrame,
+    target_col: str,
+    n_clusters: int | None = 3,
+    profile: BaselineProfile | None = None,
+    k_range: tuple[int, int] = (2, 8),
+    minibatch_threshold: int | None = MINIBATCH_THRESHOLD,
+    silhouette_sample_size: int = 5_000,
+) -> dict[str, Any]:
     """
     工具4: 故障模式聚类分析
 
@@ -24,61 +98,78 @@ def analyze_fault_patterns(df: pd.DataFrame, target_col: str, n_clusters: int =
     Args:
         df: 数据框
         target_col: 故障标签列名
-        n_clusters: 聚类数量
+        n_clusters: 聚类数量，None表示基于抽样轮廓系数自动选择
+        profile: 预先计算的基线画像，默认为None(即时计算)
+        k_range: 自动选择聚类数时的候选范围(闭区间)
+        minibatch_threshold: 故障样本数超过该值时使用 MiniBatchKMeans，None表示始终使用 KMeans
+        silhouette_sample_size: 自动选择聚类数时计算轮廓系数的抽样数量
 
     Returns:
         包含故障模式分析结果的字典
     """
+    if profile is None:
+        profile = BaselineProfile.build(df, target_col)
+
     # 提取故障样本
-    fault_samples = filter_fault_samples(df, target_col)
+    fault_samples = df.iloc[profile.fault_rows]
 
-    if len(fault_samples) < n_clusters:
+    if n_clusters is not None and len(fault_samples) < n_clusters:
         return {"error": f"故障样本数量({len(fault_samples)})少于聚类数({n_clusters})", "fault_patterns": []}
 
     # 获取特征列
-    feature_cols: list[str] = [col for col in df.columns if col != target_col]
-    X_fault = fault_samples[feature_cols]
+    feature_cols = profile.feature_cols
+    X_fault = cast("pd.DataFrame", fault_samples[feature_cols])
+    X_values = X_fault.to_numpy(dtype=float)
 
     # 正常样本的均值（用于对比）
-    normal_samples = filter_normal_samples(df, target_col)
-    normal_means = cast("pd.Series", normal_samples[feature_cols].mean())
-
-    # K-means聚类
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)  # pyright: ignore[reportArgumentType]
-    fault_samples_copy = fault_samples.copy()
-    fault_samples_copy["cluster"] = kmeans.fit_predict(X_fault)
+    normal_means = profile.normal_mean
+
+    # 自动选择聚类数时直接使用已拟合的最佳模型，否则按指定聚类数拟合
+    silhouette_scores: dict[int, float] | None = None
+    if n_clusters is None:
+        try:
+            n_clusters, silhouette_scores, kmeans = select_n_clusters(
+                X_values,
+                k_range,
+                silhouette_sample_size,
+                minibatch_threshold,
+            )
+        except ValueError as e:
+            return {"error": str(e), "fault_patterns": []}
+    else:
+        kmeans = _make_kmeans(n_clusters, len(X_values), minibatch_threshold).fit(X_values)
+    labels = cast("np.ndarray", kmeans.labels_)
+
+    # 一次分组聚合得到所有聚类的样本数和特征均值
+    cluster_stats = X_fault.groupby(labels).agg("mean").reindex(range(n_clusters))
+    cluster_sizes = np.bincount(labels, minlength=n_clusters)
+
+    # 各聚类相对正常样本的差异百分比，正常均值为0的特征不参与比较
+    normal_values = normal_means[feature_cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        diff_pcts = (cluster_stats - normal_values) / normal_values.abs() * 100
+    diff_pcts = diff_pcts.loc[:, normal_values != 0]
 
     # 分析每个聚类
     patterns = []
 
     for cluster_id in range(n_clusters):
-        cluster_data = cast("pd.DataFrame", fault_samples_copy[fault_samples_copy["cluster"] == cluster_id])
-        cluster_size = len(cluster_data)
+        cluster_size = int(cluster_sizes[cluster_id])
         cluster_pct = (cluster_size / len(fault_samples)) * 100
+        cluster_diff = cast("pd.Series", diff_pcts.loc[cluster_id])
 
-        # 计算聚类中心的特征均值
-        cluster_means = cast("pd.Series", cluster_data[feature_cols].mean())
-
-        # 识别显著特征（与正常样本差异大的）
-        significant_features = []
-        for col in feature_cols:
-            cluster_val = float(cluster_means[col])
-            normal_val = float(normal_means[col])
-
-            if normal_val != 0:
-                diff_pct = ((cluster_val - normal_val) / abs(normal_val)) * 100
-
-                if abs(diff_pct) > 20:  # 差异超过20%
-                    status = "高" if diff_pct > 0 else "低"
-                    significant_features.append(
-                        {
-                            "feature": col,
-                            "value": round(cluster_val, 2),
-                            "normal_value": round(normal_val, 2),
-                            "status": status,
-                            "diff_pct": abs(diff_pct),
-                        }
-                    )
+        # 识别显著特征（与正常样本差异超过20%）
+        significant = cluster_diff[cluster_diff.abs() > 20]
+        significant_features = [
+            {
+                "feature": col,
+                "value": round(float(cluster_stats.loc[cluster_id, col]), 2),
+                "normal_value": round(float(normal_values[col]), 2),
+                "status": "高" if diff_pct > 0 else "低",
+                "diff_pct": abs(float(diff_pct)),
+            }
+            for col, diff_pct in significant.items()
+        ]
 
         # 按差异排序
         significant_features.sort(key=lambda x: x["diff_pct"], reverse=True)
@@ -133,9 +224,12 @@ def analyze_fault_patterns(df: pd.DataFrame, target_col: str, n_clusters: int =
             f"{pattern['percentage']}的故障属于{pattern['name']}，主要特征是{', '.join(pattern['top_features'])}"
         )
 
-    return {
+    result: dict[str, Any] = {
         "total_failures": len(fault_samples),
         "n_patterns": n_clusters,
         "fault_patterns": patterns,
         "insights": insights,
     }
+    if silhouette_scores is not None:
+        result["silhouette_scores"] = {str(k): round(v, 4) for k, v in silhouette_scores.items()}
+    return result
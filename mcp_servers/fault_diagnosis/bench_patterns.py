@@ -0,0 +1,106 @@
+# ruff: noqa: T201
+"""
+故障模式聚类基准
+
+对比逐聚类、逐特征循环统计的 KMeans 实现与 MiniBatchKMeans + groupby 聚合的实现，
+故障样本规模从 1 万到 1000 万行，并校验两种实现得到的聚类样本数和主要特征一致。
+
+Run:
+    python -m bench_patterns
+    python -m bench_patterns --rows 10000 100000 --max-legacy-rows 100000
+"""
+
+import argparse
+import time
+from typing import cast
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+from app.tools import BaselineProfile, analyze_fault_patterns
+from app.tools.rule_mining import MINIBATCH_THRESHOLD
+
+N_FEATURES = 8
+N_CLUSTERS = 3
+
+
+def make_data(n_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    data = rng.normal(10.0, 2.0, size=(n_rows, N_FEATURES)).astype(np.float32)
+    df = pd.DataFrame(data, columns=[f"s{i}" for i in range(N_FEATURES)])
+    # 大部分为故障样本，保证聚类规模与行数同阶
+    fail = rng.random(n_rows) < 0.8
+    df.loc[fail, "s0"] += rng.choice([0.0, 8.0, 16.0], size=int(fail.sum())).astype(np.float32)
+    df["fail"] = fail.astype(int)
+    return df
+
+
+def legacy_cluster_profile(df: pd.DataFrame, profile: BaselineProfile) -> list[dict]:
+    fault_samples = df.iloc[profile.fault_rows].copy()
+    feature_cols = profile.feature_cols
+    kmeans = KMeans(n_clusters=N_CLUSTERS, random_state=42, n_init=10)  # pyright: ignore[reportArgumentType]
+    fault_samples["cluster"] = kmeans.fit_predict(fault_samples[feature_cols])
+
+    patterns = []
+    for cluster_id in range(N_CLUSTERS):
+        cluster_data = cast("pd.DataFrame", fault_samples[fault_samples["cluster"] == cluster_id])
+        cluster_means = cast("pd.Series", cluster_data[feature_cols].mean())
+        significant = []
+        for col in feature_cols:
+            normal_val = float(profile.normal_mean[col])
+            if normal_val != 0:
+                diff_pct = (float(cluster_means[col]) - normal_val) / abs(normal_val) * 100
+                if abs(diff_pct) > 20:
+                    significant.append((col, diff_pct))
+        patterns.append({"count": len(cluster_data), "significant": significant})
+    return patterns
+
+
+def check_parity(legacy: list[dict], result: dict, rel_tol: float) -> None:
+    """按样本数排序后逐个对比聚类: 样本数的相对误差不超过 rel_tol，主要特征及其方向一致"""
+    expected = sorted(legacy, key=lambda p: p["count"], reverse=True)
+    actual = result["fault_patterns"]
+    assert len(actual) == len(expected), (len(actual), len(expected))
+    for old, new in zip(expected, actual, strict=True):
+        assert abs(new["count"] - old["count"]) <= rel_tol * old["count"], (old["count"], new["count"])
+        top = sorted(old["significant"], key=lambda item: abs(item[1]), reverse=True)[:3]
+        top_features = [f"{col}({'高' if diff_pct > 0 else '低'})" for col, diff_pct in top]
+        assert new["top_features"] == top_features, (new["top_features"], top_features)
+
+
+def run(n_rows: int, max_legacy_rows: int) -> None:
+    df = make_data(n_rows)
+    profile = BaselineProfile.build(df, "fail")
+
+    legacy = None
+    legacy_time = None
+    if n_rows <= max_legacy_rows:
+        start = time.perf_counter()
+        legacy = legacy_cluster_profile(df, profile)
+        legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = analyze_fault_patterns(df, "fail", n_clusters=N_CLUSTERS, profile=profile)
+    new_time = time.perf_counter() - start
+    assert len(result["fault_patterns"]) == N_CLUSTERS
+    if legacy is not None:
+        # 两者都使用 KMeans 时仅有浮点精度差异；MiniBatchKMeans 的聚类边界略有不同
+        check_parity(legacy, result, 0.001 if len(profile.fault_rows) <= MINIBATCH_THRESHOLD else 0.01)
+
+    legacy_col = f"{legacy_time:8.2f}s" if legacy_time is not None else "     n/a"
+    speedup = f"{legacy_time / new_time:6.1f}x" if legacy_time is not None else "   n/a"
+    print(
+        f"rows={n_rows:>10,}  faults={len(profile.fault_rows):>10,}  "
+        f"kmeans+loop={legacy_col}  minibatch+groupby={new_time:8.2f}s  speedup={speedup}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--max-legacy-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        run(n_rows, args.max_legacy_rows)
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pandas as pd
 
-from app.tools import analyze_fault_patterns, calculate_health_score, fault_vs_normal_analysis
+from app.tools import analyze_fault_patterns, calculate_health_score, calculate_health_scores, fault_vs_normal_analysis
 
 
 def test_tool_1(df: pd.DataFrame) -> None:
@@ -40,6 +40,20 @@ def test_tool_2(df: pd.DataFrame) -> None:
     print(f"建议: {result2['recommendation']}\n")
 
 
+def test_tool_2_batch(df: pd.DataFrame) -> None:
+    print("=" * 80)
+    print("工具2(批量): 全表健康度评分")
+    print("=" * 80)
+    scores, summary = calculate_health_scores(df, "fail", chunk_size=100)
+    single = calculate_health_score(df, "fail", sample_index=-1)
+    print(f"评分样本数: {summary['total_samples']}")
+    print(f"平均健康度: {summary['mean_score']}")
+    print(f"风险分布: {summary['risk_distribution']}")
+    print(f"故障样本平均健康度: {summary['fault_samples_mean_score']}")
+    print(f"正常样本平均健康度: {summary['normal_samples_mean_score']}")
+    print(f"最后一行: 批量={scores['health_score'].iloc[-1]}, 单样本={single['health_score']}\n")
+
+
 def test_tool_4(df: pd.DataFrame) -> None:
     print("=" * 80)
     print("工具4: 故障模式聚类")
@@ -79,6 +93,7 @@ def test_with_sample_data() -> None:
 
     test_tool_1(df)
     test_tool_2(df)
+    test_tool_2_batch(df)
     test_tool_4(df)
 
     print("\n" + "=" * 80)
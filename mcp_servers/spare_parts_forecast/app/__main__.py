@@ -17,7 +17,8 @@ import pandas as pd
 from mcp.server import FastMCP
 from mcp.server.fastmcp import Image
 
-from .data_source import read_agent_source_data
+from .cache import forecast_cache
+from .data_source import close_agent_source_client, frame_cache, read_agent_source_data
 from .forecasting import (
     ARIMAAnalysisResult,
     BPNNAnalysisResult,
@@ -55,6 +56,7 @@ instructions = """\
 - forest_forecast: 随机森林预测
 - xgb_forecast: XGBoost预测
 - bp_forecast: BP神经网络预测
+- cache_stats: 查看预测结果缓存命中情况
 """
 
 app = FastMCP(
@@ -82,6 +84,22 @@ async def run_sync[**P, R](_fn_: Callable[P, R], /, *args: P.args, **kwargs: P.k
     return await anyio.to_thread.run_sync(fn, abandon_on_cancel=True)
 
 
+async def run_cached[R](
+    tool: str,
+    fn: Callable[..., tuple[R, bytes | None]],
+    df: pd.DataFrame,
+    **kwargs: Any,
+) -> tuple[R, bytes | None]:
+    """以数据内容、工具名和参数为键缓存预测结果与图表"""
+    key = await run_sync(forecast_cache.make_key, tool, df, kwargs)
+    if (cached := await run_sync(forecast_cache.get, tool, key)) is not None:
+        return cached
+
+    result, image = await run_sync(fn, df=df, **kwargs)
+    await run_sync(forecast_cache.put, key, result, image)
+    return result, image
+
+
 @app.tool()
 def algorithms() -> list[str]:
     """
@@ -104,6 +122,28 @@ def algorithm_categories() -> dict[str, list[str]]:
     return get_available_algorithms()
 
 
+@app.tool()
+def cache_stats() -> dict[str, Any]:
+    """
+    获取预测结果缓存统计信息
+
+    相同数据、相同工具和参数的重复预测会直接返回缓存结果，无需重新计算。
+
+    Returns:
+        dict: 缓存统计信息
+            - entries: 缓存条目数
+            - size_bytes: 缓存占用磁盘大小(字节)
+            - max_bytes: 缓存容量上限(字节)
+            - evictions: 已淘汰条目数
+            - hits / misses / hit_rate: 总命中次数、未命中次数和命中率
+            - tools: 按工具统计的命中情况
+            - source_cache: 数据源数据缓存的命中情况
+    """
+    stats = forecast_cache.stats()
+    stats["source_cache"] = {"hits": frame_cache.hits, "misses": frame_cache.misses}
+    return stats
+
+
 @app.tool()
 async def sma_forecast(
     source_id: str,
@@ -186,9 +226,10 @@ async def sma_forecast(
     df = await read_source(source_id)
 
     # 调用SMA预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "sma_forecast",
         sma_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         window_size=window_size,
@@ -293,9 +334,10 @@ async def ema_forecast(
         smoothing_methods = ["single", "double", "triple"]
 
     # 调用EMA预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "ema_forecast",
         ema_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         test_size=test_size,
@@ -400,9 +442,10 @@ async def croston_forecast(
     df = await read_source(source_id)
 
     # 调用Croston预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "croston_forecast",
         croston_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         test_size=test_size,
@@ -426,6 +469,11 @@ async def arima_forecast(
     arima_order_d: int = 1,
     arima_order_q: int = 1,
     confidence_level: float = 0.95,
+    auto_order: bool = False,
+    max_p: int = 3,
+    max_d: int = 2,
+    max_q: int = 3,
+    information_criterion: Literal["aic", "bic"] = "aic",
     enable_diagnostics: bool = True,
     column_label: str | None = None,
     plot_title: str | None = None,
@@ -444,6 +492,11 @@ async def arima_forecast(
         arima_order_d: ARIMA模型的差分阶数(d)，默认为1
         arima_order_q: ARIMA模型的移动平均阶数(q)，默认为1
         confidence_level: 预测置信水平，取值范围0-1，默认为0.95(95%置信区间)
+        auto_order: 是否基于信息准则自动搜索(p,d,q)，启用时忽略arima_order_*参数，默认为False
+        max_p: 自动搜索时的最大自回归阶数，默认为3
+        max_d: 自动搜索时的最大差分阶数，默认为2
+        max_q: 自动搜索时的最大移动平均阶数，默认为3
+        information_criterion: 自动搜索使用的信息准则，可选"aic"、"bic"，默认为"aic"
         enable_diagnostics: 是否启用详细诊断分析和图表生成，默认为True
         column_label: 图表中显示的列标签，默认使用target_column值
         plot_title: 图表标题，默认为None(自动生成)
@@ -464,6 +517,7 @@ async def arima_forecast(
             - model_aic: 模型AIC信息准则
             - model_bic: 模型BIC信息准则
             - convergence_status: 模型是否收敛
+            - order_scores: 自动搜索时各候选阶数的信息准则值
             - actual_values: 实际观测值列表
             - predicted_values: 预测值列表
             - prediction_intervals: 预测置信区间(如果启用诊断)
@@ -502,17 +556,24 @@ async def arima_forecast(
         - 启用诊断模式会生成详细的残差分析图表
         - 预测结果包含置信区间，用于评估预测的不确定性
         - 执行时间取决于数据量大小和模型复杂度
+        - 平稳性与白噪声检验结果按序列内容缓存，序列末尾仅追加少量新点时复用已有拟合参数
     """
     df = await read_source(source_id)
 
     # 调用ARIMA预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "arima_forecast",
         arima_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         arima_order=(arima_order_p, arima_order_d, arima_order_q),
         confidence_level=confidence_level,
+        auto_order=auto_order,
+        max_p=max_p,
+        max_d=max_d,
+        max_q=max_q,
+        information_criterion=information_criterion,
         enable_diagnostics=enable_diagnostics,
         column_label=column_label,
         plot_title=plot_title,
@@ -609,9 +670,10 @@ async def forest_forecast(
     df = await read_source(source_id)
 
     # 调用随机森林预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "forest_forecast",
         forest_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         feature_columns=feature_columns,
@@ -726,9 +788,10 @@ async def xgb_forecast(
     df = await read_source(source_id)
 
     # 调用XGBoost预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "xgb_forecast",
         xgboost_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         feature_columns=feature_columns,
@@ -760,6 +823,7 @@ async def bp_forecast(
     learning_rate: float = 0.001,
     test_size: float = 0.2,
     random_state: int = 42,
+    early_stopping_patience: int = 10,
     enable_diagnostics: bool = True,
     column_label: str | None = None,
     plot_title: str | None = None,
@@ -781,6 +845,7 @@ async def bp_forecast(
         learning_rate: 学习率，默认为0.001
         test_size: 测试集比例，默认为0.2
         random_state: 随机种子，默认为42
+        early_stopping_patience: 验证损失无改善时提前停止的容忍轮数，默认为10，0表示不启用早停
         enable_diagnostics: 是否启用详细诊断分析和图表生成，默认为True
         column_label: 图表中显示的列标签，默认使用target_column值
         plot_title: 图表标题，默认为None(自动生成)
@@ -802,6 +867,9 @@ async def bp_forecast(
             - batch_size: 批次大小
             - loss_history: 训练损失历史
             - val_loss_history: 验证损失历史
+            - early_stopping_patience: 早停容忍轮数
+            - candidates: 各候选参数组合的MAPE、实际训练轮数和训练耗时
+            - search_time: 参数搜索总耗时(秒)
             - actual_values: 实际观测值列表
             - predicted_values: 预测值列表
             - execution_time: 执行时间(秒)
@@ -839,9 +907,10 @@ async def bp_forecast(
     df = await read_source(source_id)
 
     # 调用BP神经网络预测函数
-    result, image = await run_sync(
+    result, image = await run_cached(
+        "bp_forecast",
         bp_forecast_impl,
-        df=df,
+        df,
         target_column=target_column,
         time_column=time_column,
         input_sizes=input_sizes,
@@ -851,6 +920,7 @@ async def bp_forecast(
         learning_rate=learning_rate,
         test_size=test_size,
         random_state=random_state,
+        early_stopping_patience=early_stopping_patience,
         enable_diagnostics=enable_diagnostics,
         column_label=column_label,
         plot_title=plot_title,
@@ -876,7 +946,14 @@ def run_server_sse() -> None:
         log_config=LOGGING_CONFIG,
     )
     server = uvicorn.Server(config)
-    anyio.run(server.serve)
+
+    async def serve() -> None:
+        try:
+            await server.serve()
+        finally:
+            await close_agent_source_client()
+
+    anyio.run(serve)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+import base64
+import dataclasses
+import hashlib
+import json
+import os
+import stat
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter
+
+from .forecasting.analysis_results import (
+    ARIMAAnalysisResult,
+    BaseAnalysisResult,
+    BPNNAnalysisResult,
+    CrostonAnalysisResult,
+    EMAAnalysisResult,
+    RandomForestAnalysisResult,
+    SMAAnalysisResult,
+    XGBoostAnalysisResult,
+)
+from .log import logger
+
+CACHE_DIR = Path(os.getenv("FORECAST_CACHE_DIR", Path("data") / "forecast_cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("FORECAST_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+@dataclass
+class ToolCacheStats:
+    """单个工具的缓存命中统计"""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class CacheStats:
+    """预测结果缓存统计"""
+
+    entries: int = 0
+    size_bytes: int = 0
+    max_bytes: int = 0
+    evictions: int = 0
+    tools: dict[str, ToolCacheStats] = field(default_factory=dict)
+
+    def as_dict(self) -> dict[str, Any]:
+        hits = sum(s.hits for s in self.tools.values())
+        misses = sum(s.misses for s in self.tools.values())
+        return {
+            "entries": self.entries,
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "tools": {
+                name: {"hits": s.hits, "misses": s.misses, "hit_rate": s.hit_rate} for name, s in self.tools.items()
+            },
+        }
+
+
+_RESULT_TYPES: dict[str, type[BaseAnalysisResult]] = {
+    cls.__name__: cls
+    for cls in (
+        ARIMAAnalysisResult,
+        BPNNAnalysisResult,
+        CrostonAnalysisResult,
+        EMAAnalysisResult,
+        RandomForestAnalysisResult,
+        SMAAnalysisResult,
+        XGBoostAnalysisResult,
+    )
+}
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _encode_entry(result: Any, image: bytes | None) -> bytes | None:
+    """将预测结果序列化为JSON，结果类型未知时返回None"""
+    if type(result).__name__ not in _RESULT_TYPES or not dataclasses.is_dataclass(result):
+        return None
+    payload = {
+        "type": type(result).__name__,
+        "result": dataclasses.asdict(result),
+        "image": base64.b64encode(image).decode() if image is not None else None,
+    }
+    try:
+        return json.dumps(payload, default=_json_default).encode()
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_entry(data: bytes) -> tuple[BaseAnalysisResult, bytes | None]:
+    payload = json.loads(data)
+    result_type = _RESULT_TYPES[payload["type"]]
+    result = TypeAdapter(result_type).validate_python(payload["result"])
+    image = base64.b64decode(payload["image"]) if payload["image"] is not None else None
+    return result, image
+
+
+def _ensure_private_dir(path: Path) -> bool:
+    """
+    创建仅当前用户可访问的缓存目录，并校验目录的所有者与权限
+
+    Returns:
+        bool: 目录可安全使用时返回True
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return True
+
+    info = path.lstat()
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        logger.warning(f"预测缓存目录不属于当前用户，已禁用缓存: {path}")
+        return False
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        path.chmod(0o700)
+    return True
+
+
+class ForecastCache:
+    """
+    预测结果缓存
+
+    以 (数据内容哈希, 工具名, 参数) 为键，将预测结果与渲染后的图表持久化到本地磁盘，
+    按最近访问顺序淘汰，总大小不超过 max_bytes。
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._stats = CacheStats(max_bytes=max_bytes)
+        self._loaded = False
+        self._usable = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self._usable
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def _ensure_loaded(self) -> bool:
+        if self._loaded:
+            return self._usable
+        self._loaded = True
+        try:
+            self._usable = _ensure_private_dir(self.root)
+        except OSError:
+            logger.opt(exception=True).warning(f"预测缓存目录不可用，已禁用缓存: {self.root}")
+            self._usable = False
+        if not self._usable:
+            return False
+        # 按修改时间恢复访问顺序，命中时会刷新修改时间
+        files = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            self._index[path.stem] = path.stat().st_size
+        return True
+
+    @staticmethod
+    def make_key(tool: str, df: pd.DataFrame, params: dict[str, Any]) -> str | None:
+        """
+        计算缓存键
+
+        Args:
+            tool: 工具名
+            df: 输入数据
+            params: 工具参数(不含数据)
+
+        Returns:
+            str | None: 缓存键，数据或参数无法哈希时返回None
+        """
+        try:
+            hasher = hashlib.blake2b(digest_size=20)
+            hasher.update(tool.encode())
+            hasher.update(json.dumps(params, sort_keys=True, default=str).encode())
+            hasher.update(json.dumps([str(c) for c in df.columns]).encode())
+            hasher.update(json.dumps([str(t) for t in df.dtypes]).encode())
+            hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        except TypeError:
+            return None
+        return hasher.hexdigest()
+
+    def _record(self, tool: str, *, hit: bool) -> None:
+        stats = self._stats.tools.setdefault(tool, ToolCacheStats())
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+
+    def get(self, tool: str, key: str | None) -> tuple[Any, bytes | None] | None:
+        """
+        读取缓存的预测结果
+
+        Args:
+            tool: 工具名
+            key: 缓存键
+
+        Returns:
+            tuple | None: (预测结果, 图表PNG数据)，未命中时返回None
+        """
+        if not self.enabled or key is None:
+            return None
+
+        with self._lock:
+            if not self._ensure_loaded():
+                return None
+            if key not in self._index:
+                self._record(tool, hit=False)
+                return None
+
+            path = self._path(key)
+            try:
+                entry = _decode_entry(path.read_bytes())
+                path.touch()
+            except Exception:
+                logger.opt(exception=True).warning(f"预测缓存读取失败，已丢弃: {key}")
+                self._index.pop(key, None)
+                path.unlink(missing_ok=True)
+                self._record(tool, hit=False)
+                return None
+
+            self._index.move_to_end(key)
+            self._record(tool, hit=True)
+            return entry
+
+    def put(self, key: str | None, result: Any, image: bytes | None) -> None:
+        """
+        写入预测结果，超出容量时淘汰最久未访问的条目
+
+        Args:
+            key: 缓存键
+            result: 预测结果
+            image: 图表PNG数据
+        """
+        if not self.enabled or key is None:
+            return
+
+        data = _encode_entry(result, image)
+        if data is None or len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            if not self._ensure_loaded():
+                return
+            path = self._path(key)
+            tmp = path.with_suffix(".tmp")
+            try:
+                tmp.write_bytes(data)
+                tmp.replace(path)
+            except OSError:
+                logger.opt(exception=True).warning(f"预测缓存写入失败: {key}")
+                tmp.unlink(missing_ok=True)
+                return
+
+            self._index[key] = len(data)
+            self._index.move_to_end(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        total = sum(self._index.values())
+        while total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._path(key).unlink(missing_ok=True)
+            total -= size
+            self._stats.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            if self.enabled:
+                self._ensure_loaded()
+            self._stats.entries = len(self._index)
+            self._stats.size_bytes = sum(self._index.values())
+            return self._stats.as_dict()
+
+
+forecast_cache = ForecastCache()
@@ -0,0 +1,47 @@
+import hashlib
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def make_supervised_windows(values: np.ndarray, input_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    工具: 构建滑动窗口监督学习样本
+
+    使用 `sliding_window_view` 一次性生成所有窗口，避免逐窗口的 Python 循环。
+    第 i 个样本的输入为 values[i : i + input_size]，标签为 values[i + input_size]。
+
+    Args:
+        values: 一维时间序列
+        input_size: 输入窗口长度
+
+    Returns:
+        tuple: (X, y)
+            - X: 形状为 (n - input_size, input_size) 的输入矩阵
+            - y: 形状为 (n - input_size,) 的标签向量
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if input_size < 1:
+        raise ValueError(f"输入窗口长度必须为正整数: {input_size}")
+    if len(values) <= input_size:
+        return np.empty((0, input_size)), np.empty(0)
+
+    windows = sliding_window_view(values, input_size + 1)
+    # sliding_window_view 返回只读视图，复制为连续内存以便直接送入训练框架
+    X = np.ascontiguousarray(windows[:, :-1])
+    y = np.ascontiguousarray(windows[:, -1])
+    return X, y
+
+
+def series_digest(values: np.ndarray) -> str:
+    """
+    工具: 计算序列内容哈希
+
+    Args:
+        values: 时间序列数值
+
+    Returns:
+        str: 序列内容的十六进制摘要，数值相同的序列摘要相同
+    """
+    data = np.ascontiguousarray(values, dtype=np.float64)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
@@ -75,6 +75,12 @@ class ARIMAAnalysisResult(BaseAnalysisResult):
     ar_params: list[float] = field(default_factory=list)
     ma_params: list[float] = field(default_factory=list)
 
+    # 阶数搜索与缓存
+    information_criterion: str = ""
+    order_scores: dict[str, float] = field(default_factory=dict)
+    diagnostics_cached: bool = False
+    fit_reused: bool = False
+
 
 @dataclass
 class SMAAnalysisResult(BaseAnalysisResult):
@@ -156,6 +162,18 @@ class XGBoostAnalysisResult(BaseAnalysisResult):
     best_position: list[float] = field(default_factory=list)
 
 
+@dataclass
+class BPNNCandidate:
+    """BP神经网络单个候选参数组合的训练记录"""
+
+    input_size: int
+    hidden_size: int
+    mape: float
+    epochs_trained: int
+    train_time: float
+    graph_reused: bool = False
+
+
 @dataclass
 class BPNNAnalysisResult(BaseAnalysisResult):
     """BP神经网络预测分析结果"""
@@ -170,3 +188,7 @@ class BPNNAnalysisResult(BaseAnalysisResult):
     # 训练历史
     loss_history: list[float] = field(default_factory=list)
     val_loss_history: list[float] = field(default_factory=list)
+
+    # 参数搜索开销
+    candidates: list[BPNNCandidate] = field(default_factory=list)
+    search_time: float = 0.0
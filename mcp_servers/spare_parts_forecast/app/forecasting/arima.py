@@ -6,8 +6,12 @@ ARIMA预测模型
 """
 
 import io
+import os
+import threading
 import time
-from typing import Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Literal
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -20,15 +24,246 @@ from statsmodels.tsa.arima.model import ARIMA
 from statsmodels.tsa.stattools import adfuller
 
 from ..log import logger
+from ._utils import series_digest
 from .analysis_results import ARIMAAnalysisResult
 
+type ARIMAOrder = tuple[int, int, int]
+type InformationCriterion = Literal["aic", "bic"]
+
+# 缓存容量与追加拟合时允许复用的最大新增点数
+_CACHE_SIZE = 128
+_MAX_APPEND_POINTS = 12
+
+_cache_lock = threading.Lock()
+_diagnostics_cache: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_fit_cache: OrderedDict[tuple[str, ARIMAOrder], Any] = OrderedDict()
+
+
+def _cache_get[K, V](cache: OrderedDict[K, V], key: K) -> V | None:
+    with _cache_lock:
+        if (value := cache.get(key)) is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put[K, V](cache: OrderedDict[K, V], key: K, value: V) -> None:
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def stationarity_test(values: np.ndarray) -> dict[str, Any]:
+    """
+    平稳性检验(ADF)
+
+    Args:
+        values: 一维时间序列
+
+    Returns:
+        dict: ADF统计量、p值、临界值及是否平稳
+    """
+    adftest = adfuller(values, autolag="AIC")
+
+    critical_values = adftest[4] if len(adftest) > 4 else {}
+    p_value = adftest[1]
+
+    is_stationary = False
+    if isinstance(critical_values, dict) and "1%" in critical_values:
+        is_stationary = adftest[0] < critical_values["1%"] and p_value < 1e-8
+    else:
+        is_stationary = p_value < 0.05
+
+    return {
+        "adf_statistic": adftest[0],
+        "adf_p_value": p_value,
+        "critical_values": critical_values,
+        "is_stationary": is_stationary,
+    }
+
+
+def white_noise_test(values: np.ndarray) -> dict[str, Any]:
+    """
+    白噪声检验(Ljung-Box)
+
+    Args:
+        values: 一维时间序列
+
+    Returns:
+        dict: Ljung-Box统计量、p值及是否为白噪声
+    """
+    lb_result = acorr_ljungbox(values, lags=min(10, len(values) // 4))
+
+    if "lb_stat" in lb_result.columns and "lb_pvalue" in lb_result.columns:
+        lb_stat = lb_result["lb_stat"].iloc[-1]  # 取最后一个lag的统计量
+        lb_pvalue = lb_result["lb_pvalue"].iloc[-1]  # 取最后一个lag的p值
+        is_white_noise = lb_pvalue > 0.05  # p值大于0.05表示是白噪声
+    else:
+        lb_stat = None
+        lb_pvalue = None
+        is_white_noise = False
+
+    return {"ljung_box_statistic": lb_stat, "ljung_box_p_value": lb_pvalue, "is_white_noise": is_white_noise}
+
+
+def cached_diagnostics(values: np.ndarray, *, white_noise: bool = True) -> tuple[dict[str, Any], bool]:
+    """
+    按序列内容哈希缓存平稳性与白噪声检验结果
+
+    Args:
+        values: 一维时间序列
+        white_noise: 是否同时执行白噪声检验
+
+    Returns:
+        tuple: (检验结果, 是否命中缓存)
+            - 检验结果包含 "stationarity" 与 "white_noise"(未执行时为None)
+    """
+    key = series_digest(values)
+    cached = _cache_get(_diagnostics_cache, key)
+    if cached is not None and (not white_noise or cached["white_noise"] is not None):
+        return cached, True
+
+    diagnostics = {
+        "stationarity": cached["stationarity"] if cached is not None else stationarity_test(values),
+        "white_noise": white_noise_test(values) if white_noise else None,
+    }
+    _cache_put(_diagnostics_cache, key, diagnostics)
+    return diagnostics, False
+
+
+def select_differencing(values: np.ndarray, max_d: int) -> int:
+    """
+    根据ADF检验选择差分阶数
+
+    依次对原序列及其各阶差分执行(带缓存的)ADF检验，返回首个p值小于0.05的阶数。
+
+    Args:
+        values: 一维时间序列
+        max_d: 最大差分阶数
+
+    Returns:
+        int: 差分阶数
+    """
+    for d in range(max_d + 1):
+        try:
+            diagnostics, _ = cached_diagnostics(np.diff(values, n=d), white_noise=False)
+        except Exception:
+            # 差分后样本过少，无法继续检验
+            return max(d - 1, 0)
+        if diagnostics["stationarity"]["adf_p_value"] < 0.05:
+            return d
+    return max_d
+
+
+def fit_arima(values: np.ndarray, order: ARIMAOrder, *, reuse: bool = True) -> tuple[Any, bool]:
+    """
+    拟合ARIMA模型，并复用已缓存的拟合状态
+
+    相同序列与阶数直接返回缓存结果；若序列仅在已拟合序列末尾追加了少量新点，
+    则沿用已估计的参数，仅用新观测更新状态，不再重新估计参数。
+
+    Args:
+        values: 一维时间序列
+        order: ARIMA模型参数(p,d,q)
+        reuse: 是否复用缓存的拟合状态
+
+    Returns:
+        tuple: (拟合结果, 是否复用了已有拟合)
+    """
+    n = len(values)
+    if reuse:
+        for m in range(n, max(n - _MAX_APPEND_POINTS, 1) - 1, -1):
+            cached = _cache_get(_fit_cache, (series_digest(values[:m]), order))
+            if cached is None:
+                continue
+            if m == n:
+                return cached, True
+            fitted = cached.append(values[m:], refit=False)
+            _cache_put(_fit_cache, (series_digest(values), order), fitted)
+            logger.debug(f"复用ARIMA{order}拟合状态，追加{n - m}个观测点")
+            return fitted, True
+
+    fitted = ARIMA(values, order=order).fit()
+    _cache_put(_fit_cache, (series_digest(values), order), fitted)
+    return fitted, False
+
+
+def search_arima_order(
+    values: np.ndarray,
+    d: int,
+    max_p: int = 3,
+    max_q: int = 3,
+    criterion: InformationCriterion = "aic",
+    n_jobs: int | None = None,
+) -> tuple[ARIMAOrder, Any, dict[ARIMAOrder, float]]:
+    """
+    基于信息准则搜索ARIMA阶数
+
+    按模型复杂度 p+q 逐层搜索，同一层的候选并行拟合；
+    当某一层的最优信息准则不再优于已有最优模型时提前停止，剪除更高阶的候选。
+
+    Args:
+        values: 一维时间序列
+        d: 差分阶数
+        max_p: 最大自回归阶数
+        max_q: 最大移动平均阶数
+        criterion: 信息准则，可选"aic"、"bic"
+        n_jobs: 并行拟合的线程数，默认为 min(4, CPU核数)
+
+    Returns:
+        tuple: (最佳阶数, 最佳拟合结果, 各已拟合阶数的信息准则)
+    """
+
+    def try_fit(order: ARIMAOrder) -> Any | None:
+        try:
+            return fit_arima(values, order)[0]
+        except Exception as e:
+            logger.debug(f"ARIMA{order}拟合失败: {e}")
+            return None
+
+    n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+    scores: dict[ARIMAOrder, float] = {}
+    best: tuple[float, ARIMAOrder, Any] | None = None
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for level in range(max_p + max_q + 1):
+            orders = [(p, d, level - p) for p in range(max(0, level - max_q), min(max_p, level) + 1)]
+            level_best: tuple[float, ARIMAOrder, Any] | None = None
+            for order, fitted in zip(orders, pool.map(try_fit, orders), strict=True):
+                if fitted is None:
+                    continue
+                score = float(getattr(fitted, criterion))
+                scores[order] = score
+                if np.isfinite(score) and (level_best is None or score < level_best[0]):
+                    level_best = (score, order, fitted)
+
+            if level_best is None:
+                continue
+            if best is not None and level_best[0] >= best[0]:
+                # 更高阶的模型未能改善信息准则，停止搜索
+                break
+            best = level_best
+
+    if best is None:
+        raise RuntimeError("未能找到可拟合的ARIMA阶数")
+
+    logger.info(f"ARIMA阶数搜索完成: 最佳阶数={best[1]}, {criterion.upper()}={best[0]:.4f}, 候选数={len(scores)}")
+    return best[1], best[2], scores
+
 
 def arima_forecast_impl(
     df: pd.DataFrame,
     target_column: str,
     time_column: str,
-    arima_order: tuple[int, int, int] = (2, 1, 1),
+    arima_order: ARIMAOrder = (2, 1, 1),
     confidence_level: float = 0.95,
+    auto_order: bool = False,
+    max_p: int = 3,
+    max_d: int = 2,
+    max_q: int = 3,
+    information_criterion: InformationCriterion = "aic",
+    reuse_fit: bool = True,
     enable_diagnostics: bool = True,
     column_label: str | None = None,
     plot_title: str | None = None,
@@ -42,6 +277,12 @@ def arima_forecast_impl(
         time_column: 时间列名
         arima_order: ARIMA模型参数(p,d,q),默认为(2,1,1)
         confidence_level: 置信水平,默认为0.95
+        auto_order: 是否基于信息准则自动搜索阶数(忽略arima_order),默认为False
+        max_p: 自动搜索时的最大自回归阶数,默认为3
+        max_d: 自动搜索时的最大差分阶数,默认为2
+        max_q: 自动搜索时的最大移动平均阶数,默认为3
+        information_criterion: 自动搜索使用的信息准则,可选"aic"、"bic",默认为"aic"
+        reuse_fit: 序列仅追加少量新点时是否复用已有拟合状态,默认为True
         enable_diagnostics: 是否启用诊断(结果附加诊断信息和图表),默认为True
         column_label: 图表中列标签(启用诊断时生效),默认为target_column的值
         plot_title: 图表标题(启用诊断时生效),默认为None
@@ -60,70 +301,26 @@ def arima_forecast_impl(
         test_data = data.iloc[split_idx:]
         return train_data, test_data
 
-    def stationarity_test(timeseries: pd.DataFrame) -> dict[str, Any]:
-        """平稳性检验"""
-        column_name = timeseries.columns[0]
-        x = np.array(timeseries[column_name])
-
-        # ADF检验
-        adftest = adfuller(x, autolag="AIC")
-
-        critical_values = adftest[4] if len(adftest) > 4 else {}
-        p_value = adftest[1]
-
-        is_stationary = False
-        if isinstance(critical_values, dict) and "1%" in critical_values:
-            is_stationary = adftest[0] < critical_values["1%"] and p_value < 1e-8
-        else:
-            is_stationary = p_value < 0.05
-
-        return {
-            "adf_statistic": adftest[0],
-            "adf_p_value": p_value,
-            "critical_values": critical_values,
-            "is_stationary": is_stationary,
-        }
-
-    def white_noise_test(timeseries: pd.DataFrame) -> dict[str, Any]:
-        """白噪声检验"""
-        try:
-            lb_result = acorr_ljungbox(timeseries, lags=min(10, len(timeseries) // 4))
-
-            if "lb_stat" in lb_result.columns and "lb_pvalue" in lb_result.columns:
-                lb_stat = lb_result["lb_stat"].iloc[-1]  # 取最后一个lag的统计量
-                lb_pvalue = lb_result["lb_pvalue"].iloc[-1]  # 取最后一个lag的p值
-                is_white_noise = lb_pvalue > 0.05  # p值大于0.05表示是白噪声
-            else:
-                lb_stat = None
-                lb_pvalue = None
-                is_white_noise = False
-
-            return {"ljung_box_statistic": lb_stat, "ljung_box_p_value": lb_pvalue, "is_white_noise": is_white_noise}
-        except Exception as e:
-            warnings_list.append(f"白噪声检验失败: {e}")
-            return {"ljung_box_statistic": None, "ljung_box_p_value": None, "is_white_noise": False}
-
-    def arima_model(train_data: pd.DataFrame, order: tuple[int, int, int]) -> dict[str, Any]:
+    def arima_model(train_values: np.ndarray, order: ARIMAOrder, fitted_model: Any = None) -> dict[str, Any]:
         """ARIMA模型"""
         try:
-            model = ARIMA(train_data, order=order)
-            fitted_model = model.fit()
-
-            # 样本内预测
-            in_sample_pred = fitted_model.fittedvalues
+            if fitted_model is None:
+                fitted_model, reused = fit_arima(train_values, order, reuse=reuse_fit)
+            else:
+                reused = False
 
             # 样本外预测
             forecast_result = fitted_model.get_forecast(steps=len(test_data))
-            out_sample_pred = forecast_result.predicted_mean
+            out_sample_pred = np.asarray(forecast_result.predicted_mean)
 
             # 置信区间
-            conf_int = forecast_result.conf_int(alpha=1 - confidence_level)
+            conf_int = np.asarray(forecast_result.conf_int(alpha=1 - confidence_level))
 
             return {
                 "model": fitted_model,
-                "in_sample_pred": in_sample_pred,
+                "reused": reused,
                 "out_sample_pred": out_sample_pred,
-                "confidence_intervals": {"lower": conf_int.iloc[:, 0].tolist(), "upper": conf_int.iloc[:, 1].tolist()},
+                "confidence_intervals": {"lower": conf_int[:, 0].tolist(), "upper": conf_int[:, 1].tolist()},
                 "aic": fitted_model.aic,
                 "bic": fitted_model.bic,
                 "log_likelihood": fitted_model.llf,
@@ -134,10 +331,8 @@ def arima_forecast_impl(
         except Exception as e:
             raise RuntimeError(f"ARIMA模型拟合失败: {e}") from e
 
-    def residual_analysis(model: Any) -> dict[str, float]:
+    def residual_analysis(residuals: pd.Series) -> dict[str, float]:
         """残差分析"""
-        residuals = model.resid
-
         # 基本统计量
         resid_mean = float(np.mean(residuals))
         resid_std = float(np.std(residuals))
@@ -274,19 +469,39 @@ def arima_forecast_impl(
         train_data, test_data = resampling(df_work)
         train_data = train_data.astype(float)
 
-        # 平稳性检验
-        stationarity_result = stationarity_test(train_data)
+        train_values = train_data.iloc[:, 0].to_numpy()
 
-        # 白噪声检验
-        white_noise_result = white_noise_test(train_data)
+        # 平稳性检验与白噪声检验(按序列内容缓存)
+        try:
+            diagnostics, diagnostics_cached = cached_diagnostics(train_values)
+        except Exception as e:
+            warnings_list.append(f"白噪声检验失败: {e}")
+            diagnostics, diagnostics_cached = cached_diagnostics(train_values, white_noise=False)
+            diagnostics = {
+                **diagnostics,
+                "white_noise": {"ljung_box_statistic": None, "ljung_box_p_value": None, "is_white_noise": False},
+            }
+        stationarity_result = diagnostics["stationarity"]
+        white_noise_result = diagnostics["white_noise"]
+
+        # 阶数搜索
+        searched_model = None
+        order_scores: dict[str, float] = {}
+        if auto_order:
+            d = select_differencing(train_values, max_d)
+            arima_order, searched_model, scores = search_arima_order(
+                train_values, d, max_p, max_q, information_criterion
+            )
+            order_scores = {str(order): score for order, score in scores.items()}
 
         # 模型拟合
-        model_result = arima_model(train_data, arima_order)
+        model_result = arima_model(train_values, arima_order, searched_model)
         fitted_model = model_result["model"]
+        residuals = pd.Series(np.asarray(fitted_model.resid), index=train_data.index)
 
         # 残差分析
         if enable_diagnostics:
-            residual_result = residual_analysis(fitted_model)
+            residual_result = residual_analysis(residuals)
         else:
             residual_result = {
                 "residual_mean": 0.0,
@@ -297,13 +512,13 @@ def arima_forecast_impl(
 
         # 预测评估
         actual = test_data.iloc[:, 0].to_numpy()
-        predicted = model_result["out_sample_pred"].to_numpy()
+        predicted = model_result["out_sample_pred"]
 
         metrics = calc_metrics(actual, predicted)
 
         # 创建图表
         image_bytes = (
-            create_plots(train_data, test_data, predicted, model_result["confidence_intervals"], fitted_model.resid)
+            create_plots(train_data, test_data, predicted, model_result["confidence_intervals"], residuals)
             if enable_diagnostics
             else None
         )
@@ -354,6 +569,11 @@ def arima_forecast_impl(
             # 模型参数
             ar_params=model_result["ar_params"],
             ma_params=model_result["ma_params"],
+            # 阶数搜索与缓存
+            information_criterion=information_criterion if auto_order else "",
+            order_scores=order_scores,
+            diagnostics_cached=diagnostics_cached,
+            fit_reused=model_result["reused"],
             # 诊断信息
             warnings=warnings_list,
             execution_time=time.time() - start_time,
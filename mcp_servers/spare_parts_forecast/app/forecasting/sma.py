@@ -7,15 +7,115 @@
 
 import io
 import time
-from typing import cast
+from typing import Literal, cast
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 from ..log import logger
 from .analysis_results import SMAAnalysisResult
 
+type ErrorMetric = Literal["mape", "mae", "rmse"]
+
+
+def weighted_moving_average(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    批量计算加权移动平均
+
+    将所有权重组合视为卷积核，通过滑动窗口视图与权重矩阵的一次矩阵乘法
+    同时计算全部候选，且可在多条序列上批量计算。
+
+    Args:
+        values: 形状为 (n,) 的单条序列或 (m, n) 的多条等长序列
+        weights: 形状为 (k, w) 的权重矩阵，每行为一组按时间先后排列的权重
+
+    Returns:
+        np.ndarray: 形状为 (..., k, n - w + 1) 的移动平均值，
+            第 j 列对应窗口 values[..., j : j + w]
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    windows = sliding_window_view(values, weights.shape[1], axis=-1)
+    return np.swapaxes(windows @ weights.T, -1, -2)
+
+
+def one_step_errors(values: np.ndarray, weights: np.ndarray, metric: ErrorMetric = "mape") -> np.ndarray:
+    """
+    计算各权重组合的一步预测误差
+
+    以窗口 values[j : j + w] 的加权平均作为 values[j + w] 的预测值。
+
+    Args:
+        values: 形状为 (n,) 的单条序列或 (m, n) 的多条等长序列
+        weights: 形状为 (k, w) 的权重矩阵
+        metric: 误差指标，可选"mape"、"mae"、"rmse"，MAPE以比例而非百分比表示
+
+    Returns:
+        np.ndarray: 形状为 (..., k) 的误差
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    window_size = weights.shape[1]
+
+    predicted = weighted_moving_average(values, weights)[..., :-1]
+    return _forecast_errors(predicted, values[..., None, window_size:], metric)
+
+
+def _forecast_errors(predicted: np.ndarray, actual: np.ndarray, metric: ErrorMetric) -> np.ndarray:
+    diff = predicted - actual
+
+    match metric:
+        case "mape":
+            # 避免除零错误
+            actual_nonzero = np.where(actual != 0, actual, 1e-10)
+            return np.mean(np.abs(diff / actual_nonzero), axis=-1)
+        case "mae":
+            return np.mean(np.abs(diff), axis=-1)
+        case "rmse":
+            return np.sqrt(np.mean(diff**2, axis=-1))
+        case _:
+            raise ValueError(f"不支持的误差指标: {metric}")
+
+
+def select_best_weights(
+    values: np.ndarray,
+    weight_combinations: list[list[float]],
+    metric: ErrorMetric = "mape",
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    在多条序列上批量选择最佳权重组合
+
+    相同长度的权重组合在一次计算中完成评估，不同长度按窗口大小分组计算。
+
+    Args:
+        values: 形状为 (n,) 的单条序列或 (m, n) 的多条等长序列
+        weight_combinations: 候选权重组合列表
+        metric: 误差指标，可选"mape"、"mae"、"rmse"
+
+    Returns:
+        tuple: (best_indices, errors)
+            - best_indices: 形状为 (...,) 的最佳权重组合下标
+            - errors: 形状为 (..., k) 的各候选误差
+    """
+    values = np.asarray(values, dtype=float)
+    errors = np.full((*values.shape[:-1], len(weight_combinations)), np.nan)
+
+    groups: dict[int, list[int]] = {}
+    for idx, weights in enumerate(weight_combinations):
+        groups.setdefault(len(weights), []).append(idx)
+
+    for window_size, indices in groups.items():
+        if window_size >= values.shape[-1]:
+            continue
+        weights = np.asarray([weight_combinations[idx] for idx in indices], dtype=float)
+        errors[..., indices] = one_step_errors(values, weights, metric)
+
+    # 与逐个比较一致：忽略无效值，误差相同时取靠前的组合
+    best_indices = np.where(np.isnan(errors), np.inf, errors).argmin(axis=-1)
+    return best_indices, errors
+
 
 def sma_forecast_impl(
     df: pd.DataFrame,
@@ -92,48 +192,44 @@ def sma_forecast_impl(
         # 提取相关列并保存原始列名用于展示
         df_work = cast("pd.DataFrame", df[[time_column, target_column]]).copy()
 
-        # 计算简单移动平均
-        sma_values = cast("pd.DataFrame", df_work[target_column].rolling(window=window_size).mean())
+        values = df_work[target_column].to_numpy(dtype=float)
+
+        # 简单移动平均等价于均匀权重，与全部加权候选在一次计算中完成
+        uniform_weights = np.full((1, window_size), 1.0 / window_size)
+        candidate_weights = (
+            np.vstack([uniform_weights, np.asarray(valid_weight_combinations, dtype=float)])
+            if optimize_weights and valid_weight_combinations
+            else uniform_weights
+        )
+        moving_averages = weighted_moving_average(values, candidate_weights)
+        candidate_mapes = _forecast_errors(moving_averages[:, :-1], values[window_size:], "mape")
+
+        def as_series(averages: np.ndarray) -> pd.Series:
+            padded = np.concatenate([np.full(window_size - 1, np.nan), averages])
+            return pd.Series(padded, index=df_work.index)
+
+        sma_values = as_series(moving_averages[0])
 
         # 优化权重
         best_weights = None
         wma_values = None
         mape_wight = float("inf")
-        mape_single = float("inf")
 
-        if optimize_weights:
-            for weights in valid_weight_combinations:
-                # 计算当前权重的移动加权平均
-                current_wma = (
-                    df_work[target_column].rolling(window=window_size).apply(lambda x, w=weights: (x * w).sum())
-                )
-
-                # 计算MAPE (排除前window_size-1个NaN值)
-                start_idx = window_size - 1
-                y_values = current_wma[start_idx:-1].to_numpy()  # pyright: ignore[reportAttributeAccessIssue]
-                actual_values = df_work[target_column][start_idx + 1 :].to_numpy()  # pyright: ignore[reportAttributeAccessIssue]
-
-                # 避免除零错误
-                actual_nonzero = np.where(actual_values != 0, actual_values, 1e-10)
-                current_mape = np.mean(np.abs((y_values - actual_values) / actual_nonzero))
-
-                # 更新最佳MAPE和权重
-                if current_mape < mape_wight:
-                    mape_wight = current_mape
-                    best_weights = weights
-                    wma_values = current_wma
+        if optimize_weights and len(candidate_weights) > 1:
+            weighted_mapes = candidate_mapes[1:]
+            best_idx = int(np.where(np.isnan(weighted_mapes), np.inf, weighted_mapes).argmin())
+            if not np.isnan(weighted_mapes[best_idx]):
+                mape_wight = float(weighted_mapes[best_idx])
+                best_weights = valid_weight_combinations[best_idx]
+                wma_values = as_series(moving_averages[best_idx + 1])
 
             logger.info(f"最佳权重组合: {best_weights}")
             logger.info(f"最佳加权MAPE: {mape_wight}")
 
-        # 计算简单移动平均的MAPE
-        start_idx = window_size - 1
-        sma_y_values = sma_values[start_idx:-1].to_numpy()  # pyright: ignore[reportAttributeAccessIssue]
-        actual_values = df_work[target_column][start_idx + 1 :].to_numpy()  # pyright: ignore[reportAttributeAccessIssue]
-
-        # 避免除零错误
-        actual_nonzero = np.where(actual_values != 0, actual_values, 1e-10)
-        mape_single = np.mean(np.abs((sma_y_values - actual_values) / actual_nonzero))
+        # 简单移动平均的预测值与MAPE
+        sma_y_values = moving_averages[0][:-1]
+        actual_values = values[window_size:]
+        mape_single = float(candidate_mapes[0])
 
         # 计算其他指标
         mae_single = np.mean(np.abs(sma_y_values - actual_values))
@@ -11,7 +11,10 @@ BP神经网络预测模块
 """
 
 import io
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any, cast
 
 import matplotlib.pyplot as plt
@@ -20,17 +23,185 @@ import pandas as pd
 import tensorflow as tf
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import MinMaxScaler
+from tensorflow.python.keras import backend
+from tensorflow.python.keras.callbacks import EarlyStopping
 from tensorflow.python.keras.initializers.initializers_v2 import GlorotUniform
 from tensorflow.python.keras.layers import Dense
 from tensorflow.python.keras.models import Sequential
 from tensorflow.python.keras.optimizer_v1 import Adam
 
 from ..log import logger
-from .analysis_results import BPNNAnalysisResult
+from ._utils import make_supervised_windows
+from .analysis_results import BPNNAnalysisResult, BPNNCandidate
 
 if TYPE_CHECKING:
     from tensorflow.python.keras.callbacks import History
 
+# 网络规模很小，GPU 的调度与拷贝开销远大于计算本身，仅使用 CPU 训练
+try:
+    tf.config.set_visible_devices([], "GPU")
+except (RuntimeError, ValueError) as e:
+    # TensorFlow 运行时初始化后无法再修改可见设备
+    logger.warning(f"无法禁用GPU设备，BP神经网络将使用默认设备: {e}")
+
+
+def _tansig(x: Any) -> Any:
+    """自定义tansig激活函数"""
+    return (2.0 / (1.0 + tf.exp(tf.multiply(-2.0, x)))) - 1.0
+
+
+@dataclass
+class _CompiledModel:
+    model: Sequential
+    initial_weights: list[np.ndarray]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@dataclass
+class BPTrainOutcome:
+    """单个候选参数组合的训练结果"""
+
+    history: dict[str, list[float]]
+    y_pred: np.ndarray
+    epochs_trained: int
+    train_time: float
+    graph_reused: bool
+
+
+class BPTrainingEngine:
+    """
+    BP神经网络训练引擎
+
+    按 (输入层, 隐含层, 学习率, 随机种子) 缓存已编译的模型。
+    同形状的候选复用已构建的计算图，训练前仅重置权重与优化器状态，
+    避免每次调用都重新构建和编译模型。
+    """
+
+    def __init__(self, max_models: int = 64) -> None:
+        self.max_models = max_models
+        self._models: OrderedDict[tuple[int, int, float, int], _CompiledModel] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build(input_size: int, hidden_size: int, learning_rate: float, random_state: int) -> _CompiledModel:
+        model: Sequential = cast("Sequential", Sequential())
+        model.add(
+            Dense(
+                hidden_size,
+                input_dim=input_size,
+                activation=_tansig,
+                kernel_initializer=GlorotUniform(seed=random_state),  # pyright: ignore[reportArgumentType]
+            )
+        )
+        model.add(
+            Dense(
+                1,
+                activation="linear",
+                kernel_initializer=GlorotUniform(seed=random_state),  # pyright: ignore[reportArgumentType]
+            ),
+        )
+        optimizer = Adam(lr=learning_rate)
+        model.compile(loss="mean_squared_error", optimizer=optimizer)  # pyright: ignore[reportArgumentType]
+        return _CompiledModel(model=model, initial_weights=model.get_weights())
+
+    def _acquire(self, key: tuple[int, int, float, int]) -> tuple[_CompiledModel, bool]:
+        with self._lock:
+            if (compiled := self._models.get(key)) is not None:
+                self._models.move_to_end(key)
+                return compiled, True
+
+        compiled = self._build(*key)
+        with self._lock:
+            # 并发构建同一形状时以先写入者为准
+            compiled = self._models.setdefault(key, compiled)
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return compiled, False
+
+    @staticmethod
+    def _reset(compiled: _CompiledModel) -> None:
+        model = compiled.model
+        model.set_weights(compiled.initial_weights)
+        optimizer_weights = getattr(model.optimizer, "weights", [])
+        if optimizer_weights:
+            backend.batch_set_value([(w, np.zeros(tuple(w.shape))) for w in optimizer_weights])
+
+    def fit_predict(
+        self,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        X_test: np.ndarray,
+        *,
+        input_size: int,
+        hidden_size: int,
+        learning_rate: float,
+        random_state: int,
+        epochs: int,
+        batch_size: int,
+        early_stopping_patience: int,
+    ) -> BPTrainOutcome:
+        """
+        训练单个候选模型并在测试集上预测
+
+        Args:
+            X_train: 训练输入
+            y_train: 训练标签
+            X_test: 测试输入
+            input_size: 输入层神经元数量
+            hidden_size: 隐含层神经元数量
+            learning_rate: 学习率
+            random_state: 随机种子
+            epochs: 最大训练轮数
+            batch_size: 批次大小
+            early_stopping_patience: 验证损失无改善的容忍轮数，0表示不启用早停
+
+        Returns:
+            BPTrainOutcome: 训练历史、测试集预测及训练耗时
+        """
+        key = (input_size, hidden_size, float(learning_rate), random_state)
+        compiled, reused = self._acquire(key)
+
+        callbacks = []
+        if early_stopping_patience > 0:
+            callbacks.append(
+                EarlyStopping(
+                    monitor="val_loss",
+                    patience=early_stopping_patience,
+                    restore_best_weights=True,
+                )
+            )
+
+        with compiled.lock:
+            start = time.perf_counter()
+            np.random.seed(random_state)
+            tf.random.set_seed(random_state)
+            self._reset(compiled)
+
+            history = compiled.model.fit(
+                X_train,
+                y_train,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_split=0.2,
+                callbacks=callbacks,
+                verbose=0,  # pyright: ignore[reportArgumentType]
+            )
+            history = cast("History", history)
+            y_pred = compiled.model.predict(X_test, verbose=0)
+            train_time = time.perf_counter() - start
+
+        return BPTrainOutcome(
+            history=history.history,
+            y_pred=np.asarray(y_pred),
+            epochs_trained=len(history.history.get("loss", [])),
+            train_time=train_time,
+            graph_reused=reused,
+        )
+
+
+_engine = BPTrainingEngine()
+
 
 def bp_forecast_impl(
     df: pd.DataFrame,
@@ -43,6 +214,7 @@ def bp_forecast_impl(
     learning_rate: float = 0.001,
     test_size: float = 0.2,
     random_state: int = 42,
+    early_stopping_patience: int = 10,
     enable_diagnostics: bool = True,
     column_label: str | None = None,
     plot_title: str | None = None,
@@ -61,6 +233,7 @@ def bp_forecast_impl(
         learning_rate: 学习率，默认为0.001
         test_size: 测试集比例，默认为0.2
         random_state: 随机种子，默认为42
+        early_stopping_patience: 验证损失无改善时提前停止的容忍轮数，默认为10，0表示不启用早停
         enable_diagnostics: 是否启用诊断，默认为True
         column_label: 图表中显示的列标签，默认使用target_column值
         plot_title: 图表标题，默认为None(自动生成)
@@ -124,7 +297,7 @@ def bp_forecast_impl(
         test_start_date = df_work[time_column].iloc[split_idx]
 
         # 用于跟踪最佳模型
-        best_model = None
+        best_outcome = None
         best_mape = float("inf")
         best_input_size = 0
         best_hidden_size = 0
@@ -132,93 +305,76 @@ def bp_forecast_impl(
         best_y_pred = None
         best_y_test = None
         best_test_indices = None
+        candidates: list[BPNNCandidate] = []
+        search_start = time.perf_counter()
+
+        normalized_values = df_work["normalized_value"].to_numpy()
 
         # 网格搜索最佳参数
         for input_size in input_sizes:
-            for hidden_size in hidden_sizes:
-                np.random.seed(random_state)
-                tf.random.set_seed(random_state)
-                logger.info(f"尝试参数组合: 输入层={input_size}, 隐含层={hidden_size}")
+            # 创建时间序列数据，同一输入层尺寸的窗口在各隐含层候选间共享
+            X, y = make_supervised_windows(normalized_values, input_size)
 
-                # 创建时间序列数据
-                X = []
-                y = []
-
-                for i in range(len(df_work) - input_size):
-                    X.append(df_work["normalized_value"].iloc[i : i + input_size].values)
-                    y.append(df_work["normalized_value"].iloc[i + input_size])
-
-                X = np.array(X)
-                y = np.array(y)
-
-                # 划分训练集和测试集
-                train_size = int((1 - test_size) * len(X))
-                X_train, X_test = X[:train_size], X[train_size:]
-                y_train, y_test = y[:train_size], y[train_size:]
-
-                # 测试索引
-                test_indices = df_work.index[input_size + train_size : input_size + len(X)]
-
-                # 构建BP神经网络模型
-                # 自定义tansig激活函数
-                def tansig(x: Any) -> Any:
-                    return (2.0 / (1.0 + tf.exp(tf.multiply(-2.0, x)))) - 1.0
-
-                model: Sequential = cast("Sequential", Sequential())
-                model.add(
-                    Dense(
-                        hidden_size,
-                        input_dim=input_size,
-                        activation=tansig,
-                        kernel_initializer=GlorotUniform(seed=random_state),  # pyright: ignore[reportArgumentType]
-                    )
-                )
-                model.add(
-                    Dense(
-                        1,
-                        activation="linear",
-                        kernel_initializer=GlorotUniform(seed=random_state),  # pyright: ignore[reportArgumentType]
-                    ),
-                )
+            # 划分训练集和测试集
+            train_size = int((1 - test_size) * len(X))
+            X_train, X_test = X[:train_size], X[train_size:]
+            y_train, y_test = y[:train_size], y[train_size:]
+
+            if len(X_train) == 0 or len(X_test) == 0:
+                warnings_list.append(f"输入层={input_size}时样本不足，已跳过")
+                continue
+
+            # 测试索引
+            test_indices = df_work.index[input_size + train_size : input_size + len(X)]
+            y_test_denorm = scaler.inverse_transform(y_test.reshape(-1, 1))
 
-                # 编译模型
-                optimizer = Adam(lr=learning_rate)
-                model.compile(loss="mean_squared_error", optimizer=optimizer)  # pyright: ignore[reportArgumentType]
+            for hidden_size in hidden_sizes:
+                logger.info(f"尝试参数组合: 输入层={input_size}, 隐含层={hidden_size}")
 
-                # 训练模型
-                history = model.fit(
+                outcome = _engine.fit_predict(
                     X_train,
                     y_train,
+                    X_test,
+                    input_size=input_size,
+                    hidden_size=hidden_size,
+                    learning_rate=learning_rate,
+                    random_state=random_state,
                     epochs=epochs,
                     batch_size=batch_size,
-                    validation_split=0.2,
-                    verbose=0,  # pyright: ignore[reportArgumentType]
+                    early_stopping_patience=early_stopping_patience,
                 )
-                history = cast("History", history)
-
-                # 预测
-                y_pred = model.predict(X_test, verbose=0)
 
                 # 还原预测结果的缩放
-                y_test_reshaped = y_test.reshape(-1, 1)
-                y_pred_denorm = scaler.inverse_transform(y_pred)
-                y_test_denorm = scaler.inverse_transform(y_test_reshaped)
+                y_pred_denorm = scaler.inverse_transform(outcome.y_pred)
 
                 # 计算性能指标
                 mape = np.mean(np.abs((y_pred_denorm - y_test_denorm) / y_test_denorm)) * 100
 
-                logger.info(f"MAPE: {mape:.4f}%")
+                logger.info(f"MAPE: {mape:.4f}%, 训练轮数: {outcome.epochs_trained}, 耗时: {outcome.train_time:.2f}秒")
+                candidates.append(
+                    BPNNCandidate(
+                        input_size=input_size,
+                        hidden_size=hidden_size,
+                        mape=float(mape),
+                        epochs_trained=outcome.epochs_trained,
+                        train_time=outcome.train_time,
+                        graph_reused=outcome.graph_reused,
+                    )
+                )
 
                 if mape < best_mape:
                     best_mape = mape
                     best_input_size = input_size
                     best_hidden_size = hidden_size
-                    best_train_history = history.history
-                    best_model = model
+                    best_train_history = outcome.history
+                    best_outcome = outcome
                     best_y_pred = y_pred_denorm
                     best_y_test = y_test_denorm
                     best_test_indices = test_indices
 
+        search_time = time.perf_counter() - search_start
+        logger.info(f"参数搜索完成: {len(candidates)}个候选, 耗时: {search_time:.2f}秒")
+
         if best_test_indices is None or best_y_pred is None or best_y_test is None:
             raise RuntimeError("未能找到合适的参数组合进行预测")
 
@@ -230,7 +386,7 @@ def bp_forecast_impl(
 
         # 图表生成（如果启用诊断）
         image_bytes = None
-        if enable_diagnostics and best_model is not None:
+        if enable_diagnostics and best_outcome is not None:
             plt.figure(figsize=(12, 10))
 
             # 第一个子图：预测结果
@@ -307,9 +463,11 @@ def bp_forecast_impl(
             learning_rate=learning_rate,
             epochs=epochs,
             batch_size=batch_size,
-            early_stopping_patience=0,
+            early_stopping_patience=early_stopping_patience,
             loss_history=best_train_history["loss"] if best_train_history else [],
             val_loss_history=best_train_history.get("val_loss", []) if best_train_history else [],
+            candidates=candidates,
+            search_time=search_time,
             warnings=warnings_list,
             execution_time=execution_time,
         )
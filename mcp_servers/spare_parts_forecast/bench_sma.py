@@ -0,0 +1,70 @@
+# ruff: noqa: T201
+"""
+SMA/WMA 候选评估基准
+
+对比基于 `rolling().apply` 的逐候选实现与基于滑动窗口矩阵乘法的批量实现，
+并校验两者选出的最佳权重与MAPE一致。
+
+Run:
+    python -m bench_sma
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.forecasting.sma import select_best_weights
+
+WEIGHT_COMBINATIONS = [
+    [0.1, 0.3, 0.6],
+    [0.2, 0.3, 0.5],
+    [0.2, 0.4, 0.4],
+    [0.3, 0.3, 0.4],
+    [0.1, 0.4, 0.5],
+    [0.1, 0.2, 0.7],
+]
+
+
+def legacy_best_weights(values: np.ndarray, weight_combinations: list[list[float]]) -> tuple[int, float]:
+    series = pd.Series(values)
+    best_idx, best_mape = -1, float("inf")
+    for idx, weights in enumerate(weight_combinations):
+        window_size = len(weights)
+        wma = series.rolling(window=window_size).apply(lambda x, w=weights: (x * w).sum())
+        start_idx = window_size - 1
+        y_values = wma[start_idx:-1].to_numpy()
+        actual_values = series[start_idx + 1 :].to_numpy()
+        actual_nonzero = np.where(actual_values != 0, actual_values, 1e-10)
+        mape = np.mean(np.abs((y_values - actual_values) / actual_nonzero))
+        if mape < best_mape:
+            best_idx, best_mape = idx, mape
+    return best_idx, float(best_mape)
+
+
+def run(n_series: int, length: int) -> None:
+    rng = np.random.default_rng(42)
+    values = rng.gamma(2.0, 50.0, size=(n_series, length)).round()
+
+    start = time.perf_counter()
+    legacy = [legacy_best_weights(row, WEIGHT_COMBINATIONS) for row in values]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    best_indices, errors = select_best_weights(values, WEIGHT_COMBINATIONS)
+    batch_time = time.perf_counter() - start
+
+    for row, (idx, mape) in enumerate(legacy):
+        assert best_indices[row] == idx, f"series {row}: {best_indices[row]} != {idx}"
+        assert np.isclose(errors[row, idx], mape), f"series {row}: {errors[row, idx]} != {mape}"
+
+    print(
+        f"series={n_series:>5} length={length:>6}  "
+        f"rolling.apply={legacy_time:8.3f}s  batched={batch_time:8.4f}s  "
+        f"speedup={legacy_time / batch_time:8.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    for n_series, length in [(1, 100), (1, 5_000), (100, 100), (200, 500)]:
+        run(n_series, length)